@@ -1,18 +1,21 @@
 import base64
 import hashlib
-import os
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, Optional, Tuple
 
-import jwt
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from dotenv import load_dotenv
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
 
-load_dotenv()
+from .cache_backend import CacheBackend, NamespaceConfig, decode_json, encode_json, get_shared_backend
+from .config import getenv
+from .metrics import ACTION_RUNS, REGISTRY, ensure_metrics_server, span
+from .warmup import WarmupConfig, warm_up
 
 @dataclass
 class SecurityConfig:
@@ -23,8 +26,8 @@ class SecurityConfig:
     @classmethod
     def from_env(cls) -> 'SecurityConfig':
         """Create SecurityConfig from environment variables."""
-        jwt_key = os.getenv("JWT_KEY")
-        encryption_key = os.getenv("ENCRYPTION_KEY")
+        jwt_key = getenv("JWT_KEY")
+        encryption_key = getenv("ENCRYPTION_KEY")
         
         if not jwt_key or not encryption_key:
             raise ValueError("Missing required security configuration")
@@ -35,7 +38,10 @@ class TokenDecoder:
     """Handles JWT token decoding and validation."""
     
     def __init__(self, config: SecurityConfig):
+        # PyJWT is imported here rather than at module load to keep startup fast.
+        import jwt
         self.config = config
+        self._jwt = jwt
 
     def decode_token(self, token: str) -> Dict[str, str]:
         """
@@ -50,6 +56,7 @@ class TokenDecoder:
         Raises:
             ValueError: If token is invalid or expired
         """
+        jwt = self._jwt
         try:
             return jwt.decode(token, self.config.jwt_key, algorithms=['HS256'])
         except jwt.ExpiredSignatureError:
@@ -61,8 +68,16 @@ class ClaimDecryptor:
     """Handles decryption of encrypted claims."""
     
     def __init__(self, config: SecurityConfig):
-        """Initialize with encryption key."""
+        """Initialize with encryption key and a reusable cipher."""
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
         self.key = self._derive_key(config.encryption_key)
+        self._cipher = Cipher(
+            algorithms.AES(self.key),
+            modes.ECB(),  # Note: ECB mode is maintained for compatibility
+            backend=default_backend()
+        )
 
     @staticmethod
     def _derive_key(raw_key: str) -> bytes:
@@ -90,15 +105,8 @@ class ClaimDecryptor:
             # Decode base64
             encrypted_bytes = base64.b64decode(encrypted_claim)
             
-            # Create cipher
-            cipher = Cipher(
-                algorithms.AES(self.key),
-                modes.ECB(),  # Note: ECB mode is maintained for compatibility
-                backend=default_backend()
-            )
-            
-            # Decrypt
-            decryptor = cipher.decryptor()
+            # Decrypt with a fresh context from the shared cipher
+            decryptor = self._cipher.decryptor()
             decrypted_bytes = decryptor.update(encrypted_bytes) + decryptor.finalize()
             
             # Decode and remove padding
@@ -122,6 +130,122 @@ class UserInfo:
             SlotSet("user_auth", True)
         ]
 
+class VerifiedTokenCache:
+    """
+    Bounded cache of already verified tokens.
+
+    Entries are keyed by an HMAC of the token, so the raw token is never
+    kept, and expire at the token's ``exp`` claim (capped by
+    ``max_ttl_seconds``). With a shared cache backend, a token verified by
+    one worker is accepted by the others without verifying it again. Shared
+    entries hold the token's claims still encrypted, as issued, and carry an
+    HMAC tag; both HMACs are keyed from ``secret`` (the JWT signing key), so
+    whoever can write to the store but does not hold the key cannot plant an
+    entry that is accepted, and an entry that fails the check is a miss.
+    """
+
+    def __init__(self, secret: str, decrypt: Callable[[str], str], max_entries: int = 10000,
+                 max_ttl_seconds: float = 3600.0, shared: Optional[CacheBackend] = None,
+                 shared_max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.max_ttl_seconds = max_ttl_seconds
+        self._secret = hmac.new(secret.encode('utf-8'), b"rasa-verified-token-cache", hashlib.sha256).digest()
+        self._decrypt = decrypt
+        self._entries: 'OrderedDict[str, Tuple[UserInfo, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = shared.namespace("tokens", NamespaceConfig(
+            ttl_seconds=max_ttl_seconds, max_entries=shared_max_entries
+        )) if shared is not None else None
+        self.hits = 0
+        self.shared_hits = 0
+        self.rejected = 0
+        self.misses = 0
+
+    def _mac(self, data: str) -> str:
+        return hmac.new(self._secret, data.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def _remember(self, key: str, user_info: UserInfo, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (user_info, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _unseal(self, key: str, blob: bytes) -> Optional[Tuple[UserInfo, float]]:
+        """Check a shared entry's tag and decrypt its claims; None if it is not genuine."""
+        try:
+            sealed_account, sealed_role, expires_at, tag = decode_json(blob)
+            payload = json.dumps([key, sealed_account, sealed_role, expires_at])
+            if not hmac.compare_digest(tag, self._mac(payload)):
+                raise ValueError("tag mismatch")
+            user_info = UserInfo(user_account=self._decrypt(sealed_account), role=self._decrypt(sealed_role))
+            return user_info, float(expires_at)
+        except Exception as e:
+            # Whatever is wrong with a shared entry, it is only a miss.
+            self.rejected += 1
+            print(f"Ignoring shared token cache entry: {str(e)}")
+            return None
+
+    async def get(self, token: str) -> Optional[UserInfo]:
+        """Return the cached user info for a still valid token."""
+        key = self._mac(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                user_info, expires_at = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return user_info
+                del self._entries[key]
+
+        if self._shared is not None:
+            blob = await self._shared.aget(key)
+            entry = self._unseal(key, blob) if blob is not None else None
+            if entry is not None and entry[1] > time.time():
+                user_info, expires_at = entry
+                self._remember(key, user_info, expires_at)
+                self.shared_hits += 1
+                return user_info
+
+        self.misses += 1
+        return None
+
+    def put(self, token: str, user_info: UserInfo, exp: Optional[Any],
+            sealed_claims: Optional[Tuple[str, str]] = None) -> None:
+        """
+        Remember a verified token until its expiry.
+
+        ``sealed_claims`` are the token's encrypted ``user_account`` and
+        ``role`` claims; without them the entry stays in this process.
+        """
+        now = time.time()
+        expires_at = now + self.max_ttl_seconds
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now:
+            return
+
+        key = self._mac(token)
+        self._remember(key, user_info, expires_at)
+        if self._shared is not None and sealed_claims is not None:
+            sealed_account, sealed_role = sealed_claims
+            tag = self._mac(json.dumps([key, sealed_account, sealed_role, expires_at]))
+            self._shared.set_soon(
+                key, encode_json([sealed_account, sealed_role, expires_at, tag]), ttl=expires_at - now
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss and size counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "rejected": self.rejected,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
 class InitBot(Action):
     """Rasa action for bot initialization with user authentication."""
 
@@ -129,16 +253,41 @@ class InitBot(Action):
         """Initialize with security configuration and handlers."""
         try:
             self.config = SecurityConfig.from_env()
-            self.token_decoder = TokenDecoder(self.config)
-            self.claim_decryptor = ClaimDecryptor(self.config)
         except ValueError as e:
             raise RuntimeError(f"Failed to initialize InitBot: {str(e)}")
+        self.token_cache = VerifiedTokenCache(
+            self.config.jwt_key, lambda claim: self.claim_decryptor.decrypt(claim), shared=get_shared_backend()
+        )
+        # Built on first use (or by the warm-up hook); they pull in PyJWT and cryptography.
+        self._token_decoder: Optional[TokenDecoder] = None
+        self._claim_decryptor: Optional[ClaimDecryptor] = None
+
+        REGISTRY.register_stats("rasa_token_cache", self.token_cache.stats)
+        ensure_metrics_server()
+
+        if WarmupConfig().enabled:
+            warm_up(self.name(), {
+                "token_decoder": lambda: self.token_decoder,
+                "claim_decryptor": lambda: self.claim_decryptor,
+            })
+
+    @property
+    def token_decoder(self) -> TokenDecoder:
+        if self._token_decoder is None:
+            self._token_decoder = TokenDecoder(self.config)
+        return self._token_decoder
+
+    @property
+    def claim_decryptor(self) -> ClaimDecryptor:
+        if self._claim_decryptor is None:
+            self._claim_decryptor = ClaimDecryptor(self.config)
+        return self._claim_decryptor
 
     def name(self) -> str:
         """Return action name."""
         return "action_init_bot"
 
-    def _process_token(self, token: str) -> Optional[UserInfo]:
+    async def _process_token(self, token: str) -> Optional[UserInfo]:
         """
         Process and validate token, returning user information.
         
@@ -148,15 +297,28 @@ class InitBot(Action):
         Returns:
             UserInfo object if successful, None otherwise
         """
+        action = self.name()
+        with span(action, "token_cache"):
+            cached = await self.token_cache.get(token)
+        if cached:
+            return cached
+
         try:
             # Decode token
-            decoded_token = self.token_decoder.decode_token(token)
+            with span(action, "jwt_verify"):
+                decoded_token = self.token_decoder.decode_token(token)
             
             # Decrypt claims
-            user_account = self.claim_decryptor.decrypt(decoded_token['user_account'])
-            role = self.claim_decryptor.decrypt(decoded_token['role'])
+            with span(action, "claim_decrypt"):
+                user_account = self.claim_decryptor.decrypt(decoded_token['user_account'])
+                role = self.claim_decryptor.decrypt(decoded_token['role'])
             
-            return UserInfo(user_account=user_account, role=role)
+            user_info = UserInfo(user_account=user_account, role=role)
+            self.token_cache.put(
+                token, user_info, decoded_token.get('exp'),
+                sealed_claims=(decoded_token['user_account'], decoded_token['role'])
+            )
+            return user_info
             
         except (ValueError, KeyError) as e:
             print(f"Token processing failed: {str(e)}")
@@ -180,7 +342,7 @@ class InitBot(Action):
                 raise ValueError("Invalid token format")
 
             # Process token and get user info
-            user_info = self._process_token(token)
+            user_info = await self._process_token(token)
             if not user_info:
                 raise ValueError("Failed to process token")
 
@@ -188,11 +350,14 @@ class InitBot(Action):
             print(f"User authenticated: {user_info.user_account}")
             
             # Return slots
+            ACTION_RUNS.inc(self.name(), "authenticated")
             return user_info.to_slots()
 
         except ValueError as e:
+            ACTION_RUNS.inc(self.name(), "rejected")
             dispatcher.utter_message(text=f"Authentication failed: {str(e)}")
         except Exception as e:
+            ACTION_RUNS.inc(self.name(), "error")
             print(f"Unexpected error during initialization: {str(e)}")
             dispatcher.utter_message(
                 text="An unexpected error occurred during initialization. Please try again later."
@@ -1,11 +1,21 @@
+import asyncio
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
-import requests
+import aiohttp
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
 
+from .cache_backend import get_shared_backend
+from .config import getenv
+from .forecast_cache import ForecastCache, ForecastCacheConfig
+from .forecast_snapshot import ForecastSnapshot, ForecastSnapshotConfig
+from .http_session import get_session
+from .metrics import ACTION_RUNS, REGISTRY, ensure_metrics_server, span
+from .resilience import CircuitOpenError, DeadlineConfig, DeadlineExceeded, deadline, get_breaker, remaining
+from .warmup import WarmupConfig, warm_up
+
 class WeatherForecast:
     """Data class to store weather forecast information."""
     def __init__(self, date: str, location_name: str, summary_forecast: str,
@@ -29,6 +39,24 @@ class FetchWeather(Action):
     """Action to fetch weather information from the Malaysian weather API."""
 
     API_BASE_URL = "https://api.data.gov.my/weather/forecast"
+    REQUEST_TIMEOUT = 10.0
+    BULK_REQUEST_TIMEOUT = 30.0
+
+    def __init__(self):
+        self.API_BASE_URL = getenv("WEATHER_API_URL") or self.API_BASE_URL
+        self.forecast_cache = ForecastCache(
+            ForecastCacheConfig(), self._fetch_weather_data, get_shared_backend()
+        )
+        self.forecast_snapshot = ForecastSnapshot(ForecastSnapshotConfig(), self._fetch_all_forecasts)
+        self.deadline_config = DeadlineConfig()
+        self.breaker = get_breaker("weather")
+        REGISTRY.register_stats("rasa_forecast_cache", self.forecast_cache.stats)
+        if self.forecast_snapshot.config.enabled:
+            REGISTRY.register_stats("rasa_forecast_snapshot", self.forecast_snapshot.stats)
+        ensure_metrics_server()
+
+        if WarmupConfig().enabled and self.forecast_snapshot.config.enabled:
+            warm_up(self.name(), {"forecast_snapshot": self.forecast_snapshot.load})
 
     def name(self) -> str:
         """Return the action name as required by Rasa."""
@@ -61,20 +89,57 @@ class FetchWeather(Action):
             print(f"Missing required field in forecast data: {e}")
             return None
 
-    def _fetch_weather_data(self, location: str) -> Optional[List[Dict[str, Any]]]:
+    async def _fetch_weather_data(self, location: str) -> Optional[List[Dict[str, Any]]]:
         """Fetch weather data from the API."""
         api_url = self._get_api_url(location)
         print(f"Fetching weather data from: {api_url}")
 
         try:
-            response = requests.get(api_url, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
+            timeout = remaining(self.REQUEST_TIMEOUT)
+            with span(self.name(), "weather_api"), self.breaker.guard():
+                async with get_session().get(
+                    api_url,
+                    timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as response:
+                    response.raise_for_status()
+                    return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
             print(f"Error fetching weather data: {e}")
             return None
 
-    def run(
+    async def _fetch_all_forecasts(self) -> Optional[List[Dict[str, Any]]]:
+        """Fetch the forecast for every location in one request."""
+        api_url = f"{self.API_BASE_URL}?limit={self.forecast_snapshot.config.bulk_limit}"
+        print(f"Fetching all weather forecasts from: {api_url}")
+
+        try:
+            with span(self.name(), "weather_api_bulk"), self.breaker.guard():
+                async with get_session().get(
+                    api_url,
+                    timeout=aiohttp.ClientTimeout(total=self.BULK_REQUEST_TIMEOUT)
+                ) as response:
+                    response.raise_for_status()
+                    return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+            print(f"Error fetching weather data: {e}")
+            return None
+
+    async def _answer_from_snapshot(self, dispatcher: CollectingDispatcher, location: str) -> bool:
+        """Reply from the bulk snapshot; False if it cannot resolve ``location``."""
+        with span(self.name(), "forecast_snapshot"):
+            found = await self.forecast_snapshot.lookup(location, self._get_target_dates())
+        if found is None or found[0] is None:
+            return False
+
+        _, rows = found
+        for row in rows:
+            dispatcher.utter_message(text=WeatherForecast(*row).format_message())
+        if not rows:
+            dispatcher.utter_message(text=f"No weather forecast available for {location}.")
+        ACTION_RUNS.inc(self.name(), "answered" if rows else "no_forecast")
+        return True
+
+    async def run(
         self,
         dispatcher: CollectingDispatcher,
         tracker: Tracker,
@@ -87,10 +152,20 @@ class FetchWeather(Action):
             return []
 
         location = location.title()
-        weather_data = self._fetch_weather_data(location)
+        try:
+            with deadline(self.deadline_config.seconds):
+                # Unresolved names fall through to the API's substring search.
+                if self.forecast_snapshot.config.enabled and await self._answer_from_snapshot(dispatcher, location):
+                    return []
+
+                with span(self.name(), "forecast_cache"):
+                    weather_data = await self.forecast_cache.get(location)
+        except DeadlineExceeded:
+            weather_data = None
 
         if not weather_data:
             dispatcher.utter_message(text="Sorry, I couldn't fetch the weather data at the moment.")
+            ACTION_RUNS.inc(self.name(), "upstream_error")
             return []
 
         target_dates = self._get_target_dates()
@@ -106,4 +181,5 @@ class FetchWeather(Action):
         if not forecasts_sent:
             dispatcher.utter_message(text=f"No weather forecast available for {location}.")
 
+        ACTION_RUNS.inc(self.name(), "answered" if forecasts_sent else "no_forecast")
         return []
\ No newline at end of file
@@ -1,99 +1,108 @@
-import json
-import os
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
-
-import requests
-from dotenv import load_dotenv
-from pymilvus import Collection, connections
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 
-load_dotenv()
+from .cache_backend import get_shared_backend
+from .config import getenv
+from .embedding_batcher import EmbeddingBatcherConfig
+from .embedding_cache import EmbeddingCache, EmbeddingCacheConfig
+from .local_index import LocalIndexConfig, LocalVectorIndex, get_local_index
+from .metrics import ACTION_RUNS, LLM_CALLS_SAVED, REGISTRY, ensure_metrics_server, span
+from .milvus_manager import get_connection_manager, partition_for_role, role_filter
+from .openai_client import OpenAIClient, OpenAIConfig
+from .prompt_builder import PromptBuilder, PromptBuilderConfig
+from .partial_replies import PartialReplyConfig, PartialReplySink
+from .relevance_gate import RelevanceGate, RelevanceGateConfig
+from .resilience import CircuitOpenError, DeadlineConfig, DeadlineExceeded, deadline
+from .response_cache import ResponseCacheConfig, SemanticResponseCache
+from .warmup import WarmupConfig, warm_up
+
+# The relevance gate and the local index rank hits as squared L2 distances,
+# smaller being closer; IP and COSINE scores would invert both.
+SUPPORTED_METRICS = ('L2',)
 
 @dataclass
 class MilvusConfig:
     """Configuration for Milvus connection."""
     host: str = 'milvus-standalone-rasa'
     port: str = '19530'
+    # Overrides host/port, e.g. "http://localhost:19530"; a file path opens a Milvus Lite database.
+    uri: Optional[str] = field(default_factory=lambda: getenv("MILVUS_ADDRESS") or None)
     collection_name: str = 'rasa'
     username: str = 'rasabot'
     password: str = 'rasabot'
+    pool_size: int = 4
+    health_check_interval: float = 30.0
+    health_check_timeout: float = 5.0
+    max_health_failures: int = 2
+    search_workers: int = 32
+    # Upper bound for one search; the turn's remaining deadline may cut it shorter.
+    search_timeout: float = 5.0
+    # "filter": one collection, ARRAY_CONTAINS on permission per query.
+    # "partition": a copy with one partition per role (see tools.migrate_partitions).
+    layout: str = 'filter'
+    partitioned_collection_name: str = 'rasa_by_role'
+    # ANN index on the vector field; rebuild with tools.build_index after changing it.
+    vector_field: str = 'vector'
+    metric_type: str = 'L2'
+    index_type: str = 'HNSW'
+    index_build_params: Dict[str, Any] = field(default_factory=lambda: {"M": 16, "efConstruction": 200})
+    # Search-time knobs: ef for HNSW, nprobe for IVF_FLAT / IVF_SQ8.
+    search_ef: int = 64
+    search_nprobe: int = 16
+    top_k: int = 3
 
-@dataclass
-class OpenAIConfig:
-    """Configuration for OpenAI API."""
-    api_key: str = os.getenv("OPENAI_API_KEY", "")
-    embedding_model: str = "text-embedding-3-small"
-    chat_model: str = "gpt-4o-mini"
-    api_base: str = "https://api.openai.com/v1"
-    default_image: str = "https://cdn.pixabay.com/photo/2015/11/03/08/56/question-mark-1019820_1280.jpg"
-
-class OpenAIClient:
-    """Client for interacting with OpenAI API."""
-    
-    def __init__(self, config: OpenAIConfig):
-        self.config = config
-        self._validate_config()
-
-    def _validate_config(self) -> None:
-        """Validate API configuration."""
-        if not self.config.api_key:
-            raise ValueError("OpenAI API key not found in environment variables")
-
-    def _get_headers(self) -> Dict[str, str]:
-        """Get headers for API requests."""
-        return {
-            "Authorization": f"Bearer {self.config.api_key}",
-            "Content-Type": "application/json"
-        }
+    def __post_init__(self):
+        self.check_metric()
 
-    def get_embeddings(self, input_text: str) -> List[float]:
-        """Get embeddings for input text."""
-        try:
-            response = requests.post(
-                f"{self.config.api_base}/embeddings",
-                headers=self._get_headers(),
-                json={
-                    "model": self.config.embedding_model,
-                    "input": input_text
-                },
-                timeout=10
+    def check_metric(self) -> None:
+        """
+        Reject a metric the search pipeline cannot rank by.
+
+        Raises:
+            ValueError: If ``metric_type`` is not in ``SUPPORTED_METRICS``
+        """
+        if self.metric_type not in SUPPORTED_METRICS:
+            raise ValueError(
+                f"Unsupported metric_type {self.metric_type!r}; choose from {', '.join(SUPPORTED_METRICS)}"
             )
-            response.raise_for_status()
-            return response.json()["data"][0]["embedding"]
-        except requests.RequestException as e:
-            raise RuntimeError(f"Failed to get embeddings: {e}")
-
-    def get_chat_response(self, prompt: str, language: str) -> Tuple[Optional[str], Optional[str]]:
-        """Get chat completion response."""
-        payload = {
-            "model": self.config.chat_model,
-            "response_format": {"type": "json_object"},
-            "messages": [{
-                "role": "user",
-                "content": [{
-                    "type": "text",
-                    "text": prompt
-                }]
-            }]
+
+    def connection_args(self) -> Dict[str, Any]:
+        """Keyword arguments for ``connections.connect``."""
+        address = {"uri": self.uri} if self.uri else {"host": self.host, "port": self.port}
+        return {**address, "user": self.username, "password": self.password}
+
+    @property
+    def search_collection(self) -> str:
+        """Collection the action searches for the configured layout."""
+        return self.partitioned_collection_name if self.layout == 'partition' else self.collection_name
+
+    def index_params(self) -> Dict[str, Any]:
+        """Parameters for ``Collection.create_index`` on the vector field."""
+        return {
+            "index_type": self.index_type,
+            "metric_type": self.metric_type,
+            "params": dict(self.index_build_params)
         }
 
-        try:
-            response = requests.post(
-                f"{self.config.api_base}/chat/completions",
-                headers=self._get_headers(),
-                json=payload,
-                timeout=10
-            )
-            response.raise_for_status()
-            
-            content = json.loads(response.json()['choices'][0]['message']['content'])
-            return content.get('image_url'), content.get('text')
-            
-        except (requests.RequestException, json.JSONDecodeError, KeyError) as e:
-            print(f"Error in chat completion: {e}")
-            return None, None
+    def search_params(self) -> Dict[str, Any]:
+        """The ``param`` argument of ``Collection.search`` for the configured index."""
+        if self.index_type == 'HNSW':
+            # HNSW requires ef >= limit.
+            params = {"ef": max(self.search_ef, self.top_k)}
+        elif self.index_type.startswith('IVF'):
+            params = {"nprobe": self.search_nprobe}
+        else:
+            params = {}
+        return {"metric_type": self.metric_type, "params": params}
+
+    def role_scope(self, role: str) -> Dict[str, Any]:
+        """Search arguments restricting results to chunks visible to ``role``."""
+        if self.layout == 'partition':
+            return {"partition_names": [partition_for_role(role)]}
+        return {"expr": role_filter(role)}
 
 class MilvusSearchAction(Action):
     """Rasa action for searching Milvus vector database."""
@@ -101,51 +110,69 @@ class MilvusSearchAction(Action):
     def __init__(self):
         self.milvus_config = MilvusConfig()
         self.openai_config = OpenAIConfig()
-        self.openai_client = OpenAIClient(self.openai_config)
+        self.embedding_cache = EmbeddingCache(EmbeddingCacheConfig(), get_shared_backend())
+        self.milvus = get_connection_manager(self.milvus_config)
+        self.response_cache = SemanticResponseCache(ResponseCacheConfig())
+        self.relevance_gate = RelevanceGate(RelevanceGateConfig())
+        self.prompt_builder = PromptBuilder(PromptBuilderConfig(), self.openai_config.default_image)
+        self.deadline_config = DeadlineConfig()
+        self.partial_reply_config = PartialReplyConfig()
+        self.local_index_config = LocalIndexConfig()
+        # Created on first use, so registering the action does no I/O.
+        self._openai_client: Optional[OpenAIClient] = None
+        self._local_index: Optional[LocalVectorIndex] = None
+
+        REGISTRY.register_stats("rasa_embedding_cache", self.embedding_cache.stats)
+        REGISTRY.register_stats("rasa_response_cache", self.response_cache.stats)
+        REGISTRY.register_stats("rasa_relevance_gate", self.relevance_gate.stats)
+        REGISTRY.register_stats("rasa_milvus_single_flight", self.milvus.search_flight.stats)
+        ensure_metrics_server()
+
+        if WarmupConfig().enabled:
+            warm_up(self.name(), {
+                "openai_client": lambda: self.openai_client,
+                "tokenizer": self.prompt_builder.tokens.load,
+                "milvus_pool": self.milvus.start,
+                "local_index": lambda: self.local_index and self.local_index.snapshot(),
+            })
+
+    @property
+    def openai_client(self) -> OpenAIClient:
+        if self._openai_client is None:
+            self._openai_client = OpenAIClient(
+                self.openai_config,
+                embedding_cache=self.embedding_cache,
+                batcher_config=EmbeddingBatcherConfig()
+            )
+            REGISTRY.register_stats("rasa_embedding_batcher", self._openai_client.embedding_batcher.stats)
+            REGISTRY.register_stats("rasa_chat_single_flight", self._openai_client.chat_flight.stats)
+            REGISTRY.register_stats("rasa_chat_stream", self._openai_client.stream_stats)
+        return self._openai_client
+
+    @property
+    def local_index(self) -> Optional[LocalVectorIndex]:
+        """The host-local replica when enabled; its first snapshot load starts here."""
+        if self._local_index is None and self.local_index_config.enabled:
+            self._local_index = get_local_index(self.local_index_config, self.milvus)
+            REGISTRY.register_stats("rasa_local_index", self._local_index.stats)
+        return self._local_index
 
     def name(self) -> str:
         """Return action name."""
         return "action_milvus_search"
 
-    def _format_search_results(self, results: List[Any], user_input: str, language: str) -> str:
-        """Format search results for prompt."""
-        formatted_results = [
-            f"{{}}\n{result.entity.text}"
-            for result in results
-        ]
-        
-        output = "\n".join(
-            f"{i}. {result}"
-            for i, result in enumerate(formatted_results, start=1)
-        )
-
-        return (
-            f"Given the following information, please provide an answer based solely on one relevant "
-            f"document that best addresses the user's query.\n"
-            f"Reference only the most applicable document for the answer, and include any available "
-            f"images from the same document.\n"
-            f"If the document contains no image, use the placeholder image provided.\n\n"
-            f"===\nRelevant Documents\n{output}\n\n"
-            f"===\nCurrent Conversation\n"
-            f"Transcript of the current conversation, use it to determine the context of the question:\n"
-            f"USER:{user_input}\n\n"
-            f"===\n"
-            f"When answering, ensure that:\n"
-            f"- The answer is grounded in the provided documents and conversation context.\n"
-            f"- Always try to answer the query if applicable document or context is available, "
-            f"even if no image is provided.\n"
-            f"Keep responses concise (2 to 3 sentences) and within 200 - 300 words.\n"
-            f"- The information from the summarised document does not lose or change any of its meanings.\n"
-            f"- Do not refer to 'provided documents' in your response.\n"
-            f"- If an image is available from the chosen document, include its URL.\n"
-            f"- If no image is available in the referenced document, use the default placeholder URL:\n"
-            f"{self.openai_config.default_image}\n"
-            f"If the answer is not known or cannot be determined from the provided documents or context, "
-            f"please state that you do not know to the user.\n"
-            f"Your response should be in a json format with 'image_url' for the appropriate image url "
-            f"and 'text' for your answer.\n"
-            f"Your response should be in simple {language}."
-        )
+    async def _search_milvus(self, query_vec: List[float], user_role: str) -> List[Any]:
+        """Search Milvus for chunks visible to ``user_role`` under the configured layout."""
+        search_kwargs: Dict[str, Any] = {
+            "data": [query_vec],
+            "anns_field": self.milvus_config.vector_field,
+            "output_fields": ["text"],
+            "limit": self.milvus_config.top_k,
+            "param": self.milvus_config.search_params(),
+            **self.milvus_config.role_scope(user_role)
+        }
+
+        return (await self.milvus.search(**search_kwargs))[0]
 
     async def run(
         self,
@@ -154,44 +181,88 @@ class MilvusSearchAction(Action):
         domain: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
         """Execute the Milvus search action."""
+        action = self.name()
+        outcome = "error"
         try:
-            user_input = tracker.latest_message.get('text')
-            user_role = tracker.get_slot("user_role")
-            language = tracker.get_slot('language')
-
-            if not all([user_input, user_role, language]):
-                raise ValueError("Missing required slots: user_input, user_role, or language")
-
-            # Get embeddings for user input
-            query_vec = self.openai_client.get_embeddings(user_input)
-
-            # Connect to Milvus and search
-            connections.connect(
-                "default",
-                host=self.milvus_config.host,
-                port=self.milvus_config.port,
-                user=self.milvus_config.username,
-                password=self.milvus_config.password
-            )
+            with deadline(self.deadline_config.seconds):
+                user_input = tracker.latest_message.get('text')
+                user_role = tracker.get_slot("user_role")
+                language = tracker.get_slot('language')
+
+                if not all([user_input, user_role, language]):
+                    raise ValueError("Missing required slots: user_input, user_role, or language")
+
+                # Get embeddings for user input
+                with span(action, "embedding"):
+                    query_vec = await self.openai_client.get_embeddings(user_input)
 
-            collection = Collection(name=self.milvus_config.collection_name)
-            search_results = collection.search(
-                data=[query_vec],
-                anns_field="vector",
-                output_fields=["text"],
-                expr=f"ARRAY_CONTAINS(permission, '{user_role}')",
-                limit=3,
-                param={"metric_type": "L2", "params": {}}
-            )[0]
-
-            # Format prompt and get OpenAI response
-            prompt = self._format_search_results(search_results, user_input, language)
-            image_url, text = self.openai_client.get_chat_response(prompt, language)
-
-            if text:
-                dispatcher.utter_message(text=text, image=image_url or self.openai_config.default_image)
-            else:
-                dispatcher.utter_message(text="I apologize, but I couldn't process your request at this time.")
+                # Serve near-duplicate questions from the role/language scoped cache
+                with span(action, "response_cache"):
+                    self.response_cache.sync_generation(self.milvus.corpus_generation)
+                    cached = self.response_cache.lookup(user_role, language, query_vec)
+                if cached:
+                    image_url, text = cached
+                    dispatcher.utter_message(text=text, image=image_url or self.openai_config.default_image)
+                    LLM_CALLS_SAVED.inc(action, "response_cache")
+                    outcome = "cache_hit"
+                    return []
+
+                # Prefer the host-local replica; fall back to Milvus when it is missing or stale
+                search_results = None
+                if self.local_index is not None:
+                    with span(action, "local_search"):
+                        search_results = await self.local_index.search(
+                            query_vec, user_role, limit=self.milvus_config.top_k
+                        )
+
+                if search_results is None:
+                    # Search on a pooled connection, off the event loop
+                    with span(action, "milvus_search"):
+                        search_results = await self._search_milvus(query_vec, user_role)
+
+                # Answer "nothing found" directly instead of asking the model to say so
+                search_results = self.relevance_gate.select(search_results)
+                if not search_results:
+                    dispatcher.utter_message(response="utter_no_relevant_documents")
+                    LLM_CALLS_SAVED.inc(action, "relevance_gate")
+                    outcome = "no_relevant_documents"
+                    return []
+
+                # Format prompt and get OpenAI response
+                with span(action, "prompt"):
+                    prompt = self.prompt_builder.build(
+                        [result.entity.text for result in search_results], user_input, language
+                    )
+                # Streamed answers reach the user through the relay before the final reply
+                partial = None
+                if self.openai_config.stream and self.partial_reply_config.url:
+                    partial = PartialReplySink(self.partial_reply_config, tracker.sender_id, action)
+                try:
+                    with span(action, "chat_completion"):
+                        image_url, text = await self.openai_client.get_chat_response(
+                            prompt.user, language, system=prompt.system, on_text=partial
+                        )
+                finally:
+                    if partial is not None:
+                        partial.close()
+
+                if text:
+                    self.response_cache.store(user_role, language, query_vec, image_url, text)
+                    dispatcher.utter_message(text=text, image=image_url or self.openai_config.default_image)
+                    outcome = "answered"
+                else:
+                    dispatcher.utter_message(text="I apologize, but I couldn't process your request at this time.")
+                    outcome = "no_answer"
+
+        except DeadlineExceeded:
+            print("MilvusSearchAction ran out of time")
+            dispatcher.utter_message(text="This is taking longer than expected. Please try again in a moment.")
+            outcome = "deadline_exceeded"
+
+        except CircuitOpenError as e:
+            print(f"Error in MilvusSearchAction: {str(e)}")
+            dispatcher.utter_message(text="The service is temporarily unavailable. Please try again in a moment.")
+            outcome = "circuit_open"
 
         except Exception as e:
             print(f"Error in MilvusSearchAction: {str(e)}")
@@ -200,6 +271,6 @@ class MilvusSearchAction(Action):
             )
 
         finally:
-            connections.disconnect("default")
+            ACTION_RUNS.inc(action, outcome)
 
         return []
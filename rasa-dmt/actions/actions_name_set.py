@@ -7,7 +7,7 @@ class NameSet(Action):
     def name(self) -> str:
         return "action_name_set"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[str, Any]):
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[str, Any]):
 
         username = tracker.latest_message['entities'][0]['value']
         role = tracker.latest_message['entities'][1]['value']
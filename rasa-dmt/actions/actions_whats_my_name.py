@@ -7,7 +7,7 @@ class WhatsMyName(Action):
     def name(self) -> str:
         return "action_whats_my_name"
 
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[str, Any]):
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, domain: Dict[str, Any]):
 
         username = tracker.get_slot("user_account")
         role = tracker.get_slot("user_role")
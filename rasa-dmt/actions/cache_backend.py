@@ -0,0 +1,537 @@
+import asyncio
+import json
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from .config import getenv
+from .metrics import REGISTRY
+from .resilience import CircuitOpenError, get_breaker
+
+
+@dataclass
+class CacheBackendConfig:
+    """Where the action server's caches keep state shared between workers."""
+    # "memory" keeps every cache private to its process; "disk" and "redis" share it.
+    kind: str = field(
+        default_factory=lambda: getenv("CACHE_BACKEND")
+        or ("disk" if getenv("EMBEDDING_CACHE_PATH") else "memory")
+    )
+    # SQLite file for "disk"; put it on /dev/shm to keep it in shared memory.
+    path: str = field(
+        default_factory=lambda: getenv("CACHE_PATH")
+        or getenv("EMBEDDING_CACHE_PATH")
+        or "/tmp/rasa-cache.sqlite3"
+    )
+    redis_url: str = field(default_factory=lambda: getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    key_prefix: str = "rasa"
+    # Per round trip; a slow cache must cost less than the miss it saves.
+    redis_timeout: float = 0.25
+    # Writes to a namespace between sweeps that enforce its size limits.
+    prune_every: int = 1000
+
+
+@dataclass
+class NamespaceConfig:
+    """TTL and size limits of one cache namespace; None means unbounded."""
+    ttl_seconds: Optional[float] = None
+    max_entries: Optional[int] = None
+    # Sum of value sizes; the Redis backend leaves this to the server's maxmemory.
+    max_bytes: Optional[int] = None
+
+
+def encode_json(value: Any, compress_above: int = 1024) -> bytes:
+    """Compact JSON, zlib-compressed when it is large enough to pay off."""
+    raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(raw) > compress_above:
+        return b"z" + zlib.compress(raw, 6)
+    return b"j" + raw
+
+
+def decode_json(blob: bytes) -> Any:
+    """Inverse of ``encode_json``."""
+    raw = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+    return json.loads(raw)
+
+
+class CacheBackend(ABC):
+    """
+    Byte-valued key/value store partitioned into namespaces.
+
+    Every namespace has its own TTL and size limits, set when a cache opens it
+    with ``namespace``. Values are opaque bytes; callers pick a compact
+    encoding (packed float32 for vectors, ``encode_json`` for the rest).
+    """
+
+    # Whether calls wait on I/O or other processes, in which case async callers run them in a thread.
+    blocking = False
+
+    def __init__(self):
+        self.limits: Dict[str, NamespaceConfig] = {}
+        self.errors = 0
+
+    def namespace(self, name: str, limits: NamespaceConfig) -> 'CacheNamespace':
+        self.limits[name] = limits
+        return CacheNamespace(self, name)
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """The live value stored under ``key``, or None."""
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store ``value``; ``ttl`` can only shorten the namespace's TTL."""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> None:
+        """Remove ``key`` if it is stored."""
+
+    def _ttl(self, namespace: str, ttl: Optional[float]) -> Optional[float]:
+        limit = self.limits.get(namespace, NamespaceConfig()).ttl_seconds
+        if ttl is None or (limit is not None and limit < ttl):
+            return limit
+        return ttl
+
+    def stats(self) -> Dict[str, float]:
+        return {"errors": self.errors}
+
+
+class CacheNamespace:
+    """
+    One namespace of a backend, as seen by a cache.
+
+    Backend failures are logged and treated as misses: a cache that is down
+    must never fail the turn it was meant to speed up.
+    """
+
+    def __init__(self, backend: CacheBackend, name: str):
+        self.backend = backend
+        self.name = name
+
+    def _failed(self, operation: str, error: Exception) -> None:
+        self.backend.errors += 1
+        if not isinstance(error, CircuitOpenError):
+            print(f"Cache {operation} in {self.name} failed: {str(error)}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.backend.get(self.name, key)
+        except Exception as e:
+            self._failed("get", e)
+            return None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        try:
+            self.backend.set(self.name, key, value, ttl)
+        except Exception as e:
+            self._failed("set", e)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.backend.delete(self.name, key)
+        except Exception as e:
+            self._failed("delete", e)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        """``get`` without blocking the event loop on a network backend."""
+        if not self.backend.blocking:
+            return self.get(key)
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, key)
+
+    def set_soon(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """``set`` that returns immediately; network writes finish in a thread."""
+        if not self.backend.blocking:
+            self.set(key, value, ttl)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.set(key, value, ttl)
+            return
+        loop.run_in_executor(None, self.set, key, value, ttl)
+
+    def delete_soon(self, key: str) -> None:
+        """``delete`` that returns immediately; network deletes finish in a thread."""
+        if not self.backend.blocking:
+            self.delete(key)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.delete(key)
+            return
+        loop.run_in_executor(None, self.delete, key)
+
+
+class _MemoryNamespace:
+
+    def __init__(self, limits: NamespaceConfig):
+        self.limits = limits
+        # key -> (value, monotonic expiry or None)
+        self.entries: 'OrderedDict[str, Tuple[bytes, Optional[float]]]' = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+
+    def pop(self, key: str) -> None:
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= len(previous[0])
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Process-local LRU per namespace.
+
+    This is the first tier of every cache, and the only one unless a shared
+    backend is configured.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._namespaces: Dict[str, _MemoryNamespace] = {}
+        self._lock = threading.Lock()
+
+    def namespace(self, name: str, limits: NamespaceConfig) -> CacheNamespace:
+        with self._lock:
+            self._namespaces[name] = _MemoryNamespace(limits)
+        return super().namespace(name, limits)
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        with self._lock:
+            space = self._namespaces[namespace]
+            entry = space.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                space.pop(key)
+                return None
+            space.entries.move_to_end(key)
+            return value
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ttl = self._ttl(namespace, ttl)
+        with self._lock:
+            space = self._namespaces[namespace]
+            limits = space.limits
+            space.pop(key)
+            if limits.max_bytes is not None and len(value) > limits.max_bytes:
+                return
+            space.entries[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+            space.bytes += len(value)
+            while (
+                (limits.max_entries is not None and len(space.entries) > limits.max_entries)
+                or (limits.max_bytes is not None and space.bytes > limits.max_bytes)
+            ):
+                _, (evicted, _) = space.entries.popitem(last=False)
+                space.bytes -= len(evicted)
+                space.evictions += 1
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._namespaces[namespace].pop(key)
+
+    def namespace_stats(self, namespace: str) -> Dict[str, int]:
+        with self._lock:
+            space = self._namespaces[namespace]
+            return {"entries": len(space.entries), "bytes": space.bytes, "evictions": space.evictions}
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    SQLite file shared by every worker on the host.
+
+    The database runs in WAL mode so concurrent readers in other processes
+    never block on a writer. Expiry uses wall-clock time, which all processes
+    agree on; size limits are enforced every ``prune_every`` writes. Calls
+    can wait up to the busy timeout for another process's write, and a prune
+    rewrites a whole namespace, so async callers run them in a thread.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, prune_every: int = 1000):
+        super().__init__()
+        self.path = path
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "expires REAL, created REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_age ON cache (namespace, created)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND (expires IS NULL OR expires > ?)",
+            (namespace, key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ttl = self._ttl(namespace, ttl)
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires, created) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, value, now + ttl if ttl is not None else None, now)
+        )
+        with self._lock:
+            writes = self._writes[namespace] = self._writes.get(namespace, 0) + 1
+        if writes % self.prune_every == 0:
+            self.prune(namespace)
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._connection().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def prune(self, namespace: str) -> None:
+        """Drop expired entries, then the oldest ones beyond the namespace's limits."""
+        limits = self.limits.get(namespace, NamespaceConfig())
+        conn = self._connection()
+        conn.execute("DELETE FROM cache WHERE namespace = ? AND expires <= ?", (namespace, time.time()))
+        if limits.max_entries is not None:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN "
+                "(SELECT key FROM cache WHERE namespace = ? ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (namespace, namespace, limits.max_entries)
+            )
+        if limits.max_bytes is not None:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN (SELECT key FROM "
+                "(SELECT key, SUM(LENGTH(value)) OVER (ORDER BY created DESC) AS total "
+                "FROM cache WHERE namespace = ?) WHERE total > ?)",
+                (namespace, namespace, limits.max_bytes)
+            )
+
+
+class RespError(Exception):
+    """An error reply from a Redis-protocol server."""
+
+
+class RespConnection:
+    """
+    One blocking connection speaking RESP2, the Redis wire protocol.
+
+    Works against Redis, Valkey, KeyDB and ``benchmarks.fake_redis`` without
+    a client library. Several commands sent in one ``execute`` call share a
+    round trip (pipelining).
+    """
+
+    def __init__(self, url: str, timeout: float):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported cache URL scheme: {parsed.scheme}")
+        self._sock = socket.create_connection((parsed.hostname or "localhost", parsed.port or 6379), timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+
+        setup: List[Tuple] = []
+        if parsed.password:
+            credentials = (unquote(parsed.username), unquote(parsed.password)) if parsed.username else (
+                unquote(parsed.password),
+            )
+            setup.append(("AUTH",) + credentials)
+        database = parsed.path.strip("/")
+        if database and database != "0":
+            setup.append(("SELECT", database))
+        if setup:
+            self.execute(*setup)
+
+    @staticmethod
+    def _encode(command: Tuple) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            if isinstance(arg, str):
+                arg = arg.encode("utf-8")
+            elif not isinstance(arg, bytes):
+                arg = str(arg).encode("ascii")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read(self) -> Any:
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the cache server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode("utf-8")
+        if kind == b"-":
+            return RespError(payload.decode("utf-8"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Connection closed by the cache server")
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from the cache server: {line[:20]!r}")
+
+    def execute(self, *commands: Tuple) -> List[Any]:
+        """
+        Send ``commands`` in one round trip and return their replies.
+
+        Raises:
+            RespError: If any command failed (after all replies are read)
+        """
+        self._sock.sendall(b"".join(self._encode(command) for command in commands))
+        replies = [self._read() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def close(self) -> None:
+        try:
+            self._reader.close()
+            self._sock.close()
+        except OSError:
+            pass
+
+
+class RedisBackend(CacheBackend):
+    """
+    Redis-protocol store shared by every worker that can reach the server.
+
+    Keys are ``<prefix>:<namespace>:<key>`` and expire through ``PX``. A
+    namespace with ``max_entries`` also keeps a sorted set of its keys by
+    write time, trimmed every ``prune_every`` writes. Each thread has its own
+    connection; calls go through the ``cache`` circuit breaker so an
+    unreachable server costs one timeout, not one per lookup.
+    """
+
+    blocking = True
+
+    def __init__(self, url: str, key_prefix: str = "rasa", timeout: float = 0.25, prune_every: int = 1000):
+        super().__init__()
+        self.url = url
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self.prune_every = prune_every
+        self.breaker = get_breaker("cache")
+        self._local = threading.local()
+        self._writes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.key_prefix}:{namespace}:{key}"
+
+    def _index(self, namespace: str) -> str:
+        return f"{self.key_prefix}:{namespace}:__index__"
+
+    def _execute(self, *commands: Tuple) -> List[Any]:
+        with self.breaker.guard():
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = RespConnection(self.url, self.timeout)
+            try:
+                return conn.execute(*commands)
+            except (OSError, ConnectionError):
+                # The stream may be out of step with the replies; reconnect next time.
+                conn.close()
+                self._local.conn = None
+                raise
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        return self._execute(("GET", self._key(namespace, key)))[0]
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ttl = self._ttl(namespace, ttl)
+        limits = self.limits.get(namespace, NamespaceConfig())
+        name = self._key(namespace, key)
+        command: Tuple = ("SET", name, value)
+        if ttl is not None:
+            command += ("PX", max(1, int(ttl * 1000)))
+        commands = [command]
+        if limits.max_entries is not None:
+            commands.append(("ZADD", self._index(namespace), repr(time.time()), name))
+        self._execute(*commands)
+
+        if limits.max_entries is None:
+            return
+        with self._lock:
+            writes = self._writes[namespace] = self._writes.get(namespace, 0) + 1
+        if writes % self.prune_every == 0:
+            self.prune(namespace)
+
+    def delete(self, namespace: str, key: str) -> None:
+        name = self._key(namespace, key)
+        self._execute(("DEL", name), ("ZREM", self._index(namespace), name))
+
+    def prune(self, namespace: str) -> None:
+        """Trim the namespace's index to ``max_entries``, deleting the oldest keys."""
+        limits = self.limits.get(namespace, NamespaceConfig())
+        if limits.max_entries is None:
+            return
+        index = self._index(namespace)
+        commands: List[Tuple] = []
+        if limits.ttl_seconds is not None:
+            # Members whose keys have already expired.
+            commands.append(("ZREMRANGEBYSCORE", index, "-inf", repr(time.time() - limits.ttl_seconds)))
+        commands.append(("ZCARD", index))
+        overflow = self._execute(*commands)[-1] - limits.max_entries
+        if overflow <= 0:
+            return
+        oldest = self._execute(("ZRANGE", index, 0, overflow - 1))[0]
+        if oldest:
+            self._execute(("DEL",) + tuple(oldest), ("ZREMRANGEBYRANK", index, 0, len(oldest) - 1))
+
+
+def open_backend(config: CacheBackendConfig) -> CacheBackend:
+    """Build the backend named by ``config.kind``."""
+    if config.kind == "memory":
+        return MemoryBackend()
+    if config.kind == "disk":
+        return SQLiteBackend(config.path, config.prune_every)
+    if config.kind == "redis":
+        return RedisBackend(config.redis_url, config.key_prefix, config.redis_timeout, config.prune_every)
+    raise ValueError(f"Unknown cache backend: {config.kind}")
+
+
+_shared: Optional[CacheBackend] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_backend() -> Optional[CacheBackend]:
+    """
+    The process-wide backend that caches share between workers.
+
+    Returns:
+        None when ``CACHE_BACKEND`` is "memory" (the default), i.e. every
+        cache stays private to its process
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            config = CacheBackendConfig()
+            if config.kind == "memory":
+                return None
+            _shared = open_backend(config)
+            REGISTRY.register_stats("rasa_cache_backend", _shared.stats)
+        return _shared
@@ -0,0 +1,46 @@
+import os
+import threading
+from typing import Optional
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env(override: bool = False) -> None:
+    """
+    Load ``.env`` into the process environment, once.
+
+    Every config dataclass reads its settings through ``getenv`` when it is
+    instantiated, so this is the only place the file is parsed. Call
+    ``reload_env`` to pick up an edited file; configs created afterwards see
+    the new values.
+    """
+    global _loaded
+    with _lock:
+        if _loaded and not override:
+            return
+        try:
+            from dotenv import load_dotenv
+        except ImportError:
+            # python-dotenv is a convenience for local runs; containers pass real env vars.
+            pass
+        else:
+            load_dotenv(override=override)
+        _loaded = True
+
+
+def reload_env() -> None:
+    """Re-read ``.env``, overriding values loaded from it before."""
+    load_env(override=True)
+
+
+def getenv(name: str, default: Optional[str] = None) -> Optional[str]:
+    """``os.getenv`` after making sure ``.env`` has been loaded."""
+    if not _loaded:
+        load_env()
+    return os.getenv(name, default)
+
+
+def env_flag(name: str) -> bool:
+    """Whether the environment variable ``name`` is set to a truthy value."""
+    return (getenv(name, "") or "").lower() in ("1", "true", "yes")
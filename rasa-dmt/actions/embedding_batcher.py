@@ -0,0 +1,135 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .metrics import percentile
+from .resilience import bounded, current_deadline, deadline_at
+
+
+@dataclass
+class EmbeddingBatcherConfig:
+    """Configuration for coalescing concurrent embedding requests."""
+    window_ms: float = 5.0
+    max_batch_size: int = 64
+
+
+BatchFetcher = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+def _later(a: Optional[float], b: Optional[float]) -> Optional[float]:
+    """The later of two deadlines, None (no deadline) being the latest."""
+    return None if a is None or b is None else max(a, b)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesce concurrent embedding requests into one ``/embeddings`` call.
+
+    The first request opens a short window; every request arriving before it
+    closes (or before the batch is full) rides along in the same upstream
+    call. Identical texts that are already queued or in flight share a single
+    slot in the batch. A batch runs under the latest deadline of the turns
+    waiting on it, so an impatient turn does not cut it short for the
+    others; each caller still stops waiting at its own deadline.
+    """
+
+    def __init__(self, fetch: BatchFetcher, config: EmbeddingBatcherConfig):
+        self.fetch = fetch
+        self.config = config
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._queue: List[Tuple[str, float]] = []
+        # Latest deadline among the callers waiting on each queued text.
+        self._expires: Dict[str, Optional[float]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.batches = 0
+        self.items = 0
+        self.deduplicated = 0
+        self._batch_sizes: Deque[int] = deque(maxlen=1024)
+        self._queue_delays: Deque[float] = deque(maxlen=1024)
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        """Bind to the running loop, dropping state left over from a previous one."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._pending = {}
+            self._queue = []
+            self._expires = {}
+            self._timer = None
+        return loop
+
+    async def embed(self, text: str) -> List[float]:
+        """Return the embedding for ``text`` via the next batch."""
+        loop = self._bind_loop()
+        expires = current_deadline()
+        future = self._pending.get(text)
+        if future is not None:
+            self.deduplicated += 1
+            if text in self._expires:
+                self._expires[text] = _later(self._expires[text], expires)
+        else:
+            future = loop.create_future()
+            self._pending[text] = future
+            self._expires[text] = expires
+            self._queue.append((text, time.perf_counter()))
+            if len(self._queue) >= self.config.max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.config.window_ms / 1000, self._flush)
+
+        # Shield the shared future so one cancelled caller does not fail the others.
+        return await bounded(asyncio.shield(future))
+
+    def _flush(self) -> None:
+        """Send everything queued so far as one or more full batches."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue:
+            batch = self._queue[:self.config.max_batch_size]
+            del self._queue[:self.config.max_batch_size]
+            asyncio.ensure_future(self._send(batch))
+
+    async def _send(self, batch: List[Tuple[str, float]]) -> None:
+        """Fetch one batch and resolve each waiting caller."""
+        now = time.perf_counter()
+        texts = [text for text, _ in batch]
+        self.batches += 1
+        self.items += len(texts)
+        self._batch_sizes.append(len(texts))
+        self._queue_delays.extend(now - queued for _, queued in batch)
+        expires = [self._expires.pop(text, None) for text in texts]
+        latest = None if None in expires else max(expires)
+
+        try:
+            with deadline_at(latest):
+                vectors = await self.fetch(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Embedding response has {len(vectors)} vectors for {len(texts)} inputs")
+        except Exception as e:
+            for text in texts:
+                future = self._pending.pop(text, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for text, vector in zip(texts, vectors):
+            future = self._pending.pop(text, None)
+            if future is not None and not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> Dict[str, float]:
+        """Batch size and queueing delay figures for tuning the window."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "deduplicated": self.deduplicated,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "p99_batch_size": percentile(self._batch_sizes, 99),
+            "p50_queue_delay_ms": round(percentile(self._queue_delays, 50) * 1000, 3),
+            "p99_queue_delay_ms": round(percentile(self._queue_delays, 99) * 1000, 3),
+        }
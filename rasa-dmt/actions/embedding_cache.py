@@ -0,0 +1,95 @@
+import hashlib
+import unicodedata
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from .cache_backend import CacheBackend, MemoryBackend, NamespaceConfig
+
+
+@dataclass
+class EmbeddingCacheConfig:
+    """Configuration for the embedding cache."""
+    max_bytes: int = 64 * 1024 * 1024
+    # Limits of the "embeddings" namespace in the shared cache backend.
+    shared_ttl_seconds: float = 30 * 24 * 60 * 60
+    shared_max_entries: int = 1_000_000
+
+
+def normalize_text(text: str) -> str:
+    """Normalize user text so trivially different spellings share a cache entry."""
+    return " ".join(unicodedata.normalize("NFKC", text).split()).casefold()
+
+
+def cache_key(model: str, text: str) -> str:
+    """Build the cache key from the embedding model and normalized text."""
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def pack_vector(vector: Sequence[float]) -> bytes:
+    """Store a vector as packed float32."""
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(blob: bytes) -> List[float]:
+    """Decode a packed float32 vector."""
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache for query embeddings.
+
+    The first tier is an in-process LRU bounded by the total size of the packed
+    float32 vectors it holds. The optional second tier is the shared cache
+    backend (a SQLite file or a Redis-protocol server) that survives restarts
+    and is shared by all workers; shared hits are promoted into memory.
+    """
+
+    def __init__(self, config: EmbeddingCacheConfig, shared: Optional[CacheBackend] = None):
+        self.config = config
+        self._memory = MemoryBackend()
+        self._local = self._memory.namespace("embeddings", NamespaceConfig(max_bytes=config.max_bytes))
+        self._shared = shared.namespace("embeddings", NamespaceConfig(
+            ttl_seconds=config.shared_ttl_seconds, max_entries=config.shared_max_entries
+        )) if shared is not None else None
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    async def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Return the cached embedding for ``text`` or None."""
+        key = cache_key(model, text)
+        blob = self._local.get(key)
+        if blob is not None:
+            self.memory_hits += 1
+            return unpack_vector(blob)
+
+        if self._shared is not None:
+            blob = await self._shared.aget(key)
+            if blob is not None:
+                self._local.set(key, blob)
+                self.shared_hits += 1
+                return unpack_vector(blob)
+
+        self.misses += 1
+        return None
+
+    def put(self, model: str, text: str, vector: Sequence[float]) -> None:
+        """Store an embedding in both tiers."""
+        key = cache_key(model, text)
+        blob = pack_vector(vector)
+        self._local.set(key, blob)
+        if self._shared is not None:
+            self._shared.set_soon(key, blob)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for sizing the cache."""
+        return {
+            "memory_hits": self.memory_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            **self._memory.namespace_stats("embeddings"),
+        }
@@ -0,0 +1,193 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .cache_backend import CacheBackend, NamespaceConfig, decode_json, encode_json
+from .embedding_cache import normalize_text
+from .resilience import bounded, without_deadline
+
+Forecasts = List[Dict[str, Any]]
+ForecastFetcher = Callable[[str], Awaitable[Optional[Forecasts]]]
+
+
+@dataclass
+class ForecastCacheConfig:
+    """Configuration for the weather forecast cache."""
+    enabled: bool = True
+    # Entries younger than this are served without contacting the API.
+    ttl_seconds: float = 30 * 60
+    # Older entries are still served, up to this age, while one refresh runs.
+    stale_ttl_seconds: float = 6 * 60 * 60
+    max_entries: int = 512
+    # Entries kept in the shared cache backend, for all workers together.
+    shared_max_entries: int = 4096
+
+
+@dataclass
+class _Entry:
+    forecasts: Forecasts
+    fetched: float
+
+
+def normalize_location(location: str) -> str:
+    """Cache key for a location as users type it."""
+    return normalize_text(location)
+
+
+class ForecastCache:
+    """
+    LRU cache of forecast lists per location with stale-while-revalidate.
+
+    A fresh entry is returned directly. A stale one is returned as well, and a
+    single background refresh replaces it. Misses for the same location that
+    arrive while a fetch is in flight wait for that fetch instead of starting
+    their own. Failed fetches (``None``) are never cached; a stale entry stays
+    in place until a refresh succeeds.
+
+    With a shared cache backend, every fetch first checks whether another
+    worker fetched the location recently, and a failed fetch falls back to
+    another worker's stale copy.
+    """
+
+    def __init__(self, config: ForecastCacheConfig, fetch: ForecastFetcher,
+                 shared: Optional[CacheBackend] = None):
+        self.config = config
+        self.fetch = fetch
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._shared = shared.namespace("forecasts", NamespaceConfig(
+            ttl_seconds=config.stale_ttl_seconds, max_entries=config.shared_max_entries
+        )) if shared is not None else None
+        self.hits = 0
+        self.stale_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.fetch_failures = 0
+        self.evictions = 0
+
+    def _bind_loop(self) -> None:
+        """Bind to the running loop, dropping fetches started on a previous one."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._inflight = {}
+
+    async def get(self, location: str) -> Optional[Forecasts]:
+        """
+        Forecasts for ``location`` from the cache, or from the API on a miss.
+
+        Raises:
+            DeadlineExceeded: If a miss is not fetched within the turn's deadline
+        """
+        if not self.config.enabled:
+            return await self.fetch(location)
+
+        self._bind_loop()
+        key = normalize_location(location)
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched
+            if age < self.config.ttl_seconds:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.forecasts
+            if age < self.config.stale_ttl_seconds:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    # Nobody waits for this refresh, so the current turn's deadline does not apply.
+                    with without_deadline():
+                        self._start_fetch(key, location)
+                return entry.forecasts
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._start_fetch(key, location)
+        else:
+            self.coalesced += 1
+        # Shield the shared fetch so one cancelled caller does not cancel the others.
+        return await bounded(asyncio.shield(task))
+
+    def _start_fetch(self, key: str, location: str) -> asyncio.Task:
+        task = asyncio.ensure_future(self._fetch_and_store(key, location))
+        self._inflight[key] = task
+        return task
+
+    async def _fetch_and_store(self, key: str, location: str) -> Optional[Forecasts]:
+        age = 0.0
+        try:
+            shared = await self._load_shared(key)
+            if shared is not None and shared[1] < self.config.ttl_seconds:
+                forecasts, age = shared
+                self.shared_hits += 1
+            else:
+                forecasts = await self._fetch(location)
+                if forecasts is not None:
+                    self._store_shared(key, forecasts)
+                elif shared is not None:
+                    # Another worker's stale copy beats no answer while the API is failing.
+                    forecasts, age = shared
+                    self.shared_hits += 1
+        finally:
+            self._inflight.pop(key, None)
+
+        if forecasts is None:
+            return None
+        self._entries[key] = _Entry(forecasts, time.monotonic() - age)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return forecasts
+
+    async def _fetch(self, location: str) -> Optional[Forecasts]:
+        try:
+            forecasts = await self.fetch(location)
+        except Exception as e:
+            print(f"Forecast fetch for {location} failed: {str(e)}")
+            forecasts = None
+        if forecasts is None:
+            self.fetch_failures += 1
+        return forecasts
+
+    async def _load_shared(self, key: str) -> Optional[Tuple[Forecasts, float]]:
+        """Another worker's forecasts for ``key`` and their age in seconds."""
+        if self._shared is None:
+            return None
+        blob = await self._shared.aget(key)
+        if blob is None:
+            return None
+        try:
+            entry = decode_json(blob)
+            return entry["forecasts"], max(0.0, time.time() - float(entry["fetched"]))
+        except Exception as e:
+            # A corrupt or foreign value is a miss; drop it so other workers stop tripping on it.
+            print(f"Ignoring shared forecast cache entry for {key}: {str(e)}")
+            self._shared.delete_soon(key)
+            return None
+
+    def _store_shared(self, key: str, forecasts: Forecasts) -> None:
+        if self._shared is not None:
+            self._shared.set_soon(key, encode_json({"fetched": time.time(), "forecasts": forecasts}))
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "fetch_failures": self.fetch_failures,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
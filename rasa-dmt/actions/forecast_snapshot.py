@@ -0,0 +1,240 @@
+import asyncio
+import difflib
+import json
+import os
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from .config import env_flag, getenv
+from .embedding_cache import normalize_text
+from .resilience import bounded, without_deadline
+
+BulkFetcher = Callable[[], Awaitable[Optional[List[Dict[str, Any]]]]]
+
+
+@dataclass
+class ForecastSnapshotConfig:
+    """Configuration for answering weather questions from a bulk forecast download."""
+    enabled: bool = field(default_factory=lambda: env_flag("WEATHER_SNAPSHOT_ENABLED"))
+    path: str = field(default_factory=lambda: getenv("WEATHER_SNAPSHOT_PATH", "/tmp/rasa-weather-snapshot.json"))
+    refresh_interval: float = 30 * 60
+    # Rows requested per bulk download; the whole national dataset is a few thousand.
+    bulk_limit: int = 20000
+    fuzzy_cutoff: float = 0.75
+    prefix_candidates: int = 50
+
+
+class ForecastRow(NamedTuple):
+    """One location-day, in ``WeatherForecast`` argument order."""
+    date: str
+    location_name: str
+    summary_forecast: str
+    summary_when: str
+    min_temp: float
+    max_temp: float
+
+
+def _deletions(name: str) -> Set[str]:
+    """``name`` with any one character removed."""
+    return {name[:i] + name[i + 1:] for i in range(len(name))}
+
+
+class LocationIndex:
+    """
+    Forecast rows indexed by (normalized location name, date).
+
+    Exact names resolve with one dict lookup; prefixes of the name or of any
+    later word in it ("lumpur" for "Kuala Lumpur") by bisecting a sorted key
+    list; single-typo misspellings through a table of one-character deletions
+    (a swap, insertion, deletion or substitution leaves both spellings with a
+    deletion in common), ranked by ``difflib``. None of these scan all
+    locations, so lookup cost does not grow with the dataset.
+    """
+
+    def __init__(self, rows: Sequence[Dict[str, Any]], fuzzy_cutoff: float = 0.75, prefix_candidates: int = 50):
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.prefix_candidates = prefix_candidates
+        self.by_name: Dict[str, Dict[str, List[ForecastRow]]] = {}
+        for row in rows:
+            try:
+                forecast = ForecastRow(
+                    row['date'], row['location']['location_name'], row['summary_forecast'],
+                    row['summary_when'], row['min_temp'], row['max_temp']
+                )
+            except (KeyError, TypeError):
+                continue
+            days = self.by_name.setdefault(normalize_text(forecast.location_name), {})
+            days.setdefault(forecast.date, []).append(forecast)
+        self.names = sorted(self.by_name)
+        self._prefix_keys: List[Tuple[str, str]] = sorted(
+            (" ".join(words[i:]), name)
+            for name in self.names
+            for words in [name.split(" ")]
+            for i in range(len(words))
+        )
+        self._deleted: Dict[str, List[str]] = {}
+        for name in self.names:
+            for variant in _deletions(name) | {name}:
+                self._deleted.setdefault(variant, []).append(name)
+        self.rows = sum(len(day) for days in self.by_name.values() for day in days.values())
+
+    def resolve(self, location: str) -> Optional[str]:
+        """The indexed name ``location`` refers to: exact, then prefix, then fuzzy."""
+        query = normalize_text(location)
+        if not query:
+            return None
+        if query in self.by_name:
+            return query
+
+        start = bisect_left(self._prefix_keys, (query, ""))
+        prefixed = []
+        for key, name in self._prefix_keys[start:start + self.prefix_candidates]:
+            if not key.startswith(query):
+                break
+            prefixed.append((key != name, len(name), name))
+        if prefixed:
+            # Whole-name prefixes beat later-word ones, then the shortest name wins.
+            return min(prefixed)[2]
+
+        candidates: Set[str] = set()
+        for variant in _deletions(query) | {query}:
+            candidates.update(self._deleted.get(variant, ()))
+        matches = difflib.get_close_matches(query, candidates, n=1, cutoff=self.fuzzy_cutoff)
+        return matches[0] if matches else None
+
+    def lookup(self, location: str, dates: Sequence[str]) -> Tuple[Optional[str], List[ForecastRow]]:
+        """Resolve ``location`` and return its rows for ``dates``, in date order."""
+        name = self.resolve(location)
+        if name is None:
+            return None, []
+        days = self.by_name[name]
+        return name, [row for date in dates for row in days.get(date, [])]
+
+
+class ForecastSnapshot:
+    """
+    The full forecast dataset, refreshed in bulk and kept on disk.
+
+    The first lookup in a process loads the file written by the last refresh
+    (from any worker), so answers are available even when the API is down at
+    startup. Lookups never wait for a refresh once a snapshot exists; an
+    outdated one triggers a single background download and keeps serving
+    until it succeeds.
+    """
+
+    def __init__(self, config: ForecastSnapshotConfig, fetch: BulkFetcher):
+        self.config = config
+        self.fetch = fetch
+        self.index: Optional[LocationIndex] = None
+        self.fetched_at = 0.0
+        self._loaded = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refresh: Optional[asyncio.Task] = None
+        self.lookups = 0
+        self.exact_or_prefix = 0
+        self.fuzzy = 0
+        self.unresolved = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def load(self) -> None:
+        """Install the snapshot written by the last refresh, if there is one."""
+        self._loaded = True
+        try:
+            with open(self.config.path) as fh:
+                stored = json.load(fh)
+            self._install(stored["rows"], float(stored["fetched_at"]))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable forecast snapshot {self.config.path}: {str(e)}")
+
+    def _install(self, rows: List[Dict[str, Any]], fetched_at: float) -> None:
+        self.index = LocationIndex(rows, self.config.fuzzy_cutoff, self.config.prefix_candidates)
+        self.fetched_at = fetched_at
+
+    def _install_and_persist(self, rows: List[Dict[str, Any]], fetched_at: float) -> None:
+        self._install(rows, fetched_at)
+        self._persist(rows, fetched_at)
+
+    def _persist(self, rows: List[Dict[str, Any]], fetched_at: float) -> None:
+        tmp_path = f"{self.config.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as fh:
+                json.dump({"fetched_at": fetched_at, "rows": rows}, fh)
+            os.replace(tmp_path, self.config.path)
+        except OSError as e:
+            print(f"Failed to persist forecast snapshot: {str(e)}")
+
+    async def refresh(self) -> bool:
+        """Download the dataset and swap in a new index; the old one stays on failure."""
+        try:
+            rows = await self.fetch()
+        except Exception as e:
+            print(f"Bulk forecast download failed: {str(e)}")
+            rows = None
+        if not rows:
+            self.refresh_failures += 1
+            return False
+        fetched_at = time.time()
+        # Indexing and writing a large dataset would otherwise stall every other turn.
+        await asyncio.get_running_loop().run_in_executor(None, self._install_and_persist, rows, fetched_at)
+        self.refreshes += 1
+        return True
+
+    def _schedule_refresh(self) -> Optional[asyncio.Task]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._refresh = None
+        if self._refresh is None or self._refresh.done():
+            # The download outlives the turn that triggered it.
+            with without_deadline():
+                self._refresh = asyncio.ensure_future(self.refresh())
+        return self._refresh
+
+    async def lookup(self, location: str, dates: Sequence[str]) -> Optional[Tuple[Optional[str], List[ForecastRow]]]:
+        """
+        Find ``location`` for ``dates``.
+
+        Returns:
+            ``(matched name or None, rows)``, or None when no snapshot exists yet
+            and the download failed
+
+        Raises:
+            DeadlineExceeded: If the first download outlasts the turn's deadline
+        """
+        if not self._loaded:
+            self.load()
+        if time.time() - self.fetched_at >= self.config.refresh_interval:
+            task = self._schedule_refresh()
+            if self.index is None:
+                await bounded(asyncio.shield(task))
+        if self.index is None:
+            return None
+
+        self.lookups += 1
+        name, rows = self.index.lookup(location, dates)
+        if name is None:
+            self.unresolved += 1
+        elif normalize_text(location) in name:
+            self.exact_or_prefix += 1
+        else:
+            self.fuzzy += 1
+        return name, rows
+
+    def stats(self) -> Dict[str, float]:
+        index = self.index
+        return {
+            "locations": len(index.names) if index else 0,
+            "rows": index.rows if index else 0,
+            "age_seconds": round(time.time() - self.fetched_at, 1) if index else -1,
+            "lookups": self.lookups,
+            "exact_or_prefix": self.exact_or_prefix,
+            "fuzzy": self.fuzzy,
+            "unresolved": self.unresolved,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
@@ -0,0 +1,56 @@
+import asyncio
+import weakref
+from dataclasses import dataclass
+from typing import Optional
+
+import aiohttp
+
+
+@dataclass
+class HttpConfig:
+    """Connection pool settings shared by every outbound HTTP call."""
+    pool_limit: int = 200
+    pool_limit_per_host: int = 100
+    keepalive_timeout: float = 30.0
+    dns_cache_ttl: int = 300
+
+
+_config = HttpConfig()
+_sessions: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def configure(config: HttpConfig) -> None:
+    """Replace the pool settings used for sessions created from now on."""
+    global _config
+    _config = config
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Return the keep-alive session for the running event loop.
+
+    Sessions are created lazily, one per loop, so every action running on the
+    action server's loop shares the same connection pool.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=_config.pool_limit,
+            limit_per_host=_config.pool_limit_per_host,
+            keepalive_timeout=_config.keepalive_timeout,
+            ttl_dns_cache=_config.dns_cache_ttl
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        _sessions[loop] = session
+    return session
+
+
+async def close_session(loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+    """Close the session bound to ``loop`` (the running loop by default)."""
+    loop = loop or asyncio.get_running_loop()
+    session = _sessions.pop(loop, None)
+    if session is not None and not session.closed:
+        await session.close()
@@ -0,0 +1,448 @@
+import asyncio
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import env_flag, getenv
+from .metrics import span
+from .milvus_manager import SOURCE_PK_FIELD, corpus_generation
+
+if TYPE_CHECKING:
+    from .milvus_manager import MilvusConnectionManager
+
+
+@dataclass
+class LocalIndexConfig:
+    """Configuration for the in-process replica of the knowledge base."""
+    enabled: bool = field(default_factory=lambda: env_flag("LOCAL_INDEX_ENABLED"))
+    snapshot_dir: str = field(default_factory=lambda: getenv("LOCAL_INDEX_DIR", "/tmp/rasa-local-index"))
+    refresh_interval: float = 60.0
+    max_age_seconds: float = 15 * 60
+    fetch_batch_size: int = 1000
+    keep_snapshots: int = 2
+    vector_field: str = "vector"
+    text_field: str = "text"
+    permission_field: str = "permission"
+    # "int8" stores vectors scalar-quantized (one scale per row) at a quarter of the size.
+    quantization: str = field(default_factory=lambda: getenv("LOCAL_INDEX_QUANTIZATION", "").lower())
+
+
+SCAN_BLOCK_ROWS = 65536
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization; ``vectors ~= q * scales[:, None]``."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class LocalEntity:
+    """Output fields of a local hit, mirroring ``hit.entity`` from pymilvus."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def get(self, item: str, default: Any = None) -> Any:
+        return getattr(self, item, default)
+
+
+class LocalHit:
+    """A search hit exposing ``id``, ``distance`` and ``entity`` like pymilvus."""
+
+    def __init__(self, pk: Any, distance: float, text: str):
+        self.id = pk
+        self.distance = distance
+        self.entity = LocalEntity(text)
+
+
+class Snapshot:
+    """
+    A read-only, memory-mapped copy of the collection.
+
+    Files in a snapshot directory:
+
+    - ``vectors.npy``: float32 matrix, one row per chunk (int8 when quantized)
+    - ``scales.npy``: per-row dequantization scale, only for int8 snapshots
+    - ``norms.npy``: squared L2 norm of each (dequantized) row
+    - ``ids.npy``: primary keys in row order
+    - ``texts.bin`` / ``text_offsets.npy``: UTF-8 texts and their boundaries
+    - ``role_bits.npy``: one packed bitmap row per role
+    - ``meta.json``: roles, dimension, row count, quantization and corpus generation
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as fh:
+            self.meta = json.load(fh)
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = (
+            np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+            if self.quantization == "int8" else None
+        )
+        self.norms = np.load(os.path.join(path, "norms.npy"), mmap_mode="r")
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.text_offsets = np.load(os.path.join(path, "text_offsets.npy"), mmap_mode="r")
+        self.role_bits = np.load(os.path.join(path, "role_bits.npy"), mmap_mode="r")
+        texts_path = os.path.join(path, "texts.bin")
+        self.texts = (
+            np.memmap(texts_path, dtype=np.uint8, mode="r")
+            if os.path.getsize(texts_path) else np.zeros(0, dtype=np.uint8)
+        )
+        self.roles: List[str] = self.meta["roles"]
+        self._role_rows = {role: row for row, role in enumerate(self.roles)}
+        self._role_masks: Dict[str, np.ndarray] = {}
+
+    @property
+    def count(self) -> int:
+        return int(self.meta["count"])
+
+    @property
+    def quantization(self) -> str:
+        return self.meta.get("quantization", "")
+
+    @property
+    def generation(self) -> Optional[str]:
+        return self.meta.get("generation")
+
+    @property
+    def created(self) -> float:
+        return float(self.meta["created"])
+
+    def text(self, row: int) -> str:
+        start, end = int(self.text_offsets[row]), int(self.text_offsets[row + 1])
+        return bytes(self.texts[start:end]).decode("utf-8")
+
+    def role_rows(self, role: str) -> np.ndarray:
+        """Row indices visible to ``role``, decoded once from its bitmap."""
+        rows = self._role_masks.get(role)
+        if rows is None:
+            row = self._role_rows.get(role)
+            if row is None:
+                rows = np.zeros(0, dtype=np.int64)
+            else:
+                rows = np.flatnonzero(np.unpackbits(self.role_bits[row], count=self.count))
+            self._role_masks[role] = rows
+        return rows
+
+    def permissions(self, rows: np.ndarray) -> List[List[str]]:
+        """Rebuild the permission arrays of the given rows from the role bitmaps."""
+        visible = [np.unpackbits(self.role_bits[r], count=self.count)[rows] for r in range(len(self.roles))]
+        return [
+            [role for r, role in enumerate(self.roles) if visible[r][i]]
+            for i in range(len(rows))
+        ]
+
+    def dots(self, query: np.ndarray) -> np.ndarray:
+        """Inner product of every row with ``query``."""
+        if self.scales is None:
+            return self.vectors @ query
+        # Widen int8 rows block by block rather than materialising a float copy.
+        dots = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, SCAN_BLOCK_ROWS):
+            block = self.vectors[start:start + SCAN_BLOCK_ROWS]
+            dots[start:start + len(block)] = block.astype(np.float32) @ query
+        return dots * self.scales
+
+    def search(self, vector: Sequence[float], role: str, limit: int) -> List[LocalHit]:
+        """Exact L2 top-k over the rows visible to ``role``."""
+        rows = self.role_rows(role)
+        if not len(rows):
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        # One streaming pass over the mapped matrix; gathering the role's rows
+        # first would copy them. ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2, which
+        # is the squared L2 distance Milvus reports.
+        dots = self.dots(query)
+        distances = self.norms[rows] - 2.0 * dots[rows] + float(query @ query)
+        k = min(limit, len(rows))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [
+            LocalHit(self.ids[rows[i]].item(), float(distances[i]), self.text(int(rows[i])))
+            for i in top
+        ]
+
+
+class LocalVectorIndex:
+    """
+    Host-local replica of the knowledge base answering role-filtered L2 searches.
+
+    One worker per host (whoever holds ``refresh.lock``) pulls changes from
+    Milvus and publishes a new snapshot by swapping the ``current`` symlink;
+    every worker maps the published snapshot read-only, so they share one copy
+    through the page cache. Refreshes are incremental: only primary keys that
+    are new since the previous snapshot are fetched from Milvus. Searches fall
+    back to Milvus (``search`` returns None) when no snapshot exists or it is
+    stale.
+    """
+
+    def __init__(self, config: LocalIndexConfig, manager: 'MilvusConnectionManager'):
+        self.config = config
+        self.manager = manager
+        self._snapshot: Optional[Snapshot] = None
+        self._snapshot_target: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(config.snapshot_dir, exist_ok=True)
+        self.local_searches = 0
+        self.fallbacks = 0
+        self.refreshes = 0
+        self.rows_fetched = 0
+
+    @property
+    def _current_link(self) -> str:
+        return os.path.join(self.config.snapshot_dir, "current")
+
+    def start(self) -> None:
+        """Start the background refresher."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name="local-index-refresh", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def snapshot(self) -> Optional[Snapshot]:
+        """Return the published snapshot, remapping it if another worker replaced it."""
+        try:
+            target = os.path.realpath(self._current_link) if os.path.islink(self._current_link) else None
+        except OSError:
+            target = None
+        with self._lock:
+            if target != self._snapshot_target:
+                try:
+                    self._snapshot = Snapshot(target) if target else None
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Failed to open local index snapshot {target}: {str(e)}")
+                    self._snapshot = None
+                self._snapshot_target = target
+            return self._snapshot
+
+    def _is_fresh(self, snapshot: Snapshot) -> bool:
+        if time.time() - snapshot.created > self.config.max_age_seconds:
+            return False
+        generation = self.manager.corpus_generation
+        return generation is None or generation == snapshot.generation
+
+    def search_blocking(self, vector: Sequence[float], role: str, limit: int) -> Optional[List[LocalHit]]:
+        """Search the replica, or return None when Milvus has to answer instead."""
+        snapshot = self.snapshot()
+        if snapshot is None or not self._is_fresh(snapshot):
+            self.fallbacks += 1
+            return None
+        self.local_searches += 1
+        return snapshot.search(vector, role, limit)
+
+    async def search(self, vector: Sequence[float], role: str, limit: int) -> Optional[List[LocalHit]]:
+        """Non-blocking variant of ``search_blocking``; NumPy releases the GIL for the scan."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.search_blocking, vector, role, limit)
+
+    def _refresh_loop(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Local index refresh failed: {str(e)}")
+            if self._stop.wait(self.config.refresh_interval):
+                return
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Bring the shared snapshot up to date with Milvus.
+
+        Only one process per host refreshes at a time; the others return False
+        immediately and pick up the result through the ``current`` symlink.
+
+        Returns:
+            True if a new snapshot was published
+        """
+        lock_path = os.path.join(self.config.snapshot_dir, "refresh.lock")
+        with open(lock_path, "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                current = self.snapshot()
+                generation = self.manager.corpus_generation
+                if (not force and current is not None and generation is not None
+                        and generation == current.generation
+                        and time.time() - current.created < self.config.max_age_seconds / 2):
+                    return False
+                with span("local_index", "refresh"):
+                    self._publish(self._build(current))
+                self.refreshes += 1
+                return True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _build(self, current: Optional[Snapshot]) -> str:
+        """Write a new snapshot directory, fetching only rows missing from ``current``."""
+        cfg = self.config
+        with self.manager.collection() as collection:
+            generation = corpus_generation(collection)
+            # Copies of a chunk in the role-partitioned layout share its source key.
+            fields = {field.name for field in collection.schema.fields}
+            pk_field = SOURCE_PK_FIELD if SOURCE_PK_FIELD in fields else collection.schema.primary_field.name
+
+            remote_ids: List[Any] = []
+            iterator = collection.query_iterator(
+                batch_size=cfg.fetch_batch_size, expr="", output_fields=[pk_field]
+            )
+            try:
+                while True:
+                    batch = iterator.next()
+                    if not batch:
+                        break
+                    remote_ids.extend(row[pk_field] for row in batch)
+            finally:
+                iterator.close()
+            remote_ids = list(dict.fromkeys(remote_ids))
+
+            known = {}
+            if (current is not None and current.meta.get("pk_field") == pk_field
+                    and current.quantization == cfg.quantization):
+                known = {pk.item(): row for row, pk in enumerate(current.ids)}
+            kept_ids = [pk for pk in remote_ids if pk in known]
+            new_ids = [pk for pk in remote_ids if pk not in known]
+
+            fetched: Dict[Any, Dict[str, Any]] = {}
+            for start in range(0, len(new_ids), cfg.fetch_batch_size):
+                chunk = new_ids[start:start + cfg.fetch_batch_size]
+                for row in collection.query(
+                    expr=f"{pk_field} in {json.dumps(chunk)}",
+                    output_fields=[pk_field, cfg.vector_field, cfg.text_field, cfg.permission_field]
+                ):
+                    fetched.setdefault(row[pk_field], row)
+            new_rows = [fetched[pk] for pk in new_ids if pk in fetched]
+            self.rows_fetched += len(new_rows)
+
+        kept_rows = np.array([known[pk] for pk in kept_ids], dtype=np.int64)
+        ids = kept_ids + [row[pk_field] for row in new_rows]  # new_ids minus rows deleted meanwhile
+        count = len(ids)
+        if new_rows:
+            dim = len(new_rows[0][cfg.vector_field])
+        elif current is not None:
+            dim = int(current.meta["dim"])
+        else:
+            dim = 0
+
+        path = os.path.join(cfg.snapshot_dir, f"snap-{time.time_ns()}")
+        os.makedirs(path)
+
+        quantized = cfg.quantization == "int8"
+        vectors = np.lib.format.open_memmap(
+            os.path.join(path, "vectors.npy"), mode="w+",
+            dtype=np.int8 if quantized else np.float32, shape=(count, dim)
+        )
+        scales = np.ones(count, dtype=np.float32)
+        for start in range(0, len(kept_rows), cfg.fetch_batch_size):
+            chunk = kept_rows[start:start + cfg.fetch_batch_size]
+            vectors[start:start + len(chunk)] = current.vectors[chunk]
+            if quantized:
+                scales[start:start + len(chunk)] = current.scales[chunk]
+        if new_rows:
+            fresh = np.asarray([row[cfg.vector_field] for row in new_rows], dtype=np.float32)
+            if quantized:
+                fresh, scales[len(kept_rows):] = quantize_int8(fresh)
+            vectors[len(kept_rows):] = fresh
+        vectors.flush()
+
+        norms = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCAN_BLOCK_ROWS):
+            block = vectors[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+            norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+        if quantized:
+            norms *= scales ** 2
+            np.save(os.path.join(path, "scales.npy"), scales)
+        np.save(os.path.join(path, "norms.npy"), norms)
+        np.save(os.path.join(path, "ids.npy"), np.asarray(ids))
+
+        offsets = [0]
+        with open(os.path.join(path, "texts.bin"), "wb") as fh:
+            for row in kept_rows:
+                encoded = current.text(int(row)).encode("utf-8")
+                fh.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+            for row in new_rows:
+                encoded = row[cfg.text_field].encode("utf-8")
+                fh.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+        np.save(os.path.join(path, "text_offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+        permissions = (current.permissions(kept_rows) if len(kept_rows) else []) + [
+            list(row[cfg.permission_field]) for row in new_rows
+        ]
+        roles = sorted({role for allowed in permissions for role in allowed})
+        role_index = {role: r for r, role in enumerate(roles)}
+        bits = np.zeros((len(roles), count), dtype=bool)
+        for row, allowed in enumerate(permissions):
+            for role in allowed:
+                bits[role_index[role], row] = True
+        np.save(os.path.join(path, "role_bits.npy"), np.packbits(bits, axis=1))
+
+        with open(os.path.join(path, "meta.json"), "w") as fh:
+            json.dump({
+                "count": count,
+                "dim": dim,
+                "quantization": cfg.quantization,
+                "roles": roles,
+                "pk_field": pk_field,
+                "generation": generation,
+                "created": time.time(),
+                "reused_rows": len(kept_rows),
+                "fetched_rows": len(new_rows),
+            }, fh)
+        return path
+
+    def _publish(self, path: str) -> None:
+        """Atomically point ``current`` at ``path`` and prune old snapshots."""
+        tmp_link = f"{self._current_link}.{os.getpid()}"
+        os.symlink(path, tmp_link)
+        os.replace(tmp_link, self._current_link)
+
+        snapshots = sorted(
+            name for name in os.listdir(self.config.snapshot_dir) if name.startswith("snap-")
+        )
+        # Workers still mapping a pruned snapshot keep reading it; Linux only
+        # frees unlinked files once the last mapping is gone.
+        for name in snapshots[:-self.config.keep_snapshots]:
+            shutil.rmtree(os.path.join(self.config.snapshot_dir, name), ignore_errors=True)
+
+    def stats(self) -> Dict[str, float]:
+        snapshot = self._snapshot
+        return {
+            "local_searches": self.local_searches,
+            "fallbacks": self.fallbacks,
+            "refreshes": self.refreshes,
+            "rows_fetched": self.rows_fetched,
+            "rows": snapshot.count if snapshot else 0,
+            "age_seconds": round(time.time() - snapshot.created, 1) if snapshot else -1,
+        }
+
+
+_index: Optional[LocalVectorIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_local_index(config: LocalIndexConfig, manager: 'MilvusConnectionManager') -> LocalVectorIndex:
+    """Return the process-wide replica, starting its refresher on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = LocalVectorIndex(config, manager)
+            _index.start()
+        return _index
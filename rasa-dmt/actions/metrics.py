@@ -0,0 +1,264 @@
+import json
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .config import env_flag, getenv
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def percentile(samples: Iterable[float], pct: float) -> float:
+    """
+    Nearest-rank percentile (``pct`` from 0 to 100) of ``samples``; 0.0 when empty.
+
+    The one definition shared by the action stats, ``benchmarks`` and ``tools``,
+    so figures from different reports are comparable.
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    # Nearest rank is ceil(pct% of n); the epsilon stops float error (4.4 * 750 / 100 > 33) adding one.
+    rank = math.ceil(pct * len(ordered) / 100 - 1e-9)
+    return ordered[max(0, min(len(ordered) - 1, rank - 1))]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets and labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        # Layout per series: one slot per bucket, then +Inf, then sum.
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for labelvalues, series in sorted(snapshot.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics plus scrape-time collectors for component statistics."""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix: str, collect: Callable[[], Dict[str, float]]) -> None:
+        """Expose a component's ``stats()`` dict as gauges named ``<prefix>_<key>``."""
+        with self._lock:
+            self._collectors[prefix] = collect
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = dict(self._collectors)
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for prefix, collect in sorted(collectors.items()):
+            try:
+                stats = collect()
+            except Exception:
+                continue
+            for key, value in sorted(stats.items()):
+                if isinstance(value, (int, float)):
+                    lines.append(f"# TYPE {prefix}_{key} gauge")
+                    lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "rasa_action_stage_seconds",
+    "Time spent in each stage of a custom action.",
+    ("action", "stage")
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "rasa_action_stage_errors_total",
+    "Exceptions raised inside a custom action stage.",
+    ("action", "stage", "error")
+)
+ACTION_RUNS = REGISTRY.counter(
+    "rasa_action_runs_total",
+    "Completed custom action runs by outcome.",
+    ("action", "outcome")
+)
+LLM_TOKENS = REGISTRY.counter(
+    "rasa_llm_tokens_total",
+    "Chat completion tokens by kind (prompt, cached_prompt, completion).",
+    ("model", "kind")
+)
+LLM_CALLS_SAVED = REGISTRY.counter(
+    "rasa_llm_calls_saved_total",
+    "Chat completions skipped, by the mechanism that made them unnecessary.",
+    ("action", "reason")
+)
+
+_trace_spans: Optional[bool] = None
+
+
+def _tracing() -> bool:
+    """Whether ``ACTION_TRACE_SPANS`` is set, read on the first span rather than at import."""
+    global _trace_spans
+    if _trace_spans is None:
+        _trace_spans = env_flag("ACTION_TRACE_SPANS")
+    return _trace_spans
+
+
+@contextmanager
+def span(action: str, stage: str) -> Iterator[None]:
+    """
+    Time one stage of an action.
+
+    The duration feeds ``rasa_action_stage_seconds``; an exception escaping the
+    block is counted in ``rasa_action_stage_errors_total`` and re-raised. With
+    ``ACTION_TRACE_SPANS`` set, each span is also printed as a JSON line.
+    """
+    start = time.perf_counter()
+    error: Optional[str] = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        STAGE_ERRORS.inc(action, stage, error)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, action, stage)
+        if _tracing():
+            print(json.dumps({
+                "span": stage,
+                "action": action,
+                "duration_ms": round(elapsed * 1000, 3),
+                "error": error
+            }))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def ensure_metrics_server(port: Optional[int] = None) -> None:
+    """
+    Serve ``/metrics`` on ``ACTION_METRICS_PORT`` (default 5056) from a daemon thread.
+
+    Safe to call from every action; only the first call starts the server.
+    Port 0 disables it.
+    """
+    global _server
+    if port is None:
+        port = int(getenv("ACTION_METRICS_PORT", "5056"))
+    if not port:
+        return
+
+    with _server_lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError as e:
+            print(f"Metrics endpoint not started on port {port}: {str(e)}")
+            return
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
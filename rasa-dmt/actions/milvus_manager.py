@@ -0,0 +1,347 @@
+import asyncio
+import hashlib
+import itertools
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set
+
+from .metrics import span
+from .resilience import SingleFlight, deadline_timeouts, get_breaker, remaining
+
+if TYPE_CHECKING:
+    from pymilvus import Collection
+
+    from .actions_milvus_search import MilvusConfig
+
+# pymilvus (and the pandas it imports) takes a third of a second to import, so
+# these are bound on first connect; benchmarks.fake_milvus.install sets them directly.
+Collection = connections = utility = None
+
+
+def _load_pymilvus() -> None:
+    global Collection, connections, utility
+    if connections is None:
+        from pymilvus import Collection, connections, utility
+
+# Milvus string literals cannot hold line breaks or other control characters (tab excepted).
+UNQUOTABLE_ROLE_CHARS = re.compile(r"[\x00-\x08\x0a-\x1f\x7f]")
+# Longest role fragment kept in a partition name; Milvus allows 255 characters in all.
+MAX_PARTITION_ROLE_CHARS = 64
+# Collection property tools.ingest sets to a fresh value after every run that changed the corpus.
+INGEST_STAMP_PROPERTY = "rasa.ingest_stamp"
+# Field of the role-partitioned collection holding the source collection's primary key.
+SOURCE_PK_FIELD = "source_pk"
+
+
+def validate_role(role: str) -> str:
+    """
+    Check a role slot value before it reaches Milvus.
+
+    Any non-empty string is a valid role, spaces and non-ASCII letters
+    included, unless it holds a character a filter expression cannot quote.
+
+    Raises:
+        ValueError: If the role is not a non-empty string or holds a control character
+    """
+    if not isinstance(role, str) or not role:
+        raise ValueError(f"Invalid user role {role!r}: expected a non-empty string")
+    if UNQUOTABLE_ROLE_CHARS.search(role):
+        raise ValueError(f"Invalid user role {role!r}: control characters cannot be matched in Milvus")
+    return role
+
+
+def quote_string(value: str) -> str:
+    """Quote ``value`` as a string literal of a Milvus filter expression."""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def role_filter(role: str) -> str:
+    """Permission filter expression for the single-collection layout."""
+    return f"ARRAY_CONTAINS(permission, {quote_string(validate_role(role))})"
+
+
+def partition_for_role(role: str) -> str:
+    """
+    Partition holding the chunks visible to ``role`` in the partitioned layout.
+
+    Partition names only allow ``[A-Za-z0-9_]``; other roles, and very long
+    ones, get a shortened, sanitized name with a digest suffix so distinct
+    roles never share a partition.
+    """
+    validate_role(role)
+    if re.fullmatch(r"[A-Za-z0-9_]+", role) and len(role) <= MAX_PARTITION_ROLE_CHARS:
+        return f"role_{role}"
+    sanitized = re.sub(r"[^A-Za-z0-9_]", "_", role)[:MAX_PARTITION_ROLE_CHARS]
+    return f"role_{sanitized}_{hashlib.sha1(role.encode('utf-8')).hexdigest()[:8]}"
+
+
+def corpus_generation(collection: 'Collection') -> str:
+    """
+    Marker that changes whenever the collection's content may have changed.
+
+    It combines the ingest stamp, which catches same-size re-ingests and
+    in-place updates made by ``tools.ingest``, with the row count, which
+    catches writes made by anything else. Milvus Lite keeps no collection
+    properties, so there only the row count is available.
+    """
+    properties = collection.describe().get("properties") or {}
+    return f"{properties.get(INGEST_STAMP_PROPERTY, '')}:{collection.num_entities}"
+
+
+@dataclass
+class PooledConnection:
+    """A long-lived Milvus alias together with its bound collection."""
+    alias: str
+    collection: 'Collection'
+    in_flight: int = 0
+    retired: bool = False
+    failures: int = field(default=0, repr=False)
+
+
+class MilvusConnectionManager:
+    """
+    Process-wide pool of long-lived Milvus connections.
+
+    Every pooled connection owns its own alias, so a reconnect never tears down
+    a connection another request is searching on. The collection is loaded once
+    when the pool is opened; a background thread checks liveness and swaps
+    broken connections for fresh ones, retiring the old alias only after its
+    in-flight searches have drained. The checker also tracks the collection's
+    ``corpus_generation``, so caches of RAG answers can tell when the
+    knowledge base was re-ingested. Blocking pymilvus calls run on a
+    dedicated thread pool so they never stall the action server's event loop.
+    """
+
+    _alias_ids = itertools.count()
+
+    def __init__(self, config: 'MilvusConfig'):
+        self.config = config
+        self._pool: List[PooledConnection] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+        self.corpus_generation: Optional[str] = None
+        self.partitions: Set[str] = set()
+        self.breaker = get_breaker("milvus")
+        self.search_flight = SingleFlight()
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.search_workers,
+            thread_name_prefix="milvus-search"
+        )
+
+    def _open_connection(self) -> PooledConnection:
+        """Open a new alias and bind the configured collection to it."""
+        _load_pymilvus()
+        alias = f"rasa-pool-{next(self._alias_ids)}"
+        with span("milvus_manager", "connect"):
+            connections.connect(alias, **self.config.connection_args())
+            try:
+                collection = Collection(name=self.config.search_collection, using=alias)
+            except Exception:
+                connections.disconnect(alias)
+                raise
+        return PooledConnection(alias=alias, collection=collection)
+
+    def start(self) -> None:
+        """Open the pool, load the collection and start the health checker."""
+        with self._lock:
+            if self._started:
+                return
+            opened: List[PooledConnection] = []
+            try:
+                for _ in range(self.config.pool_size):
+                    opened.append(self._open_connection())
+                opened[0].collection.load()
+                # Searches check partition names against this, so it is read
+                # before any of them can see the pool as started.
+                self._read_metadata(opened[0])
+            except Exception:
+                for conn in opened:
+                    self._disconnect(conn)
+                raise
+            self._pool = opened
+            self._started = True
+
+        self._stop.clear()
+        self._health_thread = threading.Thread(
+            target=self._health_loop,
+            name="milvus-health-check",
+            daemon=True
+        )
+        self._health_thread.start()
+
+    def close(self) -> None:
+        """Stop the health checker and disconnect every pooled alias."""
+        self._stop.set()
+        if self._health_thread is not None:
+            self._health_thread.join(timeout=self.config.health_check_timeout)
+        with self._lock:
+            pool, self._pool = self._pool, []
+            self._started = False
+        for conn in pool:
+            self._disconnect(conn)
+
+    @contextmanager
+    def collection(self) -> Iterator['Collection']:
+        """
+        Borrow the least busy pooled collection for the duration of a search.
+
+        Yields:
+            A loaded Collection bound to a live alias
+
+        Raises:
+            RuntimeError: If no healthy connection is available
+        """
+        if not self._started:
+            self.start()
+
+        with self._lock:
+            candidates = [conn for conn in self._pool if not conn.retired]
+            if not candidates:
+                raise RuntimeError("No healthy Milvus connection available")
+            conn = min(candidates, key=lambda c: c.in_flight)
+            conn.in_flight += 1
+
+        try:
+            yield conn.collection
+        finally:
+            with self._lock:
+                conn.in_flight -= 1
+                drained = conn.retired and conn.in_flight == 0
+            if drained:
+                self._disconnect(conn)
+
+    def _search_blocking(self, **search_kwargs: Any) -> Any:
+        """
+        Run a collection search on a borrowed connection.
+
+        A search restricted to partitions that do not exist (a role with no
+        visible chunks in the partitioned layout) returns empty hits instead
+        of failing. The partition list is re-read before deciding that, since
+        it may have changed since the last health check; if it cannot be
+        read, the search fails rather than answering with no hits.
+        """
+        with self.collection() as collection, span("milvus_manager", "search"):
+            partition_names = search_kwargs.get("partition_names")
+            if partition_names and not set(partition_names) <= self.partitions:
+                self.partitions = {partition.name for partition in collection.partitions}
+                if not set(partition_names) <= self.partitions:
+                    return [[] for _ in search_kwargs["data"]]
+            return collection.search(**search_kwargs)
+
+    async def search(self, **search_kwargs: Any) -> Any:
+        """
+        Search the pooled collection without blocking the event loop.
+
+        Identical concurrent searches share one call. Each search gets what is
+        left of the turn's deadline (at most ``config.search_timeout``) and
+        goes through the Milvus circuit breaker.
+
+        Args:
+            **search_kwargs: Keyword arguments forwarded to ``Collection.search``
+
+        Returns:
+            The pymilvus search result
+
+        Raises:
+            DeadlineExceeded: If the turn's deadline passes first
+            CircuitOpenError: If Milvus is failing and the breaker is open
+        """
+        key = repr(sorted(search_kwargs.items()))
+        return await self.search_flight.do(key, lambda: self._search(search_kwargs))
+
+    async def _search(self, search_kwargs: Dict[str, Any]) -> Any:
+        timeout = remaining(self.config.search_timeout)
+        loop = asyncio.get_running_loop()
+        with deadline_timeouts(), self.breaker.guard():
+            # The pymilvus timeout bounds the RPC; wait_for also bounds time queued for a worker.
+            return await asyncio.wait_for(
+                loop.run_in_executor(
+                    self._executor,
+                    lambda: self._search_blocking(timeout=timeout, **search_kwargs)
+                ),
+                timeout
+            )
+
+    def _is_alive(self, conn: PooledConnection) -> bool:
+        """Check whether the server still answers on this alias (and still has the collection)."""
+        try:
+            # has_collection rather than get_server_version, which Milvus Lite does not implement.
+            return utility.has_collection(
+                self.config.search_collection, using=conn.alias, timeout=self.config.health_check_timeout
+            )
+        except Exception:
+            return False
+
+    def _read_metadata(self, conn: PooledConnection) -> None:
+        """Record the collection's generation and partitions."""
+        self.corpus_generation = corpus_generation(conn.collection)
+        self.partitions = {partition.name for partition in conn.collection.partitions}
+
+    def _refresh_metadata(self, conn: PooledConnection) -> None:
+        """Re-read the collection metadata, keeping the last values if that fails."""
+        try:
+            self._read_metadata(conn)
+        except Exception as e:
+            print(f"Failed to read Milvus collection statistics: {str(e)}")
+
+    def _recycle(self, stale: PooledConnection) -> None:
+        """Replace a broken connection, letting its in-flight searches finish."""
+        try:
+            fresh = self._open_connection()
+        except Exception as e:
+            print(f"Milvus reconnect failed for {stale.alias}: {str(e)}")
+            return
+
+        with self._lock:
+            if stale not in self._pool:
+                self._disconnect(fresh)
+                return
+            self._pool[self._pool.index(stale)] = fresh
+            stale.retired = True
+            drained = stale.in_flight == 0
+        if drained:
+            self._disconnect(stale)
+        print(f"Milvus connection {stale.alias} recycled as {fresh.alias}")
+
+    def _health_loop(self) -> None:
+        """Periodically verify every pooled connection and reconnect dead ones."""
+        while not self._stop.wait(self.config.health_check_interval):
+            with self._lock:
+                pool = list(self._pool)
+            alive = None
+            for conn in pool:
+                if self._is_alive(conn):
+                    conn.failures = 0
+                    alive = alive or conn
+                    continue
+                conn.failures += 1
+                if conn.failures >= self.config.max_health_failures:
+                    self._recycle(conn)
+            if alive is not None:
+                self._refresh_metadata(alive)
+
+    @staticmethod
+    def _disconnect(conn: PooledConnection) -> None:
+        """Release a connection alias, ignoring errors from an already dead link."""
+        try:
+            connections.disconnect(conn.alias)
+        except Exception:
+            pass
+
+
+_manager: Optional[MilvusConnectionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_connection_manager(config: 'MilvusConfig') -> MilvusConnectionManager:
+    """Return the action server's shared connection manager, creating it on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = MilvusConnectionManager(config)
+        return _manager
@@ -0,0 +1,258 @@
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from .config import env_flag, getenv
+from .embedding_batcher import EmbeddingBatcher, EmbeddingBatcherConfig
+from .embedding_cache import EmbeddingCache
+from .http_session import get_session
+from .metrics import LLM_TOKENS
+from .resilience import DeadlineExceeded, SingleFlight, deadline_timeouts, get_breaker, remaining
+from .stream_json import IncrementalJSONParser, MalformedJSONError
+
+# Receives the answer text decoded so far; "" withdraws text from an attempt that was retried.
+TextSink = Callable[[str], Awaitable[None]]
+
+@dataclass
+class OpenAIConfig:
+    """Configuration for OpenAI API."""
+    api_key: str = field(default_factory=lambda: getenv("OPENAI_API_KEY", ""))
+    embedding_model: str = "text-embedding-3-small"
+    # Shortened embeddings (text-embedding-3 models only); must match the collection's vector dim.
+    embedding_dimensions: Optional[int] = field(
+        default_factory=lambda: int(getenv("EMBEDDING_DIMENSIONS") or "0") or None
+    )
+    chat_model: str = "gpt-4o-mini"
+    api_base: str = field(default_factory=lambda: getenv("OPENAI_API_BASE") or "https://api.openai.com/v1")
+    default_image: str = "https://cdn.pixabay.com/photo/2015/11/03/08/56/question-mark-1019820_1280.jpg"
+    timeout: float = 10.0
+    # Stream chat completions, rejecting malformed JSON as soon as it appears.
+    stream: bool = field(default_factory=lambda: env_flag("OPENAI_STREAM"))
+    # Fresh attempts after a malformed streamed answer, while the turn's deadline allows.
+    stream_retries: int = 1
+
+    @property
+    def embedding_cache_model(self) -> str:
+        """Model identity used in embedding cache keys, so vectors of different sizes never mix."""
+        if self.embedding_dimensions:
+            return f"{self.embedding_model}@{self.embedding_dimensions}"
+        return self.embedding_model
+
+class OpenAIClient:
+    """Async client for interacting with OpenAI API over the shared HTTP pool."""
+    
+    def __init__(
+        self,
+        config: OpenAIConfig,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        batcher_config: Optional[EmbeddingBatcherConfig] = None
+    ):
+        self.config = config
+        self.embedding_cache = embedding_cache
+        self.embedding_batcher = (
+            EmbeddingBatcher(self.get_embeddings_batch, batcher_config)
+            if batcher_config else None
+        )
+        self.breaker = get_breaker("openai")
+        self.chat_flight = SingleFlight()
+        self.streams = 0
+        self.malformed_streams = 0
+        self._validate_config()
+
+    def _validate_config(self) -> None:
+        """Validate API configuration."""
+        if not self.config.api_key:
+            raise ValueError("OpenAI API key not found in environment variables")
+
+    def _get_headers(self) -> Dict[str, str]:
+        """Get headers for API requests."""
+        return {
+            "Authorization": f"Bearer {self.config.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    async def _post(self, path: str, payload: Dict) -> Dict:
+        """
+        POST a JSON payload and return the decoded JSON body.
+
+        The request gets what is left of the turn's deadline (at most
+        ``config.timeout``) and goes through the OpenAI circuit breaker.
+        """
+        timeout = remaining(self.config.timeout)
+        with deadline_timeouts(), self.breaker.guard():
+            async with get_session().post(
+                f"{self.config.api_base}{path}",
+                headers=self._get_headers(),
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                response.raise_for_status()
+                return await response.json()
+
+    async def get_embeddings(self, input_text: str) -> List[float]:
+        """Get embeddings for input text, serving repeated questions from the cache."""
+        if self.embedding_cache is not None:
+            cached = await self.embedding_cache.get(self.config.embedding_cache_model, input_text)
+            if cached is not None:
+                return cached
+
+        if self.embedding_batcher is not None:
+            embedding = await self.embedding_batcher.embed(input_text)
+        else:
+            embedding = (await self.get_embeddings_batch([input_text]))[0]
+
+        if self.embedding_cache is not None:
+            self.embedding_cache.put(self.config.embedding_cache_model, input_text, embedding)
+        return embedding
+
+    async def get_embeddings_batch(self, input_texts: List[str]) -> List[List[float]]:
+        """Get embeddings for several texts in one request, in input order."""
+        try:
+            payload = {
+                "model": self.config.embedding_model,
+                "input": input_texts
+            }
+            if self.config.embedding_dimensions:
+                payload["dimensions"] = self.config.embedding_dimensions
+            body = await self._post("/embeddings", payload)
+            data = sorted(body["data"], key=lambda item: item["index"])
+            return [item["embedding"] for item in data]
+        except DeadlineExceeded:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError) as e:
+            raise RuntimeError(f"Failed to get embeddings: {e}")
+
+    def _record_usage(self, usage: Dict) -> None:
+        """Count prompt, cached prompt and completion tokens reported by the API."""
+        model = self.config.chat_model
+        LLM_TOKENS.inc(model, "prompt", amount=usage.get("prompt_tokens", 0))
+        LLM_TOKENS.inc(model, "completion", amount=usage.get("completion_tokens", 0))
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)
+        LLM_TOKENS.inc(model, "cached_prompt", amount=cached)
+
+    async def _complete(self, payload: Dict) -> Dict:
+        body = await self._post("/chat/completions", payload)
+        self._record_usage(body.get("usage") or {})
+        return body
+
+    async def _stream(self, payload: Dict, on_text: Optional[TextSink]) -> Dict[str, Any]:
+        """
+        Stream one completion through an ``IncrementalJSONParser``.
+
+        The answer's ``text`` is handed to ``on_text`` as it is decoded. A
+        malformed answer drops the response at once; it is raised after the
+        circuit breaker has seen a healthy call, since the upstream answered.
+        """
+        self.streams += 1
+        parser = IncrementalJSONParser()
+        malformed: Optional[MalformedJSONError] = None
+        text = ""
+        timeout = remaining(self.config.timeout)
+        with deadline_timeouts(), self.breaker.guard():
+            async with get_session().post(
+                f"{self.config.api_base}/chat/completions",
+                headers=self._get_headers(),
+                json={**payload, "stream": True, "stream_options": {"include_usage": True}},
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                response.raise_for_status()
+                async for line in response.content:
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        break
+                    event = json.loads(data)
+                    if event.get("usage"):
+                        self._record_usage(event["usage"])
+                    for choice in event.get("choices") or []:
+                        delta = (choice.get("delta") or {}).get("content")
+                        if not delta:
+                            continue
+                        try:
+                            decoded = parser.feed(delta).get("text")
+                        except MalformedJSONError as e:
+                            malformed = e
+                            break
+                        if decoded and on_text is not None:
+                            text += decoded
+                            await on_text(text)
+                    if malformed:
+                        break
+        if malformed is None:
+            try:
+                return parser.close()
+            except MalformedJSONError as e:
+                malformed = e
+        self.malformed_streams += 1
+        if text and on_text is not None:
+            await on_text("")
+        raise malformed
+
+    async def _stream_complete(self, payload: Dict, on_text: Optional[TextSink]) -> Dict[str, Any]:
+        """Stream a completion, starting over when the answer turns out malformed."""
+        for attempt in range(self.config.stream_retries + 1):
+            try:
+                return await self._stream(payload, on_text)
+            except MalformedJSONError as e:
+                print(f"Malformed streamed completion (attempt {attempt + 1}): {e}")
+                if attempt == self.config.stream_retries:
+                    raise
+
+    async def _answer(self, payload: Dict, on_text: Optional[TextSink]) -> Dict[str, Any]:
+        """The decoded JSON answer, streamed or in one response."""
+        if self.config.stream:
+            return await self._stream_complete(payload, on_text)
+        body = await self._complete(payload)
+        return json.loads(body['choices'][0]['message']['content'])
+
+    def stream_stats(self) -> Dict[str, float]:
+        return {"streams": self.streams, "malformed": self.malformed_streams}
+
+    async def get_chat_response(
+        self,
+        prompt: str,
+        language: str,
+        system: Optional[str] = None,
+        on_text: Optional[TextSink] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Get chat completion response.
+
+        A ``system`` prompt is sent first, so a static one forms a prefix that
+        OpenAI can serve from its prompt cache. Identical concurrent requests
+        share one completion; with ``config.stream``, only the caller that
+        started it sees partial text through ``on_text``.
+
+        Raises:
+            DeadlineExceeded: If the turn's deadline passes first
+            CircuitOpenError: If OpenAI is failing and the breaker is open
+        """
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({
+            "role": "user",
+            "content": [{
+                "type": "text",
+                "text": prompt
+            }]
+        })
+        payload = {
+            "model": self.config.chat_model,
+            "response_format": {"type": "json_object"},
+            "messages": messages
+        }
+
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).digest()
+        try:
+            content = await self.chat_flight.do(key, lambda: self._answer(payload, on_text))
+            return content.get('image_url'), content.get('text')
+            
+        except DeadlineExceeded:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError, AttributeError) as e:
+            print(f"Error in chat completion: {e}")
+            return None, None
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import aiohttp
+
+from .config import getenv
+from .http_session import get_session
+from .metrics import STAGE_SECONDS
+
+
+@dataclass
+class PartialReplyConfig:
+    """Where to send an answer's text while it is still being generated."""
+    # Relay the chat front end listens on; unset sends nothing before the final reply.
+    url: Optional[str] = field(default_factory=lambda: getenv("PARTIAL_REPLY_URL") or None)
+    # At most one update per interval; the final reply always carries the full text.
+    min_interval: float = 0.1
+    timeout: float = 2.0
+
+
+class PartialReplySink:
+    """
+    Forward a streamed answer to the user before the action returns.
+
+    Rasa's ``CollectingDispatcher`` hands messages to the channel only when
+    the action finishes, so partial text cannot go through it. Each update is
+    POSTed to ``config.url`` instead, as ``{"recipient_id", "text",
+    "partial": true}`` with the whole text so far; an empty text withdraws
+    what was shown. The final answer still goes through the dispatcher.
+    Updates are throttled and sent in the background, one request at a time
+    with the latest text, so a slow or failing relay never holds up the
+    answer and only costs partial updates. Text that arrives within
+    ``min_interval`` of the last send goes out in one trailing update when
+    the interval ends.
+    """
+
+    def __init__(self, config: PartialReplyConfig, recipient_id: str, action: str):
+        self.config = config
+        self.recipient_id = recipient_id
+        self.action = action
+        self._started = time.perf_counter()
+        self._latest = ""
+        self._sent = ""
+        self._sent_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._flush: Optional[asyncio.TimerHandle] = None
+        self.first_text_seconds: Optional[float] = None
+        self.updates = 0
+
+    async def __call__(self, text: str) -> None:
+        if text and self.first_text_seconds is None:
+            self.first_text_seconds = time.perf_counter() - self._started
+            STAGE_SECONDS.observe(self.first_text_seconds, self.action, "first_partial_text")
+        self._latest = text
+        if self._task is not None and not self._task.done():
+            # The running send picks up the latest text when it finishes.
+            return
+        wait = self._sent_at + self.config.min_interval - time.monotonic()
+        if text and wait > 0:
+            if self._flush is None:
+                self._flush = asyncio.get_running_loop().call_later(wait, self._start_send)
+            return
+        self._start_send()
+
+    def _start_send(self) -> None:
+        if self._flush is not None:
+            self._flush.cancel()
+            self._flush = None
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._send())
+
+    async def _send(self) -> None:
+        while self._latest != self._sent:
+            text = self._latest
+            self._sent_at = time.monotonic()
+            try:
+                async with get_session().post(
+                    self.config.url,
+                    json={"recipient_id": self.recipient_id, "text": text, "partial": True},
+                    timeout=aiohttp.ClientTimeout(total=self.config.timeout)
+                ) as response:
+                    response.raise_for_status()
+                self.updates += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Partial reply to {self.recipient_id} failed: {str(e)}")
+                return
+            finally:
+                self._sent = text
+
+    def close(self) -> None:
+        """Drop any update still pending, so none lands after the final reply."""
+        if self._flush is not None:
+            self._flush.cancel()
+            self._flush = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
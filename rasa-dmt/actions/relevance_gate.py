@@ -0,0 +1,64 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence
+
+from .config import getenv
+
+
+@dataclass
+class RelevanceGateConfig:
+    """Configuration for filtering retrieved chunks by their L2 distance to the query."""
+    enabled: bool = True
+    # Squared L2 distance as reported by Milvus (MilvusConfig only accepts the
+    # L2 metric); for unit-length OpenAI embeddings it equals
+    # 2 - 2 * cosine similarity, so 1.3 ~ cosine 0.35.
+    max_distance: float = field(default_factory=lambda: float(getenv("RELEVANCE_MAX_DISTANCE", "1.3")))
+    # Further hits are kept only while within this distance of the closest one.
+    relative_margin: float = 0.25
+
+
+class RelevanceGate:
+    """
+    Decide which retrieved chunks are worth sending to the chat model.
+
+    Hits beyond ``max_distance`` are dropped. Of the rest, only those within
+    ``relative_margin`` of the closest hit are kept, so a clear best match is
+    not diluted by weak neighbours (an adaptive top-k). An empty selection
+    means nothing relevant was found and the chat completion can be skipped.
+    """
+
+    def __init__(self, config: RelevanceGateConfig):
+        self.config = config
+        self._lock = threading.Lock()
+        self.evaluated = 0
+        self.gated = 0
+        self.hits_retrieved = 0
+        self.hits_kept = 0
+
+    def select(self, hits: Sequence[Any]) -> List[Any]:
+        """Return the relevant hits, closest first."""
+        ordered = sorted(hits, key=lambda hit: hit.distance)
+        if self.config.enabled:
+            kept = [hit for hit in ordered if hit.distance <= self.config.max_distance]
+            if kept:
+                ceiling = kept[0].distance + self.config.relative_margin
+                kept = [hit for hit in kept if hit.distance <= ceiling]
+        else:
+            kept = ordered
+
+        with self._lock:
+            self.evaluated += 1
+            self.gated += not kept
+            self.hits_retrieved += len(ordered)
+            self.hits_kept += len(kept)
+        return kept
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "evaluated": self.evaluated,
+                "gated": self.gated,
+                "gated_ratio": round(self.gated / self.evaluated, 4) if self.evaluated else 0.0,
+                "mean_hits_retrieved": round(self.hits_retrieved / self.evaluated, 2) if self.evaluated else 0.0,
+                "mean_hits_kept": round(self.hits_kept / self.evaluated, 2) if self.evaluated else 0.0,
+            }
@@ -0,0 +1,288 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Hashable, Iterator, Optional, TypeVar
+
+import aiohttp
+
+from .config import getenv
+from .metrics import REGISTRY
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The turn's time budget ran out before an upstream call could finish."""
+
+
+class CircuitOpenError(RuntimeError):
+    """An upstream's circuit breaker is open, so the call was not attempted."""
+
+
+@dataclass
+class DeadlineConfig:
+    """Time budget for one action turn, shared by all of its upstream calls."""
+    seconds: float = field(default_factory=lambda: float(getenv("ACTION_DEADLINE_SECONDS", "8")))
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("action_deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Give the enclosed code, and tasks it starts, ``seconds`` to finish.
+
+    Nested deadlines can only shorten the budget. Upstream calls read what is
+    left through ``remaining`` and ``bounded``.
+    """
+    expires = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(expires if outer is None else min(outer, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    """``time.monotonic()`` value at which the current deadline passes, or None."""
+    return _deadline.get()
+
+
+@contextmanager
+def deadline_at(expires: Optional[float]) -> Iterator[None]:
+    """
+    Replace the current deadline with the absolute ``expires`` (None for none).
+
+    For work done on behalf of several turns, such as a batch, which should
+    run as long as the most patient of them is still waiting.
+    """
+    token = _deadline.set(expires)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def without_deadline() -> Iterator[None]:
+    """Detach background work (started inside) from the current turn's deadline."""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(cap: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds left for the next call, at most ``cap``.
+
+    Returns:
+        ``cap`` when no deadline is set (None means unbounded)
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
+    """
+    expires = _deadline.get()
+    if expires is None:
+        return cap
+    left = expires - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Action deadline exceeded")
+    return left if cap is None else min(cap, left)
+
+
+def deadline_expired() -> bool:
+    expires = _deadline.get()
+    return expires is not None and time.monotonic() >= expires
+
+
+@contextmanager
+def deadline_timeouts() -> Iterator[None]:
+    """Re-raise a timeout that happened because the deadline passed as ``DeadlineExceeded``."""
+    try:
+        yield
+    except asyncio.TimeoutError as e:
+        if deadline_expired() and not isinstance(e, DeadlineExceeded):
+            raise DeadlineExceeded("Action deadline exceeded") from e
+        raise
+
+
+async def bounded(awaitable: Awaitable[T]) -> T:
+    """Await ``awaitable`` for no longer than the current deadline allows."""
+    try:
+        return await asyncio.wait_for(awaitable, remaining())
+    except asyncio.TimeoutError as e:
+        if isinstance(e, DeadlineExceeded):
+            raise
+        raise DeadlineExceeded("Action deadline exceeded") from e
+
+
+def upstream_failure(error: BaseException) -> bool:
+    """
+    Whether ``error`` says something about the upstream's health.
+
+    Client errors other than 429 are the request's fault, and a timeout that
+    only happened because the turn's own deadline ran out is not the
+    upstream's fault either.
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500 or error.status == 429
+    if isinstance(error, asyncio.TimeoutError) and deadline_expired():
+        return False
+    return True
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """When an upstream's breaker opens and how long it stays open."""
+    # Consecutive failures that open the breaker.
+    failure_threshold: int = 5
+    # Seconds to fail fast before letting one trial call through.
+    reset_timeout: float = 30.0
+
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream is down.
+
+    ``failure_threshold`` consecutive failures open the breaker; calls are
+    then rejected with ``CircuitOpenError`` without touching the network.
+    After ``reset_timeout`` a single trial call is let through (half-open):
+    its success closes the breaker, its failure re-opens it. Blocking
+    clients guard calls from executor threads, so state changes take a lock.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, name: str, config: CircuitBreakerConfig,
+                 is_failure: Callable[[BaseException], bool] = upstream_failure):
+        self.name = name
+        self.config = config
+        self.is_failure = is_failure
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.config.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._trial_running:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"{self.name} circuit is half-open")
+                self._trial_running = True
+            self.calls += 1
+
+    def _record(self, failed: bool) -> None:
+        with self._lock:
+            self._trial_running = False
+            if not failed:
+                self._failures = 0
+                self.state = self.CLOSED
+                return
+            self.failures += 1
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.config.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Run one upstream call through the breaker.
+
+        Raises:
+            CircuitOpenError: If the breaker does not admit the call
+        """
+        self._admit()
+        try:
+            yield
+        except BaseException as e:
+            if isinstance(e, Exception) and self.is_failure(e):
+                self._record(failed=True)
+            else:
+                # Cancellation and request errors say nothing about the upstream.
+                with self._lock:
+                    self._trial_running = False
+            raise
+        self._record(failed=False)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "state": {self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[self.state],
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str, config: Optional[CircuitBreakerConfig] = None) -> CircuitBreaker:
+    """The process-wide breaker for upstream ``name``, created on first use."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name, config or CircuitBreakerConfig())
+        REGISTRY.register_stats(f"rasa_circuit_{name}", breaker.stats)
+    return breaker
+
+
+class SingleFlight:
+    """
+    Share one in-flight call among concurrent callers with the same key.
+
+    The shared call runs under the deadline of the caller that started it;
+    each caller stops waiting at its own deadline without cancelling it.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._inflight = {}
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = self._inflight[key] = asyncio.ensure_future(call())
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        # Shield the shared call so one caller giving up does not cancel the others.
+        return await bounded(asyncio.shield(task))
+
+    def _forget(self, key: Hashable, done: asyncio.Future) -> None:
+        if self._inflight.get(key) is done:
+            del self._inflight[key]
+        if not done.cancelled():
+            # Mark the exception as retrieved when every caller has already left.
+            done.exception()
+
+    def stats(self) -> Dict[str, float]:
+        return {"calls": self.calls, "coalesced": self.coalesced}
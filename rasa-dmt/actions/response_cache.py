@@ -0,0 +1,175 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class ResponseCacheConfig:
+    """Configuration for the semantic RAG response cache."""
+    enabled: bool = True
+    similarity_threshold: float = 0.95
+    ttl_seconds: float = 6 * 60 * 60
+    max_entries_per_partition: int = 2000
+
+
+@dataclass
+class CachedResponse:
+    """A stored RAG answer."""
+    image_url: Optional[str]
+    text: str
+    created: float
+
+
+class _Partition:
+    """
+    Answers for one (role, language) pair and their unit query vectors.
+
+    Vectors live in a preallocated matrix whose live rows start at
+    ``_start``: storing writes one row and dropping the oldest answers only
+    moves the offset. When the end of the buffer is reached the live rows are
+    copied into a buffer twice their number, so a store costs amortised O(1)
+    rows of copying rather than restacking the partition.
+    """
+
+    def __init__(self):
+        self.responses: List[CachedResponse] = []
+        self._rows: Optional[np.ndarray] = None
+        self._start = 0
+
+    def matrix(self) -> np.ndarray:
+        return self._rows[self._start:self._start + len(self.responses)]
+
+    def append(self, vector: np.ndarray, response: CachedResponse) -> None:
+        end = self._start + len(self.responses)
+        if self._rows is None or end == len(self._rows):
+            rows = np.empty((max(16, 2 * len(self.responses)), len(vector)), dtype=np.float32)
+            if self.responses:
+                rows[:len(self.responses)] = self.matrix()
+            self._rows, self._start = rows, 0
+            end = len(self.responses)
+        self._rows[end] = vector
+        self.responses.append(response)
+
+    def drop_oldest(self, count: int) -> None:
+        del self.responses[:count]
+        self._start = self._start + count if self.responses else 0
+
+    def drop_expired(self, cutoff: float) -> int:
+        expired = 0
+        while expired < len(self.responses) and self.responses[expired].created < cutoff:
+            expired += 1
+        if expired:
+            self.drop_oldest(expired)
+        return expired
+
+
+class SemanticResponseCache:
+    """
+    Cache of RAG answers keyed by query-embedding similarity.
+
+    Entries are hard-partitioned by ``(user_role, language)``: a lookup only
+    ever compares against answers produced for the same role and language, so
+    a cached answer can never cross a permission boundary. The whole cache is
+    dropped when the knowledge base generation changes (re-ingestion). The
+    generation is polled by the connection manager's health check, so an
+    answer can outlive a re-ingest by one check interval; a write that
+    neither goes through ``tools.ingest`` nor changes the row count is only
+    picked up as entries reach ``ttl_seconds``.
+    """
+
+    def __init__(self, config: ResponseCacheConfig):
+        self.config = config
+        self._partitions: Dict[Tuple[str, str], _Partition] = {}
+        self._generation: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unit(vector: Sequence[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        return array / norm if norm else array
+
+    def sync_generation(self, generation: Optional[str]) -> None:
+        """Invalidate everything if the collection was re-ingested since the last call."""
+        if generation is None:
+            return
+        with self._lock:
+            if self._generation is not None and generation != self._generation:
+                self._partitions.clear()
+                self.invalidations += 1
+            self._generation = generation
+
+    def invalidate(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._partitions.clear()
+            self.invalidations += 1
+
+    def lookup(self, role: str, language: str,
+               query_vector: Sequence[float]) -> Optional[Tuple[Optional[str], str]]:
+        """
+        Find a stored answer for a near-duplicate question.
+
+        Args:
+            role: The user's role slot
+            language: The language slot
+            query_vector: Embedding of the user's question
+
+        Returns:
+            ``(image_url, text)`` of the most similar answer above the
+            threshold, or None
+        """
+        if not self.config.enabled:
+            return None
+
+        query = self._unit(query_vector)
+        with self._lock:
+            partition = self._partitions.get((role, language))
+            if partition is not None:
+                partition.drop_expired(time.time() - self.config.ttl_seconds)
+            if partition is None or not partition.responses:
+                self.misses += 1
+                return None
+
+            similarities = partition.matrix() @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.config.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            response = partition.responses[best]
+            return response.image_url, response.text
+
+    def store(self, role: str, language: str, query_vector: Sequence[float],
+              image_url: Optional[str], text: str) -> None:
+        """Remember an answer produced for this role and language."""
+        if not self.config.enabled:
+            return
+
+        vector = self._unit(query_vector)
+        with self._lock:
+            partition = self._partitions.setdefault((role, language), _Partition())
+            partition.append(vector, CachedResponse(image_url=image_url, text=text, created=time.time()))
+            overflow = len(partition.responses) - self.config.max_entries_per_partition
+            if overflow > 0:
+                partition.drop_oldest(overflow)
+                self.evictions += overflow
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss, eviction and invalidation counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": sum(len(p.responses) for p in self._partitions.values()),
+            }
@@ -0,0 +1,211 @@
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class MalformedJSONError(ValueError):
+    """The streamed completion can no longer become the expected JSON object."""
+
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_VALUE_STARTS = set('"{[-0123456789tfn')
+# Characters a string value can hold without escaping
+_PLAIN_RUN = re.compile(r'[^"\\]+')
+
+# Parser states
+_START, _KEY_OR_END, _KEY, _COLON, _VALUE, _STRING, _OTHER, _COMMA_OR_END, _DONE = range(9)
+
+
+class IncrementalJSONParser:
+    """
+    Follow a JSON object as it streams in, one chunk at a time.
+
+    Only the top level is tracked: the object must open with ``{``, keys must
+    be strings followed by ``:``, and values by ``,`` or ``}``. The first
+    character that breaks that shape raises ``MalformedJSONError``, so a
+    completion that starts with prose or a code fence is rejected after a few
+    tokens instead of after the whole answer. String values of the ``watch``
+    keys are decoded as they arrive and returned from ``feed`` as deltas.
+    Nested values are skipped over (they only need balanced brackets); the
+    full document is still checked by ``json.loads`` in ``close``.
+    """
+
+    def __init__(self, watch: Iterable[str] = ("text",)):
+        self.watch = set(watch)
+        self.fields: Dict[str, str] = {}
+        self._raw: List[str] = []
+        self._offset = 0
+        self._state = _START
+        self._key: List[str] = []
+        self._current: Optional[str] = None
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        # Nested value skipping: bracket depth and whether we are inside a string
+        self._depth = 0
+        self._in_string = False
+        self._string_escape = False
+
+    @property
+    def text(self) -> str:
+        """Everything received so far."""
+        return "".join(self._raw)
+
+    def feed(self, chunk: str) -> Dict[str, str]:
+        """
+        Consume ``chunk`` and return the newly decoded text of each watched key.
+
+        Raises:
+            MalformedJSONError: If the input can no longer be the expected object
+        """
+        self._raw.append(chunk)
+        deltas: Dict[str, List[str]] = {}
+        position = 0
+        while position < len(chunk):
+            if self._state == _STRING and self._escape is None:
+                # Take a run of plain characters at once rather than one at a time.
+                run = _PLAIN_RUN.match(chunk, position)
+                if run:
+                    decoded = self._emit(run.group())
+                    position = run.end()
+                    self._offset += len(run.group())
+                    if decoded:
+                        deltas.setdefault(self._current, []).append(decoded)
+                    continue
+            decoded = self._step(chunk[position])
+            if decoded:
+                deltas.setdefault(self._current, []).append(decoded)
+            position += 1
+            self._offset += 1
+        return {key: "".join(parts) for key, parts in deltas.items()}
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Decode the complete document.
+
+        Raises:
+            MalformedJSONError: If the stream ended early or is not valid JSON
+        """
+        if self._state != _DONE:
+            raise MalformedJSONError("Completion ended before the JSON object was closed")
+        try:
+            return json.loads(self.text)
+        except json.JSONDecodeError as e:
+            raise MalformedJSONError(str(e)) from e
+
+    def _fail(self, char: str, expected: str) -> None:
+        raise MalformedJSONError(f"Expected {expected} at offset {self._offset}, got {char!r}")
+
+    def _step(self, char: str) -> Optional[str]:
+        """Advance by one character; return decoded text for a watched string value."""
+        state = self._state
+        if state == _STRING:
+            return self._string_char(char)
+        if state == _KEY:
+            if self._escape is None and char == '"':
+                self._state = _COLON
+            else:
+                self._escape = None if self._escape is not None or char != '\\' else ''
+                self._key.append(char)
+            return None
+        if state == _OTHER:
+            self._other_char(char)
+            return None
+        if char.isspace():
+            return None
+
+        if state == _START:
+            if char != '{':
+                self._fail(char, "'{'")
+            self._state = _KEY_OR_END
+        elif state == _KEY_OR_END:
+            if char == '"':
+                self._key = []
+                self._state = _KEY
+            elif char == '}':
+                self._state = _DONE
+            else:
+                self._fail(char, "a key")
+        elif state == _COLON:
+            if char != ':':
+                self._fail(char, "':'")
+            self._state = _VALUE
+        elif state == _VALUE:
+            if char not in _VALUE_STARTS:
+                self._fail(char, "a value")
+            self._current = "".join(self._key)
+            if char == '"':
+                self._state = _STRING
+                self.fields[self._current] = ""
+            else:
+                self._state = _OTHER
+                self._depth = int(char in '{[')
+                self._in_string = self._string_escape = False
+        elif state == _COMMA_OR_END:
+            if char == ',':
+                # A trailing comma slips through here; ``close`` rejects it.
+                self._state = _KEY_OR_END
+            elif char == '}':
+                self._state = _DONE
+            else:
+                self._fail(char, "',' or '}'")
+        elif state == _DONE:
+            self._fail(char, "the end of the completion")
+        return None
+
+    def _string_char(self, char: str) -> Optional[str]:
+        """One character of a string value, with escapes decoded."""
+        if self._escape is not None:
+            if self._escape == '' and char != 'u':
+                self._escape = None
+                if char not in _ESCAPES:
+                    self._fail(char, "an escape sequence")
+                return self._emit(_ESCAPES[char])
+            self._escape += char
+            if len(self._escape) < 5:
+                return None
+            try:
+                code = int(self._escape[1:], 16)
+            except ValueError:
+                self._fail(self._escape, "four hex digits")
+            self._escape = None
+            if 0xD800 <= code < 0xDC00:
+                self._high_surrogate = code
+                return None
+            if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+                code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+            return self._emit(chr(code))
+        if char == '\\':
+            self._escape = ''
+            return None
+        if char == '"':
+            self._state = _COMMA_OR_END
+            return None
+        return self._emit(char)
+
+    def _emit(self, decoded: str) -> Optional[str]:
+        self.fields[self._current] += decoded
+        return decoded if self._current in self.watch else None
+
+    def _other_char(self, char: str) -> None:
+        """One character of a number, literal or nested value, which is skipped."""
+        if self._in_string:
+            if self._string_escape:
+                self._string_escape = False
+            elif char == '\\':
+                self._string_escape = True
+            elif char == '"':
+                self._in_string = False
+            return
+        if char == '"':
+            self._in_string = True
+        elif char in '{[':
+            self._depth += 1
+        elif char in '}]' and self._depth:
+            self._depth -= 1
+            if self._depth == 0:
+                self._state = _COMMA_OR_END
+        elif self._depth == 0 and (char in ',}' or char.isspace()):
+            # A scalar ends at the character after it, which belongs to the object.
+            self._state = _COMMA_OR_END
+            self._step(char)
@@ -0,0 +1,35 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict
+
+from .config import env_flag
+
+
+@dataclass
+class WarmupConfig:
+    """Whether actions pre-open their clients while the action server registers them."""
+    enabled: bool = field(default_factory=lambda: env_flag("ACTION_WARMUP"))
+
+
+def warm_up(action: str, steps: Dict[str, Callable[[], Any]]) -> Dict[str, float]:
+    """
+    Run an action's blocking setup steps ahead of its first request.
+
+    Actions are instantiated when the action server registers them, before it
+    accepts requests, so work done here delays readiness instead of the first
+    user's turn. A failing step (Milvus not up yet, say) is logged and left
+    for the first request to retry.
+
+    Returns:
+        Seconds spent per step
+    """
+    timings: Dict[str, float] = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Warm-up of {action} step {name} failed: {str(e)}")
+        timings[name] = round(time.perf_counter() - started, 4)
+    print(f"Warmed up {action}: {timings}")
+    return timings
@@ -0,0 +1,233 @@
+"""
+Offline benchmark suite for every custom action.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.bench_actions --turns 400 --concurrency 1 16 64 \\
+        --output bench_actions.json --compare previous.json
+
+Each action is driven with realistic Tracker fixtures against local stand-ins:
+the fake OpenAI and data.gov.my servers from ``benchmarks.fake_upstreams`` and
+the in-process Milvus from ``benchmarks.fake_milvus``. For every action and
+concurrency level the suite reports p50/p95/p99 latency and throughput, plus
+the peak Python heap per action. Results are written as JSON (tagged with the
+current commit) so two runs can be compared.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import inspect
+import json
+import os
+import random
+import subprocess
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from rasa_sdk import Tracker
+from rasa_sdk.executor import CollectingDispatcher
+
+from . import fake_milvus, fixtures
+from .fake_upstreams import FakeUpstreamConfig, FakeUpstreams
+from .tokens import mint_token
+
+os.environ.setdefault("JWT_KEY", "bench-jwt-signing-key-0123456789abcdef")
+os.environ.setdefault("ENCRYPTION_KEY", "bench-encryption-key")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+# Fake embeddings are not unit-length, so real distance cutoffs would gate every turn.
+os.environ.setdefault("RELEVANCE_MAX_DISTANCE", "inf")
+
+from actions import milvus_manager  # noqa: E402
+from actions.actions_bot_init import InitBot  # noqa: E402
+from actions.actions_fetch_weather import FetchWeather  # noqa: E402
+from actions.actions_milvus_search import MilvusSearchAction  # noqa: E402
+from actions.actions_name_set import NameSet  # noqa: E402
+from actions.actions_whats_my_name import WhatsMyName  # noqa: E402
+from actions.metrics import percentile  # noqa: E402
+
+TrackerFactory = Callable[[int], Tracker]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_turn(action: Any, tracker: Tracker) -> List[Dict[str, Any]]:
+    dispatcher = CollectingDispatcher()
+    result = action.run(dispatcher, tracker, {})
+    if inspect.isawaitable(result):
+        await result
+    return dispatcher.messages
+
+
+async def drive(action: Any, make_tracker: TrackerFactory, turns: int, concurrency: int) -> Dict[str, Any]:
+    """Run ``turns`` turns with at most ``concurrency`` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(turn: int) -> None:
+        nonlocal errors
+        tracker = make_tracker(turn)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await run_turn(action, tracker)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(turn) for turn in range(turns)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "turns": turns,
+        "errors": errors,
+        "throughput_per_s": round(turns / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def build_scenarios(upstreams: FakeUpstreams, question_count: int) -> Dict[str, Any]:
+    """Action factories paired with tracker factories for each benchmarked action."""
+    rng = random.Random(9)
+    questions = fixtures.question_pool(question_count)
+    tokens = [
+        mint_token(f"user{i}@example.com", rng.choice(fixtures.ROLES),
+                   os.environ["JWT_KEY"], os.environ["ENCRYPTION_KEY"])
+        for i in range(200)
+    ]
+    locations = upstreams.config.locations
+
+    def search_action() -> MilvusSearchAction:
+        action = MilvusSearchAction()
+        action.openai_config.api_base = upstreams.openai_base
+        return action
+
+    def weather_action() -> FetchWeather:
+        action = FetchWeather()
+        action.API_BASE_URL = upstreams.weather_url
+        return action
+
+    return {
+        "action_init_bot": (InitBot, lambda turn: fixtures.init_bot_tracker(turn, rng.choice(tokens))),
+        "action_fetch_weather": (
+            weather_action, lambda turn: fixtures.weather_tracker(turn, fixtures.zipf_choice(rng, locations))
+        ),
+        "action_milvus_search": (
+            search_action,
+            lambda turn: fixtures.search_tracker(
+                turn, fixtures.zipf_choice(rng, questions),
+                rng.choice(fixtures.ROLES), rng.choice(fixtures.LANGUAGES)
+            )
+        ),
+        "action_name_set": (
+            NameSet, lambda turn: fixtures.name_set_tracker(turn, f"user{turn}", rng.choice(fixtures.ROLES))
+        ),
+        "action_whats_my_name": (
+            WhatsMyName, lambda turn: fixtures.whats_my_name_tracker(turn, f"user{turn}", rng.choice(fixtures.ROLES))
+        ),
+    }
+
+
+async def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    upstream_config = FakeUpstreamConfig(
+        embedding_latency=args.embedding_latency,
+        chat_latency=args.chat_latency,
+        weather_latency=args.weather_latency,
+    )
+    server = fake_milvus.FakeMilvusServer(
+        dim=upstream_config.embedding_dim,
+        rows=args.milvus_rows,
+        search_latency=args.search_latency,
+    )
+    fake_milvus.install(server, milvus_manager)
+
+    results: Dict[str, Any] = {}
+    async with FakeUpstreams(upstream_config) as upstreams:
+        scenarios = build_scenarios(upstreams, args.questions)
+        for name, (make_action, make_tracker) in scenarios.items():
+            if args.actions and name not in args.actions:
+                continue
+            per_level = {}
+            for level in args.concurrency:
+                # A fresh instance per level so caches start cold every time.
+                per_level[str(level)] = await drive(make_action(), make_tracker, args.turns, level)
+
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            await drive(make_action(), make_tracker, args.turns, max(args.concurrency))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results[name] = {"concurrency": per_level, "peak_memory_kb": round(peak / 1024, 1)}
+        results["_upstream_requests"] = dict(upstreams.requests)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "verbose")},
+        "results": results,
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    for name, result in report["results"].items():
+        if name.startswith("_"):
+            continue
+        print(f"{name}  (peak {result['peak_memory_kb']} KiB)")
+        for level, stats in result["concurrency"].items():
+            line = (f"  c={level:>4}  p50={stats['p50_ms']:>8}ms  p95={stats['p95_ms']:>8}ms  "
+                    f"p99={stats['p99_ms']:>8}ms  {stats['throughput_per_s']:>8}/s  errors={stats['errors']}")
+            previous = (baseline or {}).get("results", {}).get(name, {}).get("concurrency", {}).get(level)
+            if previous and previous["p95_ms"]:
+                change = (stats["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+                line += f"  p95 {change:+.1f}% vs {baseline.get('commit')}"
+            print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--actions", nargs="*", help="Only run these action names")
+    parser.add_argument("--questions", type=int, default=300, help="Distinct search questions")
+    parser.add_argument("--milvus-rows", type=int, default=2000)
+    parser.add_argument("--embedding-latency", type=float, default=0.03)
+    parser.add_argument("--chat-latency", type=float, default=0.3)
+    parser.add_argument("--weather-latency", type=float, default=0.15)
+    parser.add_argument("--search-latency", type=float, default=0.01)
+    parser.add_argument("--output", default="bench_actions.json")
+    parser.add_argument("--compare", help="Previous results file to diff against")
+    parser.add_argument("--verbose", action="store_true", help="Show the actions' own output")
+    args = parser.parse_args()
+
+    # The actions log with print(); keep that noise out of the report.
+    sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        report = asyncio.run(run_suite(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+    print_report(report, baseline)
+
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Shared cache backends: value sizes, per-operation cost, and warm state across workers.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.bench_cache_backend --workers 3 --output cache_backend.json
+
+Three parts:
+
+- ``codec``: bytes per cached embedding as packed float32 (what the caches
+  store) versus JSON, for common embedding sizes.
+- ``ops``: mean get/set time of the memory, disk (SQLite) and Redis-protocol
+  backends, the latter against ``benchmarks.fake_redis``.
+- ``workers``: for each backend, ``--workers`` fresh action-server processes
+  run the same session starts, questions and weather lookups one after the
+  other, against the fake upstreams from ``benchmarks.fake_upstreams``. With
+  the memory backend every worker starts cold; with a shared backend only the
+  first one should reach the upstreams or verify tokens.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from .fake_redis import FakeRedis
+from .fake_upstreams import LOCATIONS, FakeUpstreamConfig, FakeUpstreams, fake_embedding
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("RELEVANCE_MAX_DISTANCE", "inf")
+os.environ.setdefault("JWT_KEY", "bench-jwt-signing-key-0123456789abcdef")
+os.environ.setdefault("ENCRYPTION_KEY", "bench-encryption-key")
+os.environ["ACTION_METRICS_PORT"] = "0"
+
+from actions.cache_backend import (  # noqa: E402
+    CacheBackend, MemoryBackend, NamespaceConfig, RedisBackend, SQLiteBackend
+)
+from actions.embedding_cache import pack_vector  # noqa: E402
+
+BACKENDS = ("memory", "disk", "redis")
+
+
+def codec(dims: List[int]) -> List[Dict[str, Any]]:
+    rows = []
+    for dim in dims:
+        vector = fake_embedding("codec", dim)
+        packed, text = len(pack_vector(vector)), len(json.dumps(vector))
+        rows.append({"dim": dim, "float32_bytes": packed, "json_bytes": text, "ratio": round(text / packed, 2)})
+    return rows
+
+
+def ops(name: str, backend: CacheBackend, count: int, dim: int) -> Dict[str, Any]:
+    namespace = backend.namespace("bench", NamespaceConfig(ttl_seconds=600, max_entries=count))
+    blob = pack_vector(fake_embedding("ops", dim))
+    started = time.perf_counter()
+    for i in range(count):
+        namespace.set(f"key{i}", blob)
+    set_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    hits = sum(namespace.get(f"key{i}") is not None for i in range(count))
+    get_seconds = time.perf_counter() - started
+    return {
+        "backend": name,
+        "set_us": round(set_seconds / count * 1e6, 2),
+        "get_us": round(get_seconds / count * 1e6, 2),
+        "hit_ratio": round(hits / count, 4),
+        "errors": backend.errors,
+    }
+
+
+async def child(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """One action-server worker: run the workload once and report its caches."""
+    from actions import milvus_manager
+    from actions.actions_bot_init import InitBot
+    from actions.actions_fetch_weather import FetchWeather
+    from actions.actions_milvus_search import MilvusSearchAction
+    from actions.http_session import close_session
+
+    from . import fake_milvus, fixtures
+    from .bench_actions import run_turn
+
+    server = fake_milvus.FakeMilvusServer(dim=spec["dim"], rows=500, search_latency=0.005)
+    fake_milvus.install(server, milvus_manager)
+    bot, search, weather = InitBot(), MilvusSearchAction(), FetchWeather()
+    search.openai_config.api_base = spec["openai_base"]
+    weather.API_BASE_URL = spec["weather_url"]
+
+    turns: Dict[str, List[float]] = {}
+
+    async def timed(name: str, action: Any, tracker: Any) -> None:
+        started = time.perf_counter()
+        await run_turn(action, tracker)
+        turns.setdefault(name, []).append(time.perf_counter() - started)
+
+    for turn, token in enumerate(spec["tokens"]):
+        await timed("init_bot", bot, fixtures.init_bot_tracker(turn, token))
+    for turn, question in enumerate(spec["questions"]):
+        await timed("search", search, fixtures.search_tracker(turn, question, "staff"))
+    for turn, location in enumerate(spec["locations"]):
+        await timed("weather", weather, fixtures.weather_tracker(turn, location))
+    # Let writes that a network backend finishes in a thread land before the next worker starts.
+    await asyncio.sleep(0.2)
+    await close_session()
+
+    return {
+        "mean_turn_ms": {name: round(sum(times) / len(times) * 1000, 2) for name, times in turns.items()},
+        "token_cache": bot.token_cache.stats(),
+        "embedding_cache": search.embedding_cache.stats(),
+        "forecast_cache": weather.forecast_cache.stats(),
+    }
+
+
+async def workers(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from .fixtures import question_pool
+    from .tokens import mint_token
+
+    upstream_config = FakeUpstreamConfig(embedding_latency=0.03, chat_latency=0.05, weather_latency=0.15)
+    tokens = [
+        mint_token(f"user{i}@example.com", "staff", os.environ["JWT_KEY"], os.environ["ENCRYPTION_KEY"])
+        for i in range(args.sessions)
+    ]
+    rows = []
+    with FakeRedis(latency=args.redis_latency) as redis, tempfile.TemporaryDirectory() as scratch:
+        async with FakeUpstreams(upstream_config) as upstreams:
+            spec_path = os.path.join(scratch, "spec.json")
+            with open(spec_path, "w") as fh:
+                json.dump({
+                    "dim": upstream_config.embedding_dim,
+                    "openai_base": upstreams.openai_base,
+                    "weather_url": upstreams.weather_url,
+                    "tokens": tokens,
+                    "questions": question_pool(args.questions),
+                    "locations": LOCATIONS[:args.locations],
+                }, fh)
+
+            for kind in BACKENDS:
+                env = dict(
+                    os.environ, CACHE_BACKEND=kind, CACHE_REDIS_URL=redis.url,
+                    CACHE_PATH=os.path.join(scratch, "cache.sqlite3")
+                )
+                for worker in range(args.workers):
+                    before = dict(upstreams.requests)
+                    process = await asyncio.create_subprocess_exec(
+                        sys.executable, "-m", "benchmarks.bench_cache_backend", "--child", spec_path,
+                        env=env, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+                    )
+                    stdout, _ = await process.communicate()
+                    result = json.loads(stdout.decode().strip().splitlines()[-1])
+                    rows.append({
+                        "backend": kind,
+                        "worker": worker,
+                        "token_verifications": result["token_cache"]["misses"],
+                        "embedding_requests": upstreams.requests["embeddings"] - before["embeddings"],
+                        "weather_requests": upstreams.requests["weather"] - before["weather"],
+                        "mean_turn_ms": result["mean_turn_ms"],
+                    })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=3, help="Action-server processes per backend")
+    parser.add_argument("--sessions", type=int, default=50, help="Distinct tokens per worker")
+    parser.add_argument("--questions", type=int, default=50, help="Distinct questions per worker")
+    parser.add_argument("--locations", type=int, default=10, help="Distinct weather locations per worker")
+    parser.add_argument("--ops", type=int, default=5000, help="Keys per backend in the ops part")
+    parser.add_argument("--redis-latency", type=float, default=0.0, help="Extra fake Redis round-trip seconds")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Keep the actions' own logging out of the JSON line the parent reads.
+        sys.stdout, real_stdout = sys.stderr, sys.stdout
+        with open(args.child) as fh:
+            result = asyncio.run(child(json.load(fh)))
+        real_stdout.write(json.dumps(result) + "\n")
+        return
+
+    report: Dict[str, Any] = {"codec": codec([256, 512, 1536, 3072])}
+    with FakeRedis(latency=args.redis_latency) as redis, tempfile.TemporaryDirectory() as scratch:
+        report["ops"] = [
+            ops("memory", MemoryBackend(), args.ops, 1536),
+            ops("disk", SQLiteBackend(os.path.join(scratch, "ops.sqlite3")), args.ops, 1536),
+            ops("redis", RedisBackend(redis.url), args.ops, 1536),
+        ]
+    report["workers"] = asyncio.run(workers(args))
+
+    for part in ("codec", "ops", "workers"):
+        for row in report[part]:
+            print(f"{part}: " + ", ".join(f"{key}={value}" for key, value in row.items()))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Measure weather lookups against the bulk forecast snapshot.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.bench_forecast_snapshot --locations 100 1000 10000 --lookups 5000
+
+Part one builds a ``LocationIndex`` over generated location names at each size
+and times exact, prefix, later-word and misspelled lookups, to show that the
+cost per lookup does not grow with the number of locations. Part two drives
+``FetchWeather`` against the fake data.gov.my server from
+``benchmarks.fake_upstreams``: it compares turn latency with the snapshot on
+and off, then makes the upstream fail every request and checks that the
+snapshot keeps answering.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from actions.actions_fetch_weather import FetchWeather
+from actions.forecast_snapshot import LocationIndex
+from actions.http_session import close_session
+from actions.metrics import percentile
+
+from . import fixtures
+from .bench_actions import run_turn
+from .fake_upstreams import FakeUpstreamConfig, FakeUpstreams, build_forecasts
+
+SYLLABLES = ["ka", "la", "pu", "ran", "bu", "kit", "se", "ri", "ma", "ta", "ng", "jo", "hor", "pe", "nang", "tu"]
+PREFIXES = ["Kampung", "Bandar", "Sungai", "Bukit", "Kuala", "Tanjung", "Pulau", "Batu"]
+
+
+def location_names(count: int, rng: random.Random) -> List[str]:
+    """``count`` distinct, plausible Malaysian place names."""
+    names = set()
+    while len(names) < count:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+        names.add(f"{rng.choice(PREFIXES)} {word}" if rng.random() < 0.6 else word)
+    return sorted(names)
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    """Swap two neighbouring letters, the way names get mistyped."""
+    position = rng.randrange(1, len(name) - 1)
+    return name[:position - 1] + name[position] + name[position - 1] + name[position + 1:]
+
+
+def time_lookups(index: LocationIndex, queries: List[str], dates: List[str]) -> Dict[str, Any]:
+    latencies: List[float] = []
+    resolved = 0
+    for query in queries:
+        started = time.perf_counter()
+        name, _ = index.lookup(query, dates)
+        latencies.append(time.perf_counter() - started)
+        resolved += name is not None
+    return {
+        "resolved": round(resolved / len(queries), 4),
+        "p50_us": round(percentile(latencies, 50) * 1e6, 1),
+        "p99_us": round(percentile(latencies, 99) * 1e6, 1),
+    }
+
+
+def bench_index(sizes: List[int], lookups: int, seed: int) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        rng = random.Random(seed)
+        names = location_names(size, rng)
+        rows = build_forecasts(names, days=7, seed=seed)
+        started = time.perf_counter()
+        index = LocationIndex(rows)
+        build_s = time.perf_counter() - started
+        dates = sorted({row["date"] for row in rows})[:2]
+
+        picks = [rng.choice(names) for _ in range(lookups)]
+        queries: Dict[str, Callable[[str], str]] = {
+            "exact": lambda name: name.upper(),
+            "prefix": lambda name: name[:max(4, len(name) - 3)],
+            "later_word": lambda name: name.split(" ")[-1][:5],
+            "misspelled": lambda name: misspell(name, rng),
+        }
+        result: Dict[str, Any] = {"locations": size, "rows": index.rows, "build_ms": round(build_s * 1000, 1)}
+        for kind, make_query in queries.items():
+            result[kind] = time_lookups(index, [make_query(name) for name in picks], dates)
+        results.append(result)
+    return results
+
+
+async def drive_weather(upstreams: FakeUpstreams, turns: int, snapshot: bool, snapshot_path: str) -> Dict[str, Any]:
+    os.environ["WEATHER_SNAPSHOT_ENABLED"] = "1" if snapshot else ""
+    os.environ["WEATHER_SNAPSHOT_PATH"] = snapshot_path
+    action = FetchWeather()
+    action.API_BASE_URL = upstreams.weather_url
+    rng = random.Random(4)
+    locations = upstreams.config.locations
+
+    async def turn(location: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        messages = await run_turn(action, fixtures.weather_tracker(0, location))
+        return {"latency": time.perf_counter() - started, "text": messages[0].get("text", "") if messages else ""}
+
+    def summary(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+        latencies = [sample["latency"] for sample in samples]
+        answered = sum(sample["text"].startswith("The weather in") for sample in samples)
+        return {
+            "answered": round(answered / len(samples), 4),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        }
+
+    upstreams.config.failure_rate = 0.0
+    healthy = [await turn(fixtures.zipf_choice(rng, locations)) for _ in range(turns)]
+    upstreams.config.failure_rate = 1.0
+    # Every location, including those the per-location cache never saw while healthy.
+    outage = [await turn(location.lower()) for location in locations]
+    upstreams.config.failure_rate = 0.0
+    return {"snapshot": snapshot, "healthy": summary(healthy), "upstream_down": summary(outage)}
+
+
+async def bench_action(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        async with FakeUpstreams(FakeUpstreamConfig(weather_latency=args.weather_latency)) as upstreams:
+            for snapshot in (False, True):
+                results.append(await drive_weather(upstreams, args.turns, snapshot, os.path.join(tmp, "snapshot.json")))
+            results.append({"weather_requests": upstreams.requests["weather"]})
+        await close_session()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--locations", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--turns", type=int, default=200, help="Weather action turns per mode")
+    parser.add_argument("--weather-latency", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    index_results = bench_index(args.locations, args.lookups, args.seed)
+    for result in index_results:
+        print(", ".join(f"{key}={value}" for key, value in result.items()))
+
+    # The action logs with print(); keep that noise out of the report.
+    with contextlib.redirect_stdout(io.StringIO()):
+        action_results = asyncio.run(bench_action(args))
+    for result in action_results:
+        print(", ".join(f"{key}={value}" for key, value in result.items()))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"index": index_results, "action": action_results}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
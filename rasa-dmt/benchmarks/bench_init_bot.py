@@ -0,0 +1,89 @@
+"""
+Session-start throughput of InitBot token processing, before and after caching.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.bench_init_bot --sessions 20000 --distinct-tokens 500
+
+"before" replays the original path (HS256 verify plus a new AES cipher per
+claim on every session start); "after" is ``InitBot._process_token`` with the
+verified-token cache and shared cipher.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from .tokens import mint_token
+
+os.environ.setdefault("JWT_KEY", "bench-jwt-signing-key-0123456789abcdef")
+os.environ.setdefault("ENCRYPTION_KEY", "bench-encryption-key")
+
+from actions.actions_bot_init import InitBot, UserInfo  # noqa: E402
+
+
+def legacy_process_token(bot: InitBot, token: str) -> UserInfo:
+    """The original _process_token: verify, then build a cipher for each claim."""
+    decoded = bot.token_decoder.decode_token(token)
+
+    def decrypt(claim: str) -> str:
+        cipher = Cipher(algorithms.AES(bot.claim_decryptor.key), modes.ECB(), backend=default_backend())
+        decryptor = cipher.decryptor()
+        plain = decryptor.update(base64.b64decode(claim)) + decryptor.finalize()
+        return plain.decode('utf-8').rstrip('\x06\t')
+
+    return UserInfo(user_account=decrypt(decoded['user_account']), role=decrypt(decoded['role']))
+
+
+async def measure(label: str, fn: Any, tokens: List[str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    for token in tokens:
+        result = fn(token)
+        if asyncio.iscoroutine(result):
+            await result
+    elapsed = time.perf_counter() - started
+    return {
+        "path": label,
+        "sessions": len(tokens),
+        "sessions_per_s": round(len(tokens) / elapsed, 1),
+        "mean_us": round(elapsed / len(tokens) * 1e6, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--distinct-tokens", type=int, default=500)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    distinct = [
+        mint_token(f"user{i}", rng.choice(["admin", "staff", "guest"]),
+                   os.environ["JWT_KEY"], os.environ["ENCRYPTION_KEY"])
+        for i in range(args.distinct_tokens)
+    ]
+    workload = [rng.choice(distinct) for _ in range(args.sessions)]
+
+    bot = InitBot()
+    results = [
+        asyncio.run(measure("before", lambda token: legacy_process_token(bot, token), workload)),
+        asyncio.run(measure("after", bot._process_token, workload)),
+    ]
+    for result in results:
+        print(", ".join(f"{key}={value}" for key, value in result.items()))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
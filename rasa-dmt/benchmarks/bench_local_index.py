@@ -0,0 +1,125 @@
+"""
+Check the local vector replica against Milvus and compare search latency.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.bench_local_index --rows 30000 --dim 1536 --queries 200
+
+The reference answers come from the in-process Milvus stand-in, which scans
+exhaustively like a FLAT index. The script reports how many top-k result
+lists match exactly (and the mean top-k overlap, which is what matters for
+``--quantization int8``), the per-query latency of both paths, the size of
+the mapped vector matrix and the cost of an incremental refresh after new rows
+are added.
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from actions import milvus_manager
+from actions.actions_milvus_search import MilvusConfig
+from actions.local_index import LocalIndexConfig, LocalVectorIndex
+from actions.metrics import percentile
+
+from . import fake_milvus
+
+
+def add_rows(server: fake_milvus.FakeMilvusServer, count: int, rng: random.Random) -> None:
+    start = len(server.rows)
+    for pk in range(start, start + count):
+        server.rows.append({
+            "pk": pk,
+            "vector": server.random_vector(rng),
+            "text": f"Document {pk} added later.",
+            "permission": [rng.choice(["admin", "staff", "guest"])],
+        })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=3)
+    parser.add_argument("--added-rows", type=int, default=100)
+    parser.add_argument("--quantization", default="", choices=["", "int8"])
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    rng = random.Random(21)
+    server = fake_milvus.FakeMilvusServer(dim=args.dim, rows=args.rows, search_latency=0.0, connect_latency=0.0)
+    fake_milvus.install(server, milvus_manager)
+    manager = milvus_manager.MilvusConnectionManager(MilvusConfig(pool_size=1))
+    manager.start()
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        index = LocalVectorIndex(LocalIndexConfig(
+            enabled=True, snapshot_dir=snapshot_dir, quantization=args.quantization
+        ), manager)
+
+        started = time.perf_counter()
+        index.refresh(force=True)
+        full_refresh_s = time.perf_counter() - started
+
+        matches = 0
+        overlap = 0.0
+        local_latencies: List[float] = []
+        milvus_latencies: List[float] = []
+        for _ in range(args.queries):
+            vector = server.random_vector(rng)
+            role = rng.choice(["admin", "staff", "guest"])
+
+            started = time.perf_counter()
+            local = index.search_blocking(vector, role, args.limit)
+            local_latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            with manager.collection() as collection:
+                remote = collection.search(
+                    data=[vector], anns_field="vector", output_fields=["text"],
+                    expr=milvus_manager.role_filter(role), limit=args.limit,
+                    param={"metric_type": "L2", "params": {}}
+                )[0]
+            milvus_latencies.append(time.perf_counter() - started)
+
+            matches += [hit.id for hit in local] == [hit.id for hit in remote]
+            overlap += len({hit.id for hit in local} & {hit.id for hit in remote}) / max(1, len(remote))
+
+        vector_bytes = index.snapshot().vectors.nbytes
+        add_rows(server, args.added_rows, rng)
+        with manager.collection() as collection:
+            manager.corpus_generation = milvus_manager.corpus_generation(collection)
+        fetched_before = index.rows_fetched
+        started = time.perf_counter()
+        index.refresh()
+        incremental_refresh_s = time.perf_counter() - started
+
+    manager.close()
+    results: Dict[str, Any] = {
+        "rows": args.rows,
+        "dim": args.dim,
+        "queries": args.queries,
+        "quantization": args.quantization or "none",
+        "exact_topk_matches": matches,
+        "mean_topk_overlap": round(overlap / args.queries, 4),
+        "vector_mib": round(vector_bytes / 2 ** 20, 2),
+        "local_p50_ms": round(percentile(local_latencies, 50) * 1000, 3),
+        "local_p99_ms": round(percentile(local_latencies, 99) * 1000, 3),
+        "standin_p50_ms": round(percentile(milvus_latencies, 50) * 1000, 3),
+        "full_refresh_s": round(full_refresh_s, 3),
+        "incremental_refresh_s": round(incremental_refresh_s, 3),
+        "incremental_rows_fetched": index.rows_fetched - fetched_before,
+    }
+    for key, value in results.items():
+        print(f"{key}: {value}")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Compare per-turn Milvus latency: connect-per-call versus the pooled manager.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.bench_milvus_connections --turns 400 --concurrency 16
+
+Both paths run against the in-process stand-in from ``benchmarks.fake_milvus``;
+tune ``--connect-latency`` / ``--search-latency`` to match a real deployment.
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from actions import milvus_manager
+from actions.actions_milvus_search import MilvusConfig
+from actions.metrics import percentile
+
+from . import fake_milvus
+
+
+def legacy_turn(server: fake_milvus.FakeMilvusServer, config: MilvusConfig,
+                vector: List[float], role: str) -> None:
+    """The original per-turn flow: connect, describe, search, disconnect 'default'."""
+    connections = fake_milvus.FakeConnections(server)
+    collection_cls = fake_milvus.make_collection_class(server)
+    try:
+        connections.connect("default", host=config.host, port=config.port,
+                            user=config.username, password=config.password)
+        collection = collection_cls(name=config.collection_name)
+        collection.search(
+            data=[vector],
+            anns_field="vector",
+            output_fields=["text"],
+            expr=f"ARRAY_CONTAINS(permission, '{role}')",
+            limit=3,
+            param={"metric_type": "L2", "params": {}}
+        )
+    finally:
+        connections.disconnect("default")
+
+
+def pooled_turn(manager: milvus_manager.MilvusConnectionManager,
+                vector: List[float], role: str) -> None:
+    """The pooled flow used by MilvusSearchAction."""
+    with manager.collection() as collection:
+        collection.search(
+            data=[vector],
+            anns_field="vector",
+            output_fields=["text"],
+            expr=milvus_manager.role_filter(role),
+            limit=3,
+            param={"metric_type": "L2", "params": {}}
+        )
+
+
+def run_path(turn: Callable[[List[float], str], None], server: fake_milvus.FakeMilvusServer,
+             turns: int, concurrency: int) -> Dict[str, Any]:
+    """Drive ``turns`` calls through ``turn`` from ``concurrency`` threads."""
+    rng = random.Random(11)
+    work = [(server.random_vector(rng), rng.choice(["admin", "staff", "guest"])) for _ in range(turns)]
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(args: tuple) -> None:
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            turn(*args)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    connects_before = server.connects
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, work))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "turns": turns,
+        "errors": errors,
+        "connects": server.connects - connects_before,
+        "throughput_per_s": round(turns / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--connect-latency", type=float, default=0.02)
+    parser.add_argument("--describe-latency", type=float, default=0.005)
+    parser.add_argument("--search-latency", type=float, default=0.01)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    server = fake_milvus.FakeMilvusServer(
+        connect_latency=args.connect_latency,
+        describe_latency=args.describe_latency,
+        search_latency=args.search_latency
+    )
+    config = MilvusConfig(pool_size=args.pool_size)
+
+    fake_milvus.install(server, milvus_manager)
+    manager = milvus_manager.MilvusConnectionManager(config)
+    manager.start()
+
+    results = {
+        "connect_per_call": run_path(
+            lambda vector, role: legacy_turn(server, config, vector, role),
+            server, args.turns, args.concurrency
+        ),
+        "pooled": run_path(
+            lambda vector, role: pooled_turn(manager, vector, role),
+            server, args.turns, args.concurrency
+        ),
+    }
+    manager.close()
+
+    for path, stats in results.items():
+        print(f"{path:>18}: " + ", ".join(f"{key}={value}" for key, value in stats.items()))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Compare search latency of the filter and role-partitioned Milvus layouts.
+
+Run from the ``rasa-dmt`` directory against a disposable Milvus server:
+
+    python -m benchmarks.bench_partition_layout --sizes 10000 100000 --dim 256
+
+For every corpus size the script creates two scratch collections holding the
+same random rows: one searched with ``ARRAY_CONTAINS`` on ``permission`` and
+one laid out like ``tools.migrate_partitions``, searched by partition. Roles
+get different selectivity (``--roles admin:1.0 staff:0.3 guest:0.02`` means a
+row is visible to staff with probability 0.3), since narrow roles are where
+filtering hurts most. Latency is reported per size, layout and role. Needs a
+Milvus standalone/cluster server; Milvus Lite has no partition support.
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List, Tuple
+
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+from actions.actions_milvus_search import MilvusConfig
+from actions.metrics import percentile
+from actions.milvus_manager import SOURCE_PK_FIELD, partition_for_role, role_filter
+from tools.migrate_partitions import target_schema
+
+BENCH_ALIAS = "bench-layout"
+
+
+def parse_roles(specs: List[str]) -> List[Tuple[str, float]]:
+    roles = []
+    for spec in specs:
+        role, _, share = spec.partition(":")
+        roles.append((role, float(share or 1.0)))
+    return roles
+
+
+def build_schema(dim: int) -> CollectionSchema:
+    return CollectionSchema([
+        FieldSchema("pk", DataType.INT64, is_primary=True),
+        FieldSchema("text", DataType.VARCHAR, max_length=64),
+        FieldSchema("permission", DataType.ARRAY, element_type=DataType.VARCHAR,
+                    max_capacity=16, max_length=128),
+        FieldSchema("vector", DataType.FLOAT_VECTOR, dim=dim),
+    ], description="Partition layout benchmark")
+
+
+def make_rows(size: int, dim: int, roles: List[Tuple[str, float]],
+              rng: random.Random) -> List[Dict[str, Any]]:
+    rows = []
+    for pk in range(size):
+        permission = [role for role, share in roles if rng.random() < share] or [roles[0][0]]
+        rows.append({
+            "pk": pk,
+            "text": f"Document {pk}",
+            "permission": permission,
+            "vector": [rng.random() for _ in range(dim)],
+        })
+    return rows
+
+
+def create_collection(name: str, schema: CollectionSchema, index_type: str) -> Collection:
+    if utility.has_collection(name, using=BENCH_ALIAS):
+        utility.drop_collection(name, using=BENCH_ALIAS)
+    collection = Collection(name, schema, using=BENCH_ALIAS)
+    collection.create_index("vector", {"index_type": index_type, "metric_type": "L2", "params": {}})
+    return collection
+
+
+def load_layouts(size: int, dim: int, roles: List[Tuple[str, float]], index_type: str,
+                 batch_size: int, rng: random.Random) -> Dict[str, Collection]:
+    """Create and fill both layouts with the same rows."""
+    filtered = create_collection(f"bench_filter_{size}", build_schema(dim), index_type)
+    partitioned = create_collection(f"bench_partition_{size}", target_schema(filtered), index_type)
+    for role, _ in roles:
+        partitioned.create_partition(partition_for_role(role))
+
+    rows = make_rows(size, dim, roles, rng)
+    for start in range(0, size, batch_size):
+        batch = rows[start:start + batch_size]
+        filtered.insert(batch)
+        for role, _ in roles:
+            partition = partition_for_role(role)
+            visible = [{**row, "pk": f"{row['pk']}:{partition}", SOURCE_PK_FIELD: row["pk"]}
+                       for row in batch if role in row["permission"]]
+            if visible:
+                partitioned.insert(visible, partition_name=partition)
+
+    for collection in (filtered, partitioned):
+        collection.flush()
+        collection.load()
+    return {"filter": filtered, "partition": partitioned}
+
+
+def time_searches(collection: Collection, layout: str, role: str, dim: int,
+                  queries: int, limit: int, rng: random.Random) -> Dict[str, float]:
+    scope: Dict[str, Any] = (
+        {"partition_names": [partition_for_role(role)]} if layout == "partition"
+        else {"expr": role_filter(role)}
+    )
+    latencies: List[float] = []
+    for _ in range(queries):
+        vector = [rng.random() for _ in range(dim)]
+        started = time.perf_counter()
+        collection.search(
+            data=[vector], anns_field="vector", output_fields=["text"], limit=limit,
+            param={"metric_type": "L2", "params": {}}, **scope
+        )
+        latencies.append(time.perf_counter() - started)
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--roles", nargs="+", default=["admin:1.0", "staff:0.3", "guest:0.02"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=3)
+    parser.add_argument("--index-type", default="AUTOINDEX")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--host", help="Milvus host (default: MilvusConfig.host)")
+    parser.add_argument("--port", help="Milvus port (default: MilvusConfig.port)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch collections")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    config = MilvusConfig()
+    connections.connect(
+        BENCH_ALIAS,
+        host=args.host or config.host,
+        port=args.port or config.port,
+        user=config.username,
+        password=config.password
+    )
+    roles = parse_roles(args.roles)
+    rng = random.Random(17)
+
+    results: List[Dict[str, Any]] = []
+    for size in args.sizes:
+        layouts = load_layouts(size, args.dim, roles, args.index_type, args.batch_size, rng)
+        for role, share in roles:
+            for layout, collection in layouts.items():
+                stats = time_searches(collection, layout, role, args.dim, args.queries, args.limit, rng)
+                results.append({"size": size, "role": role, "selectivity": share, "layout": layout, **stats})
+                print(f"size={size:<8} role={role:<8} selectivity={share:<5} layout={layout:<10} "
+                      + ", ".join(f"{key}={value}" for key, value in stats.items()))
+        if not args.keep:
+            for collection in layouts.values():
+                collection.drop()
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
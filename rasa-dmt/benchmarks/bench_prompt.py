@@ -0,0 +1,209 @@
+"""
+Compare the original RAG prompt with the cache-friendly, token-budgeted builder.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.bench_prompt --turns 200 --budget 1500
+
+Each turn retrieves three documents of realistic, uneven length (long policy
+pages, overlapping chunks of the same page, exact duplicates) for a fixture
+question and sends the prompt to the fake OpenAI server from
+``benchmarks.fake_upstreams``. That server emulates prompt caching (identical
+prefixes of 1024+ tokens in 128-token steps) and charges prefill time per
+uncached prompt token, so the report shows prompt tokens, the cached-token
+ratio and completion latency for both layouts. OpenAI only caches prefixes of
+1024 tokens or more; the builder's static prefix (instructions, output format
+and worked examples) is sized past that, while the legacy prompt puts its
+instructions after the documents and never shares a long enough prefix.
+``--extra-instructions`` adds that many more tokens of worked examples to
+both layouts. Token counts use tiktoken when it is installed and ~4
+characters per token otherwise.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from actions.http_session import close_session  # noqa: E402
+from actions.metrics import LLM_TOKENS, percentile  # noqa: E402
+from actions.openai_client import OpenAIClient, OpenAIConfig  # noqa: E402
+from actions.prompt_builder import (  # noqa: E402
+    MIN_CACHED_PREFIX_TOKENS, PromptBuilder, PromptBuilderConfig, TokenCounter
+)
+
+from . import fixtures  # noqa: E402
+from .fake_upstreams import FakeUpstreamConfig, FakeUpstreams  # noqa: E402
+
+SENTENCES = [
+    "Requests for {topic} are submitted through the staff portal and approved by the line manager.",
+    "The {topic} policy applies to permanent and contract staff from their first day of service.",
+    "Supporting documents for {topic} must be uploaded within fourteen days of the request.",
+    "Questions about {topic} can be sent to the human resources helpdesk during office hours.",
+    "An illustrated guide to {topic} is available at https://example.invalid/{slug}.png for reference.",
+    "Late submissions for {topic} are reviewed case by case and may require director approval.",
+]
+
+
+def legacy_prompt(texts: List[str], user_input: str, language: str, default_image: str,
+                  extra_instructions: str = "") -> str:
+    """The prompt as ``MilvusSearchAction._format_search_results`` built it before the builder."""
+    formatted_results = [f"{{}}\n{text}" for text in texts]
+    output = "\n".join(f"{i}. {result}" for i, result in enumerate(formatted_results, start=1))
+    return (
+        f"Given the following information, please provide an answer based solely on one relevant "
+        f"document that best addresses the user's query.\n"
+        f"Reference only the most applicable document for the answer, and include any available "
+        f"images from the same document.\n"
+        f"If the document contains no image, use the placeholder image provided.\n\n"
+        f"===\nRelevant Documents\n{output}\n\n"
+        f"===\nCurrent Conversation\n"
+        f"Transcript of the current conversation, use it to determine the context of the question:\n"
+        f"USER:{user_input}\n\n"
+        f"===\n"
+        f"When answering, ensure that:\n"
+        f"- The answer is grounded in the provided documents and conversation context.\n"
+        f"- Always try to answer the query if applicable document or context is available, "
+        f"even if no image is provided.\n"
+        f"Keep responses concise (2 to 3 sentences) and within 200 - 300 words.\n"
+        f"- The information from the summarised document does not lose or change any of its meanings.\n"
+        f"- Do not refer to 'provided documents' in your response.\n"
+        f"- If an image is available from the chosen document, include its URL.\n"
+        f"- If no image is available in the referenced document, use the default placeholder URL:\n"
+        f"{default_image}\n"
+        f"If the answer is not known or cannot be determined from the provided documents or context, "
+        f"please state that you do not know to the user.\n"
+        f"Your response should be in a json format with 'image_url' for the appropriate image url "
+        f"and 'text' for your answer.\n"
+        f"Your response should be in simple {language}."
+        + (f"\n\n{extra_instructions}" if extra_instructions else "")
+    )
+
+
+def worked_examples(tokens: int, rng: random.Random) -> str:
+    """About ``tokens`` tokens of question/answer examples for the static prefix."""
+    examples: List[str] = ["Examples of good answers:"]
+    while sum(len(example) for example in examples) < tokens * 4:
+        topic = rng.choice(fixtures.TOPICS)
+        examples.append(
+            f"Q: how do I apply for {topic}?\n"
+            f'A: {{"image_url": null, "text": "{make_document(topic, 2, rng)}"}}'
+        )
+    return "\n".join(examples)
+
+
+def make_document(topic: str, sentences: int, rng: random.Random) -> str:
+    slug = topic.replace(" ", "-")
+    return " ".join(rng.choice(SENTENCES).format(topic=topic, slug=slug) for _ in range(sentences))
+
+
+def retrieved_documents(topic: str, rng: random.Random) -> List[str]:
+    """Three hits the way chunked ingestion tends to return them."""
+    page = make_document(topic, rng.randint(20, 60), rng)
+    kind = rng.random()
+    if kind < 0.3:
+        # Two overlapping chunks of the same long page.
+        middle = len(page) // 2
+        return [page[:middle + 200], page[middle - 200:], make_document(topic, rng.randint(3, 10), rng)]
+    if kind < 0.45:
+        return [page, page, make_document(topic, rng.randint(3, 10), rng)]
+    return [page, make_document(topic, rng.randint(5, 30), rng), make_document(topic, rng.randint(3, 10), rng)]
+
+
+async def run_layout(name: str, build: Callable[[List[str], str, str], Tuple[str, str]],
+                     turns: List[Tuple[List[str], str, str]], client: OpenAIClient,
+                     tokens: TokenCounter) -> Dict[str, Any]:
+    model = client.config.chat_model
+    prompt_before = LLM_TOKENS.value(model, "prompt")
+    cached_before = LLM_TOKENS.value(model, "cached_prompt")
+    counted: List[int] = []
+    latencies: List[float] = []
+    for texts, question, language in turns:
+        system, user = build(texts, question, language)
+        counted.append(tokens.count(system) + tokens.count(user))
+        started = time.perf_counter()
+        await client.get_chat_response(user, language, system=system or None)
+        latencies.append(time.perf_counter() - started)
+
+    reported = LLM_TOKENS.value(model, "prompt") - prompt_before
+    cached = LLM_TOKENS.value(model, "cached_prompt") - cached_before
+    return {
+        "layout": name,
+        "mean_prompt_tokens": round(sum(counted) / len(counted), 1),
+        "p99_prompt_tokens": percentile([float(count) for count in counted], 99),
+        "cached_token_ratio": round(cached / reported, 4) if reported else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    rng = random.Random(args.seed)
+    questions = fixtures.question_pool(200)
+    turns = []
+    for _ in range(args.turns):
+        question = rng.choice(questions)
+        topic = next((topic for topic in fixtures.TOPICS if topic in question), rng.choice(fixtures.TOPICS))
+        turns.append((retrieved_documents(topic, rng), question, rng.choice(fixtures.LANGUAGES)))
+
+    extra_instructions = worked_examples(args.extra_instructions, rng) if args.extra_instructions else ""
+    upstream_config = FakeUpstreamConfig(
+        chat_latency=args.chat_latency,
+        chat_latency_per_prompt_token=args.prefill_ms_per_token / 1000
+    )
+    async with FakeUpstreams(upstream_config) as upstreams:
+        openai_config = OpenAIConfig()
+        openai_config.api_base = upstreams.openai_base
+        client = OpenAIClient(openai_config)
+        builder = PromptBuilder(
+            PromptBuilderConfig(document_token_budget=args.budget, extra_instructions=extra_instructions),
+            openai_config.default_image
+        )
+        tokens = builder.tokens
+        prefix_tokens = tokens.count(builder.prefix('en-GB'))
+        print(f"token counting: {'tiktoken' if tokens.exact else '~4 chars per token'}, "
+              f"static prefix: {prefix_tokens} tokens "
+              f"({'cacheable' if prefix_tokens >= MIN_CACHED_PREFIX_TOKENS else 'too short to cache'})")
+
+        def legacy(texts: List[str], question: str, language: str) -> Tuple[str, str]:
+            return "", legacy_prompt(texts, question, language, openai_config.default_image, extra_instructions)
+
+        def budgeted(texts: List[str], question: str, language: str) -> Tuple[str, str]:
+            prompt = builder.build(texts, question, language)
+            return prompt.system, prompt.user
+
+        results = [
+            await run_layout("legacy", legacy, turns, client, tokens),
+            await run_layout("builder", budgeted, turns, client, tokens),
+        ]
+        await close_session()
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=1500, help="Document token budget for the builder")
+    parser.add_argument("--chat-latency", type=float, default=0.15, help="Fixed completion latency in seconds")
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.2)
+    parser.add_argument("--extra-instructions", type=int, default=0,
+                        help="Tokens of worked examples added to the static instructions")
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for result in results:
+        print(", ".join(f"{key}={value}" for key, value in result.items()))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Check deadlines, circuit breakers and request coalescing against slow and failing fakes.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.bench_resilience --deadline 1.5
+
+Every scenario drives the real actions against the fake OpenAI and
+data.gov.my servers from ``benchmarks.fake_upstreams`` and the in-process
+Milvus from ``benchmarks.fake_milvus``, and prints what it measured next to
+what it expects:
+
+- ``slow_chat`` / ``slow_embedding`` / ``slow_weather``: an upstream that
+  takes far longer than the per-call timeout; the turn must end at the
+  deadline with a friendly message.
+- ``coalescing``: concurrent identical questions must reach each upstream
+  once.
+- ``breaker``: with every upstream request failing, the OpenAI breaker must
+  open after ``failure_threshold`` failures, later turns must fail fast
+  without network calls, and one trial after ``reset_timeout`` must close it
+  again once the upstream recovers.
+
+The script exits non-zero if any check fails.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from . import fake_milvus, fixtures
+from .bench_actions import run_turn
+from .fake_upstreams import FakeUpstreamConfig, FakeUpstreams
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("RELEVANCE_MAX_DISTANCE", "inf")
+
+from actions import milvus_manager  # noqa: E402
+from actions.actions_fetch_weather import FetchWeather  # noqa: E402
+from actions.actions_milvus_search import MilvusSearchAction  # noqa: E402
+from actions.http_session import close_session  # noqa: E402
+from actions.resilience import get_breaker  # noqa: E402
+
+# Just beyond the 10s per-call timeouts, which the deadline must cut short.
+SLOW = 11.0
+
+
+def check(name: str, passed: bool, **measured: Any) -> Dict[str, Any]:
+    return {"check": name, "passed": passed, **measured}
+
+
+async def timed_turn(action: Any, tracker: Any) -> Dict[str, Any]:
+    started = time.perf_counter()
+    messages = await run_turn(action, tracker)
+    return {"seconds": time.perf_counter() - started, "text": messages[0].get("text") if messages else None}
+
+
+async def slow_upstream(upstreams: FakeUpstreams, action: Any, tracker: Any, setting: str,
+                        deadline: float) -> Dict[str, Any]:
+    normal = getattr(upstreams.config, setting)
+    setattr(upstreams.config, setting, SLOW)
+    try:
+        turn = await timed_turn(action, tracker)
+    finally:
+        setattr(upstreams.config, setting, normal)
+    # Without the deadline the turn would wait for the 10s per-call timeout.
+    return check(
+        f"slow_{setting.split('_')[0]}", deadline <= turn["seconds"] < deadline + 0.5,
+        seconds=round(turn["seconds"], 3), expected=f"~{deadline}s", reply=turn["text"]
+    )
+
+
+async def coalescing(upstreams: FakeUpstreams, action: MilvusSearchAction, callers: int) -> Dict[str, Any]:
+    before = dict(upstreams.requests)
+    searches_before = action.milvus.search_flight.calls
+    tracker = fixtures.search_tracker(0, "how do I apply for coalesced leave?", "staff")
+    await asyncio.gather(*(run_turn(action, tracker) for _ in range(callers)))
+    embeddings = upstreams.requests["embeddings"] - before["embeddings"]
+    chats = upstreams.requests["chat"] - before["chat"]
+    searches = action.milvus.search_flight.calls - searches_before
+    return check(
+        "coalescing", embeddings == 1 and searches == 1 and chats == 1,
+        callers=callers, embedding_requests=embeddings, milvus_searches=searches, chat_requests=chats
+    )
+
+
+async def breaker(upstreams: FakeUpstreams, action: MilvusSearchAction, turns: int) -> Dict[str, Any]:
+    openai = get_breaker("openai")
+    openai.config.reset_timeout = 1.0
+    upstreams.config.failure_rate = 1.0
+    before = upstreams.requests["embeddings"]
+    durations: List[float] = []
+    for turn in range(turns):
+        tracker = fixtures.search_tracker(turn, f"what is the outage policy {turn}?", "staff")
+        durations.append((await timed_turn(action, tracker))["seconds"])
+    attempted = upstreams.requests["embeddings"] - before
+    opened = openai.state == openai.OPEN
+    fast = durations[openai.config.failure_threshold:]
+
+    upstreams.config.failure_rate = 0.0
+    await asyncio.sleep(openai.config.reset_timeout)
+    recovered = await timed_turn(action, fixtures.search_tracker(0, "what is the recovery policy?", "staff"))
+    return check(
+        "breaker",
+        opened and attempted == openai.config.failure_threshold and openai.state == openai.CLOSED,
+        failing_turns=turns, upstream_requests=attempted,
+        max_open_turn_ms=round(max(fast) * 1000, 2) if fast else None,
+        recovered_reply=recovered["text"]
+    )
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    upstream_config = FakeUpstreamConfig(embedding_latency=0.01, chat_latency=0.05, weather_latency=0.02)
+    server = fake_milvus.FakeMilvusServer(dim=upstream_config.embedding_dim, rows=500, search_latency=0.01)
+    fake_milvus.install(server, milvus_manager)
+
+    results = []
+    async with FakeUpstreams(upstream_config) as upstreams:
+        search = MilvusSearchAction()
+        search.openai_config.api_base = upstreams.openai_base
+        search.deadline_config.seconds = args.deadline
+        weather = FetchWeather()
+        weather.API_BASE_URL = upstreams.weather_url
+        weather.deadline_config.seconds = args.deadline
+
+        # Warm the Milvus pool so the first scenario measures only the upstream.
+        await run_turn(search, fixtures.search_tracker(0, "warm up", "staff"))
+
+        results.append(await slow_upstream(
+            upstreams, search, fixtures.search_tracker(1, "is the chat slow today?", "staff"),
+            "chat_latency", args.deadline
+        ))
+        results.append(await slow_upstream(
+            upstreams, search, fixtures.search_tracker(2, "is the embedding slow today?", "staff"),
+            "embedding_latency", args.deadline
+        ))
+        results.append(await slow_upstream(
+            upstreams, weather, fixtures.weather_tracker(3, "Ipoh"), "weather_latency", args.deadline
+        ))
+        results.append(await coalescing(upstreams, search, args.callers))
+        results.append(await breaker(upstreams, search, args.failing_turns))
+        await close_session()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--deadline", type=float, default=1.5, help="Turn deadline in seconds")
+    parser.add_argument("--callers", type=int, default=50, help="Concurrent identical questions")
+    parser.add_argument("--failing-turns", type=int, default=20)
+    parser.add_argument("--verbose", action="store_true", help="Show the actions' own output")
+    args = parser.parse_args()
+
+    sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        results = asyncio.run(run(args))
+    for result in results:
+        status = "PASS" if result["passed"] else "FAIL"
+        print(f"{status} " + ", ".join(f"{key}={value}" for key, value in result.items() if key != "passed"))
+    sys.exit(0 if all(result["passed"] for result in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
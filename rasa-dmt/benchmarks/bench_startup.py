@@ -0,0 +1,174 @@
+"""
+Measure action server cold start: import/registration time and time to first request.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.bench_startup --runs 5 --output startup.json
+
+Every run is a fresh interpreter that registers the ``actions`` package the
+way the action server does (``ActionExecutor.register_package``), which
+imports every module and instantiates every action. It then sends each action
+its first and second request against the fake OpenAI and data.gov.my servers
+from ``benchmarks.fake_upstreams`` and the in-process Milvus from
+``benchmarks.fake_milvus``. Runs alternate between ``ACTION_WARMUP`` off and
+on: with warm-up the work moves from the first request to registration,
+i.e. before the server reports ready. ``--import-profile`` also lists the
+slowest top-level imports of a cold start (``python -X importtime``).
+
+The fakes are started before the clock starts, and the Milvus stand-in is
+installed as part of the timed registration, so only the actions' own
+imports and setup are measured.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+FIRST_REQUEST_ACTIONS = ("action_init_bot", "action_milvus_search", "action_fetch_weather")
+
+
+async def child(token: str) -> Dict[str, Any]:
+    """One cold start, run inside a fresh interpreter."""
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+    os.environ.setdefault("RELEVANCE_MAX_DISTANCE", "inf")
+    os.environ["ACTION_METRICS_PORT"] = "0"
+
+    # Nothing imported before the clock starts may pull in rasa_sdk or the actions.
+    from . import fake_milvus
+    from .fake_upstreams import FakeUpstreamConfig, FakeUpstreams
+
+    upstream_config = FakeUpstreamConfig(embedding_latency=0.01, chat_latency=0.05, weather_latency=0.02)
+    server = fake_milvus.FakeMilvusServer(dim=upstream_config.embedding_dim, rows=500, search_latency=0.005)
+    async with FakeUpstreams(upstream_config) as upstreams:
+        started = time.perf_counter()
+        from rasa_sdk.executor import ActionExecutor
+        framework = time.perf_counter()
+
+        from actions import milvus_manager
+        fake_milvus.install(server, milvus_manager)
+        executor = ActionExecutor()
+        executor.register_package("actions")
+        ready = time.perf_counter()
+
+        from . import fixtures
+        from .bench_actions import run_turn
+
+        instances = {name: run.__self__ for name, run in executor.actions.items()}
+        instances["action_milvus_search"].openai_config.api_base = upstreams.openai_base
+        instances["action_fetch_weather"].API_BASE_URL = upstreams.weather_url
+        trackers = {
+            "action_init_bot": lambda turn: fixtures.init_bot_tracker(turn, token),
+            "action_milvus_search": lambda turn: fixtures.search_tracker(
+                turn, f"how do I apply for annual leave {turn}?", "staff"
+            ),
+            "action_fetch_weather": lambda turn: fixtures.weather_tracker(turn, "Ipoh"),
+        }
+
+        turns: Dict[str, List[float]] = {}
+        for name in FIRST_REQUEST_ACTIONS:
+            for turn in range(2):
+                turn_started = time.perf_counter()
+                await run_turn(instances[name], trackers[name](turn))
+                turns.setdefault(name, []).append(round((time.perf_counter() - turn_started) * 1000, 2))
+
+        from actions.http_session import close_session
+        await close_session()
+
+    return {
+        "framework_import_ms": round((framework - started) * 1000, 2),
+        "register_ms": round((ready - framework) * 1000, 2),
+        "first_request_ms": {name: times[0] for name, times in turns.items()},
+        "second_request_ms": {name: times[1] for name, times in turns.items()},
+    }
+
+
+def spawn(warmup: bool, token: str, profile: bool = False) -> Dict[str, Any]:
+    env = dict(os.environ, ACTION_WARMUP="1" if warmup else "", BENCH_STARTUP_TOKEN=token)
+    command = [sys.executable] + (["-X", "importtime"] if profile else []) + ["-m", "benchmarks.bench_startup", "--child"]
+    started = time.perf_counter()
+    completed = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if profile:
+        result["import_profile"] = completed.stderr
+    return result
+
+
+def slowest_imports(profile: str, count: int) -> List[str]:
+    """Top-level packages by time spent importing them, from ``-X importtime`` output."""
+    totals: Dict[str, int] = {}
+    for line in profile.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # One leading space marks an import made directly by running code, not by another import.
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue
+        top = name.strip().split(".")[0]
+        if top != "benchmarks":
+            totals[top] = totals.get(top, 0) + int(cumulative.strip())
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+    return [f"{name} {micros / 1000:.1f}ms" for name, micros in ranked]
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def median(values: List[float]) -> float:
+        return round(statistics.median(values), 2)
+
+    return {
+        "runs": len(runs),
+        "process_ms": median([run["process_ms"] for run in runs]),
+        "framework_import_ms": median([run["framework_import_ms"] for run in runs]),
+        "register_ms": median([run["register_ms"] for run in runs]),
+        "first_request_ms": {
+            name: median([run["first_request_ms"][name] for run in runs]) for name in FIRST_REQUEST_ACTIONS
+        },
+        "second_request_ms": {
+            name: median([run["second_request_ms"][name] for run in runs]) for name in FIRST_REQUEST_ACTIONS
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per mode")
+    parser.add_argument("--import-profile", action="store_true", help="List the slowest imports")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Keep the actions' own logging out of the JSON line the parent reads.
+        sys.stdout, real_stdout = sys.stderr, sys.stdout
+        result = asyncio.run(child(os.environ["BENCH_STARTUP_TOKEN"]))
+        real_stdout.write(json.dumps(result) + "\n")
+        return
+
+    os.environ.setdefault("JWT_KEY", "bench-jwt-signing-key-0123456789abcdef")
+    os.environ.setdefault("ENCRYPTION_KEY", "bench-encryption-key")
+    from .tokens import mint_token
+    token = mint_token("user@example.com", "staff", os.environ["JWT_KEY"], os.environ["ENCRYPTION_KEY"])
+
+    report: Dict[str, Any] = {}
+    for warmup in (False, True):
+        mode = "warmup" if warmup else "lazy"
+        report[mode] = summarize([spawn(warmup, token) for _ in range(args.runs)])
+        print(f"{mode}: " + ", ".join(f"{key}={value}" for key, value in report[mode].items()))
+
+    if args.import_profile:
+        profile = spawn(False, token, profile=True)["import_profile"]
+        report["slowest_imports"] = slowest_imports(profile, 12)
+        print("slowest imports: " + ", ".join(report["slowest_imports"]))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
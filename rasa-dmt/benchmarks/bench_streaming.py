@@ -0,0 +1,215 @@
+"""
+Streamed versus blocking RAG chat completions: time to first text, total latency, malformed answers.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.bench_streaming --requests 40 --malformed-rate 0.2 --output streaming.json
+
+The fake OpenAI server from ``benchmarks.fake_upstreams`` answers after
+``--first-token`` seconds and then generates the answer at ``--chars-per-second``,
+streaming it when asked to. Three parts:
+
+- ``parser``: cost of ``IncrementalJSONParser`` on one answer fed in
+  ``--chunk-chars`` pieces, against one ``json.loads`` of the whole answer.
+- ``client``: ``OpenAIClient.get_chat_response`` with streaming off and on,
+  for a model that always returns JSON and for one that wraps
+  ``--malformed-rate`` of its answers in prose. Time to first text is when
+  the answer's text is first available (for a blocking call, the whole
+  response); ``answered`` is how many calls returned a usable answer and
+  ``chat_requests`` how many completions that took.
+- ``action``: ``action_milvus_search`` turns, blocking and streamed with
+  ``PARTIAL_REPLY_URL`` pointed at the fake relay, comparing when the first
+  partial text reached the relay with when the action returned its reply.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from . import fake_milvus, fixtures
+from .bench_actions import run_turn
+from .fake_upstreams import FakeUpstreamConfig, FakeUpstreams
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("RELEVANCE_MAX_DISTANCE", "inf")
+os.environ["ACTION_METRICS_PORT"] = "0"
+
+from actions import milvus_manager  # noqa: E402
+from actions.actions_milvus_search import MilvusSearchAction  # noqa: E402
+from actions.http_session import close_session  # noqa: E402
+from actions.metrics import percentile  # noqa: E402
+from actions.openai_client import OpenAIClient, OpenAIConfig  # noqa: E402
+from actions.stream_json import IncrementalJSONParser  # noqa: E402
+
+ANSWER = (
+    "Annual leave is requested through the HR portal under Leave, then New request. Pick the dates, "
+    "add a short note for your manager and submit; your manager is notified at once and usually "
+    "replies within two working days. Requests made less than a week ahead need a reason, and leave "
+    "that spans a public holiday only counts working days against your balance."
+)
+
+
+def percentile_ms(seconds: List[float], pct: float) -> Optional[float]:
+    """``percentile`` in milliseconds, or None when nothing was measured."""
+    return round(percentile(seconds, pct) * 1000, 2) if seconds else None
+
+
+def parser_cost(chunk_chars: int, rounds: int) -> Dict[str, Any]:
+    document = json.dumps({"text": ANSWER, "image_url": "https://example.invalid/image.png"})
+    chunks = [document[i:i + chunk_chars] for i in range(0, len(document), chunk_chars)]
+    started = time.perf_counter()
+    for _ in range(rounds):
+        parser = IncrementalJSONParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.close()
+    incremental = (time.perf_counter() - started) / rounds
+    started = time.perf_counter()
+    for _ in range(rounds):
+        json.loads(document)
+    whole = (time.perf_counter() - started) / rounds
+    return {
+        "answer_chars": len(document),
+        "chunks": len(chunks),
+        "incremental_us": round(incremental * 1e6, 1),
+        "json_loads_us": round(whole * 1e6, 1),
+    }
+
+
+async def client_run(upstreams: FakeUpstreams, stream: bool, requests: int, concurrency: int) -> Dict[str, Any]:
+    config = OpenAIConfig()
+    config.api_base = upstreams.openai_base
+    config.stream = stream
+    client = OpenAIClient(config)
+    semaphore = asyncio.Semaphore(concurrency)
+    first_text: List[float] = []
+    totals: List[float] = []
+    answered = 0
+    before = dict(upstreams.requests)
+
+    async def one(index: int) -> None:
+        nonlocal answered
+        async with semaphore:
+            started = time.perf_counter()
+            seen: List[float] = []
+
+            async def on_text(text: str) -> None:
+                if text and not seen:
+                    seen.append(time.perf_counter() - started)
+
+            _, text = await client.get_chat_response(
+                f"question {index}: how do I apply for annual leave?", "English",
+                system="Answer in JSON.", on_text=on_text
+            )
+            elapsed = time.perf_counter() - started
+            totals.append(elapsed)
+            if text:
+                answered += 1
+                first_text.append(seen[0] if seen else elapsed)
+
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    return {
+        "mode": "stream" if stream else "blocking",
+        "malformed_rate": upstreams.config.malformed_rate,
+        "first_text_p50_ms": percentile_ms(first_text, 50),
+        "first_text_p95_ms": percentile_ms(first_text, 95),
+        "total_p50_ms": percentile_ms(totals, 50),
+        "total_p95_ms": percentile_ms(totals, 95),
+        "answered": f"{answered}/{requests}",
+        "chat_requests": upstreams.requests["chat"] - before["chat"],
+        "malformed_answers": upstreams.requests["chat_malformed"] - before["chat_malformed"],
+    }
+
+
+async def action_run(upstreams: FakeUpstreams, stream: bool, turns: int) -> Dict[str, Any]:
+    search = MilvusSearchAction()
+    search.openai_config.api_base = upstreams.openai_base
+    search.openai_config.stream = stream
+    search.partial_reply_config.url = upstreams.partial_reply_url
+    await run_turn(search, fixtures.search_tracker(0, "warm up", "staff"))
+
+    first_text: List[float] = []
+    replies: List[float] = []
+    updates: List[int] = []
+    for turn in range(1, turns + 1):
+        tracker = fixtures.search_tracker(turn, f"how do I apply for annual leave, case {turn}?", "staff")
+        mark = len(upstreams.partial_replies)
+        started = time.perf_counter()
+        await run_turn(search, tracker)
+        replies.append(time.perf_counter() - started)
+        # Let a partial update still in flight land before counting.
+        await asyncio.sleep(0.05)
+        arrivals = [
+            arrived for arrived, recipient, text in upstreams.partial_replies[mark:]
+            if recipient == tracker.sender_id and text
+        ]
+        updates.append(len(arrivals))
+        first_text.append(arrivals[0] - started if arrivals else replies[-1])
+    return {
+        "mode": "stream" if stream else "blocking",
+        "first_text_p50_ms": percentile_ms(first_text, 50),
+        "reply_p50_ms": percentile_ms(replies, 50),
+        "reply_p95_ms": percentile_ms(replies, 95),
+        "partial_updates_per_turn": round(statistics.mean(updates), 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    upstream_config = FakeUpstreamConfig(
+        embedding_latency=0.01,
+        chat_latency=args.first_token,
+        chat_chunk_chars=args.chunk_chars,
+        chat_chunk_interval=args.chunk_chars / args.chars_per_second,
+        answer=ANSWER,
+    )
+    server = fake_milvus.FakeMilvusServer(dim=upstream_config.embedding_dim, rows=500, search_latency=0.005)
+    fake_milvus.install(server, milvus_manager)
+
+    report: Dict[str, Any] = {"client": [], "action": []}
+    async with FakeUpstreams(upstream_config) as upstreams:
+        for malformed_rate in (0.0, args.malformed_rate):
+            upstreams.config.malformed_rate = malformed_rate
+            for stream in (False, True):
+                report["client"].append(await client_run(upstreams, stream, args.requests, args.concurrency))
+        upstreams.config.malformed_rate = 0.0
+        for stream in (False, True):
+            report["action"].append(await action_run(upstreams, stream, args.turns))
+        await close_session()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=40, help="Chat completions per client run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=10, help="Action turns per mode")
+    parser.add_argument("--first-token", type=float, default=0.35, help="Seconds to the first token")
+    parser.add_argument("--chars-per-second", type=float, default=250.0, help="Answer generation rate")
+    parser.add_argument("--chunk-chars", type=int, default=4, help="Characters per streamed chunk")
+    parser.add_argument("--malformed-rate", type=float, default=0.2)
+    parser.add_argument("--verbose", action="store_true", help="Show the actions' own output")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {"parser": parser_cost(args.chunk_chars, 2000)}
+    sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        report.update(asyncio.run(run(args)))
+
+    print("parser: " + ", ".join(f"{key}={value}" for key, value in report["parser"].items()))
+    for part in ("client", "action"):
+        for row in report[part]:
+            print(f"{part}: " + ", ".join(f"{key}={value}" for key, value in row.items()))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
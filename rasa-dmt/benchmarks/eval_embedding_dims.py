@@ -0,0 +1,185 @@
+"""
+Evaluate reduced-dimension and int8-quantized embeddings on the query log.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.eval_embedding_dims --corpus docs/ --queries query_log.txt \\
+        --dims 1536 1024 512 256 --quantize
+
+The corpus is chunked like ``tools.ingest`` and embedded once per dimension
+setting through ``OpenAIClient``, so the ``dimensions`` request parameter is
+exercised as in production; queries (one per line, plain text or JSON with a
+``text`` key) are embedded the same way. Quality is measured against the
+exact top-k of the first ``--dims`` value in float32: recall@k and how often
+the baseline's best chunk is still ranked first. Every setting also reports
+bytes per stored vector and for the whole corpus, embedding request latency
+and exact-search latency over the corpus. ``--fake`` runs the pipeline against
+``benchmarks.fake_upstreams`` (whose vectors are not semantic, so only sizes
+and latencies mean anything there).
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from actions.local_index import quantize_int8
+from actions.metrics import percentile
+from actions.openai_client import OpenAIClient, OpenAIConfig
+from tools.ingest import FULL_EMBEDDING_DIM, iter_chunks, iter_source_files
+
+from .fake_upstreams import FakeUpstreamConfig, FakeUpstreams
+
+
+def load_corpus(paths: List[str], chunk_chars: int, overlap_chars: int, limit: Optional[int]) -> List[str]:
+    texts: List[str] = []
+    for path in iter_source_files(paths):
+        for chunk in iter_chunks(path, path, ["admin"], chunk_chars, overlap_chars):
+            texts.append(chunk.text)
+            if limit and len(texts) >= limit:
+                return texts
+    return texts
+
+
+def load_queries(path: str) -> List[str]:
+    queries: List[str] = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = line
+            queries.append(record["text"] if isinstance(record, dict) else str(record))
+    return queries
+
+
+async def embed_setting(config: OpenAIConfig, corpus: List[str], queries: List[str],
+                        batch_size: int) -> Dict[str, Any]:
+    """Embed the corpus in batches and each query on its own, timing the query requests."""
+    client = OpenAIClient(config)
+    corpus_vectors: List[List[float]] = []
+    for start in range(0, len(corpus), batch_size):
+        corpus_vectors.extend(await client.get_embeddings_batch(corpus[start:start + batch_size]))
+
+    query_vectors: List[List[float]] = []
+    latencies: List[float] = []
+    for query in queries:
+        started = time.perf_counter()
+        query_vectors.append((await client.get_embeddings_batch([query]))[0])
+        latencies.append(time.perf_counter() - started)
+    return {
+        "corpus": np.asarray(corpus_vectors, dtype=np.float32),
+        "queries": np.asarray(query_vectors, dtype=np.float32),
+        "embed_latencies": latencies,
+    }
+
+
+def exact_search(matrix: np.ndarray, scales: Optional[np.ndarray], queries: np.ndarray,
+                 k: int) -> Dict[str, Any]:
+    """Exact L2 top-k for every query, the way ``actions.local_index`` scores rows."""
+    if scales is None:
+        norms = np.einsum("ij,ij->i", matrix, matrix)
+    else:
+        widened = matrix.astype(np.float32)
+        norms = np.einsum("ij,ij->i", widened, widened) * scales ** 2
+
+    results: List[List[int]] = []
+    latencies: List[float] = []
+    for query in queries:
+        started = time.perf_counter()
+        dots = matrix @ query if scales is None else (matrix.astype(np.float32) @ query) * scales
+        distances = norms - 2.0 * dots
+        top = np.argpartition(distances, min(k, len(distances)) - 1)[:k]
+        results.append(top[np.argsort(distances[top], kind="stable")].tolist())
+        latencies.append(time.perf_counter() - started)
+    return {"results": results, "latencies": latencies}
+
+
+def compare(results: List[List[int]], baseline: List[List[int]], k: int) -> Dict[str, float]:
+    recall = [len(set(found) & set(expected)) / len(expected) for found, expected in zip(results, baseline)]
+    top1 = [found[:1] == expected[:1] for found, expected in zip(results, baseline)]
+    return {
+        f"recall_at_{k}": round(float(np.mean(recall)), 4),
+        "top1_agreement": round(float(np.mean(top1)), 4),
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    corpus = load_corpus(args.corpus, args.chunk_chars, args.overlap_chars, args.max_chunks)
+    queries = load_queries(args.queries)
+    print(f"corpus={len(corpus)} chunks, queries={len(queries)}")
+
+    upstreams: Optional[FakeUpstreams] = None
+    if args.fake:
+        upstreams = FakeUpstreams(FakeUpstreamConfig(embedding_dim=FULL_EMBEDDING_DIM, embedding_latency=0.02))
+        await upstreams.__aenter__()
+
+    rows: List[Dict[str, Any]] = []
+    baseline: Optional[List[List[int]]] = None
+    try:
+        for dims in args.dims:
+            config = OpenAIConfig()
+            config.embedding_dimensions = None if dims == FULL_EMBEDDING_DIM else dims
+            if upstreams is not None:
+                config.api_base = upstreams.openai_base
+                config.api_key = config.api_key or "sk-fake"
+            embedded = await embed_setting(config, corpus, queries, args.batch_size)
+
+            variants = [("float32", embedded["corpus"], None)]
+            if args.quantize:
+                quantized, scales = quantize_int8(embedded["corpus"])
+                variants.append(("int8", quantized, scales))
+
+            for storage, matrix, scales in variants:
+                searched = exact_search(matrix, scales, embedded["queries"], args.k)
+                if baseline is None:
+                    baseline = searched["results"]
+                bytes_per_vector = dims * 4 if scales is None else dims + 4
+                row = {
+                    "dims": dims,
+                    "storage": storage,
+                    "bytes_per_vector": bytes_per_vector,
+                    "corpus_mib": round(bytes_per_vector * len(corpus) / 2 ** 20, 2),
+                    **compare(searched["results"], baseline, args.k),
+                    "embed_p50_ms": round(percentile(embedded["embed_latencies"], 50) * 1000, 2),
+                    "embed_p99_ms": round(percentile(embedded["embed_latencies"], 99) * 1000, 2),
+                    "search_p50_ms": round(percentile(searched["latencies"], 50) * 1000, 3),
+                    "search_p99_ms": round(percentile(searched["latencies"], 99) * 1000, 3),
+                }
+                rows.append(row)
+                print(", ".join(f"{key}={value}" for key, value in row.items()))
+    finally:
+        if upstreams is not None:
+            await upstreams.__aexit__(None, None, None)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", nargs="+", required=True, help="Files or directories, as for tools.ingest")
+    parser.add_argument("--queries", required=True, help="Query log, one question per line")
+    parser.add_argument("--dims", type=int, nargs="+", default=[FULL_EMBEDDING_DIM, 1024, 512, 256],
+                        help="Dimension settings; the first one is the quality baseline")
+    parser.add_argument("--quantize", action="store_true", help="Also score int8-quantized copies")
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--max-chunks", type=int, help="Only embed the first N corpus chunks")
+    parser.add_argument("--chunk-chars", type=int, default=1500)
+    parser.add_argument("--overlap-chars", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--fake", action="store_true", help="Use the local fake OpenAI server")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(rows, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
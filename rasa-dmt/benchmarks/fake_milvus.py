@@ -0,0 +1,250 @@
+"""
+In-process stand-in for a Milvus server.
+
+Mimics the parts of the pymilvus ORM the actions use (``connections``,
+``Collection`` and ``utility``) with configurable handshake, metadata and
+search latencies, so connection handling can be benchmarked without a
+running ``milvus-standalone-rasa`` container.
+"""
+import json
+import random
+import re
+import threading
+import time
+from types import ModuleType
+from typing import Any, Dict, List, Optional
+
+
+class FakeEntity:
+    """Output fields of a single hit."""
+
+    def __init__(self, fields: Dict[str, Any]):
+        self._fields = fields
+
+    def __getattr__(self, item: str) -> Any:
+        try:
+            return self._fields[item]
+        except KeyError:
+            raise AttributeError(item)
+
+    def get(self, item: str, default: Any = None) -> Any:
+        return self._fields.get(item, default)
+
+
+class FakeHit:
+    """A search hit exposing ``id``, ``distance`` and ``entity`` like pymilvus."""
+
+    def __init__(self, pk: int, distance: float, fields: Dict[str, Any]):
+        self.id = pk
+        self.distance = distance
+        self.entity = FakeEntity(fields)
+
+
+class FakeMilvusServer:
+    """Shared server state: live aliases, stored rows and simulated latencies."""
+
+    def __init__(
+        self,
+        dim: int = 8,
+        rows: int = 200,
+        roles: tuple = ("admin", "staff", "guest"),
+        connect_latency: float = 0.02,
+        describe_latency: float = 0.005,
+        search_latency: float = 0.01,
+        seed: int = 7
+    ):
+        self.dim = dim
+        self.connect_latency = connect_latency
+        self.describe_latency = describe_latency
+        self.search_latency = search_latency
+        self.aliases: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.connects = 0
+
+        rng = random.Random(seed)
+        self.rows: List[Dict[str, Any]] = []
+        for pk in range(rows):
+            visible = [role for role in roles if rng.random() < 0.6] or [roles[0]]
+            self.rows.append({
+                "pk": pk,
+                "vector": [rng.uniform(-1, 1) for _ in range(dim)],
+                "text": f"Document {pk} about topic {pk % 17}.",
+                "permission": visible
+            })
+
+    def random_vector(self, rng: Optional[random.Random] = None) -> List[float]:
+        rng = rng or random
+        return [rng.uniform(-1, 1) for _ in range(self.dim)]
+
+    def _require(self, alias: str) -> None:
+        with self.lock:
+            if alias not in self.aliases:
+                raise ConnectionError(f"should create connection first: {alias}")
+
+    @staticmethod
+    def _matches(row: Dict[str, Any], expr: Optional[str]) -> bool:
+        if not expr:
+            return True
+        for quote in ("'", '"'):
+            prefix = f"ARRAY_CONTAINS(permission, {quote}"
+            if expr.startswith(prefix) and expr.endswith(f"{quote})"):
+                return re.sub(r"\\(.)", r"\1", expr[len(prefix):-2]) in row["permission"]
+        if expr == "pk >= 0":
+            return True
+        if expr.startswith("pk in ["):
+            return row["pk"] in json.loads(expr[len("pk in "):])
+        raise ValueError(f"Unsupported expression in stand-in: {expr}")
+
+    def query(self, alias: str, expr: str, output_fields: List[str]) -> List[Dict[str, Any]]:
+        self._require(alias)
+        fields = set(output_fields) | {"pk"}
+        return [
+            {key: value for key, value in row.items() if key in fields}
+            for row in self.rows
+            if self._matches(row, expr)
+        ]
+
+    def partition_roles(self) -> Dict[str, str]:
+        """Partition name -> role, as laid out by tools.migrate_partitions."""
+        from actions.milvus_manager import partition_for_role
+        roles = {role for row in self.rows for role in row["permission"]}
+        return {partition_for_role(role): role for role in roles}
+
+    def search(self, alias: str, vector: List[float], expr: Optional[str],
+               limit: int, output_fields: List[str],
+               partition_names: Optional[List[str]] = None) -> List[FakeHit]:
+        self._require(alias)
+        time.sleep(self.search_latency)
+        roles = None
+        if partition_names:
+            mapping = self.partition_roles()
+            roles = {mapping[name] for name in partition_names if name in mapping}
+        scored = [
+            (sum((a - b) ** 2 for a, b in zip(vector, row["vector"])), row)
+            for row in self.rows
+            if self._matches(row, expr) and (roles is None or roles & set(row["permission"]))
+        ]
+        scored.sort(key=lambda item: item[0])
+        # A disconnect issued by another request mid-search breaks this one.
+        self._require(alias)
+        return [
+            FakeHit(row["pk"], distance, {f: row[f] for f in output_fields})
+            for distance, row in scored[:limit]
+        ]
+
+
+class FakeQueryIterator:
+    """Batches of query results, like ``Collection.query_iterator``."""
+
+    def __init__(self, rows: List[Dict[str, Any]], batch_size: int):
+        self._rows = rows
+        self._batch_size = batch_size
+        self._offset = 0
+
+    def next(self) -> List[Dict[str, Any]]:
+        batch = self._rows[self._offset:self._offset + self._batch_size]
+        self._offset += len(batch)
+        return batch
+
+    def close(self) -> None:
+        self._rows = []
+
+
+class FakeConnections:
+    """Replacement for ``pymilvus.connections``."""
+
+    def __init__(self, server: FakeMilvusServer):
+        self.server = server
+
+    def connect(self, alias: str = "default", **kwargs: Any) -> None:
+        time.sleep(self.server.connect_latency)
+        with self.server.lock:
+            self.server.aliases[alias] = kwargs
+            self.server.connects += 1
+
+    def disconnect(self, alias: str) -> None:
+        with self.server.lock:
+            self.server.aliases.pop(alias, None)
+
+    def has_connection(self, alias: str) -> bool:
+        with self.server.lock:
+            return alias in self.server.aliases
+
+
+class FakeUtility:
+    """Replacement for ``pymilvus.utility``."""
+
+    def __init__(self, server: FakeMilvusServer):
+        self.server = server
+
+    def get_server_version(self, using: str = "default", timeout: Optional[float] = None) -> str:
+        self.server._require(using)
+        return "v2.4.12-standin"
+
+    def has_collection(self, collection_name: str, using: str = "default", timeout: Optional[float] = None) -> bool:
+        self.server._require(using)
+        return True
+
+
+def make_collection_class(server: FakeMilvusServer) -> type:
+    """Build a ``Collection`` replacement bound to the given server."""
+
+    class FakeCollection:
+        def __init__(self, name: str, using: str = "default", **kwargs: Any):
+            server._require(using)
+            time.sleep(server.describe_latency)
+            self.name = name
+            self.using = using
+
+        def load(self, **kwargs: Any) -> None:
+            server._require(self.using)
+
+        @property
+        def schema(self) -> Any:
+            primary = type("FieldSchema", (), {"name": "pk", "is_primary": True})()
+            return type("CollectionSchema", (), {"primary_field": primary, "fields": [primary]})()
+
+        def query(self, expr: str, output_fields: Optional[List[str]] = None, **kwargs: Any) -> List[Dict[str, Any]]:
+            return server.query(self.using, expr, output_fields or [])
+
+        def query_iterator(self, batch_size: int = 1000, expr: Optional[str] = None,
+                           output_fields: Optional[List[str]] = None, **kwargs: Any) -> FakeQueryIterator:
+            return FakeQueryIterator(server.query(self.using, expr or "", output_fields or []), batch_size)
+
+        def describe(self, **kwargs: Any) -> Dict[str, Any]:
+            server._require(self.using)
+            return {"collection_name": self.name, "properties": {}}
+
+        @property
+        def num_entities(self) -> int:
+            server._require(self.using)
+            return len(server.rows)
+
+        def search(self, data: List[List[float]], anns_field: str, param: Dict[str, Any],
+                   limit: int, expr: Optional[str] = None,
+                   output_fields: Optional[List[str]] = None,
+                   partition_names: Optional[List[str]] = None, **kwargs: Any) -> List[List[FakeHit]]:
+            return [
+                server.search(self.using, vector, expr, limit, output_fields or [], partition_names)
+                for vector in data
+            ]
+
+        @property
+        def partitions(self) -> List[Any]:
+            server._require(self.using)
+            names = ["_default"] + sorted(server.partition_roles())
+            return [type("Partition", (), {"name": name})() for name in names]
+
+    return FakeCollection
+
+
+def install(server: FakeMilvusServer, *modules: ModuleType) -> None:
+    """Point the pymilvus names imported by ``modules`` at the stand-in."""
+    collection_cls = make_collection_class(server)
+    for module in modules:
+        if hasattr(module, "connections"):
+            module.connections = FakeConnections(server)
+        if hasattr(module, "Collection"):
+            module.Collection = collection_cls
+        if hasattr(module, "utility"):
+            module.utility = FakeUtility(server)
@@ -0,0 +1,205 @@
+"""
+Local stand-in for a Redis server, for the shared cache backend.
+
+Speaks RESP2 on an ephemeral localhost port and implements the commands
+``actions.cache_backend.RedisBackend`` sends (plus a few for inspection):
+PING, AUTH, SELECT, GET, SET with EX/PX, DEL, DBSIZE, FLUSHDB, ZADD, ZREM,
+ZCARD, ZRANGE, ZREMRANGEBYRANK and ZREMRANGEBYSCORE. Expiry is honoured and
+every connection is served on its own thread, so it can be shared by
+several action-server processes.
+
+    with FakeRedis(latency=0.0005) as server:
+        os.environ["CACHE_REDIS_URL"] = server.url
+"""
+import socketserver
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class RespStore:
+    """Keyspace of the fake server: strings with optional expiry and sorted sets."""
+
+    def __init__(self):
+        self.strings: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.zsets: Dict[bytes, Dict[bytes, float]] = {}
+        self.lock = threading.Lock()
+        self.commands = 0
+
+    def _live(self, key: bytes) -> Optional[bytes]:
+        entry = self.strings.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            del self.strings[key]
+            return None
+        return value
+
+    def _ranked(self, key: bytes) -> List[bytes]:
+        members = self.zsets.get(key, {})
+        return [member for member, _ in sorted(members.items(), key=lambda item: (item[1], item[0]))]
+
+    @staticmethod
+    def _slice(items: List[bytes], start: int, stop: int) -> List[bytes]:
+        count = len(items)
+        start = max(0, start + count if start < 0 else start)
+        stop = stop + count if stop < 0 else stop
+        return items[start:stop + 1]
+
+    @staticmethod
+    def _score(raw: bytes) -> float:
+        text = raw.decode().lstrip("(")
+        return {"-inf": float("-inf"), "+inf": float("inf"), "inf": float("inf")}.get(text) or float(text)
+
+    def execute(self, args: List[bytes]) -> Any:
+        name, args = args[0].upper().decode(), args[1:]
+        with self.lock:
+            self.commands += 1
+            if name == "PING":
+                return "PONG"
+            if name in ("AUTH", "SELECT"):
+                return "OK"
+            if name == "GET":
+                return self._live(args[0])
+            if name == "SET":
+                expires = None
+                options = [option.upper() for option in args[2:]]
+                if b"PX" in options:
+                    expires = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+                elif b"EX" in options:
+                    expires = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+                self.strings[args[0]] = (args[1], expires)
+                return "OK"
+            if name == "DEL":
+                deleted = 0
+                for key in args:
+                    deleted += int(self._live(key) is not None)
+                    self.strings.pop(key, None)
+                    deleted += int(self.zsets.pop(key, None) is not None)
+                return deleted
+            if name == "DBSIZE":
+                return sum(self._live(key) is not None for key in list(self.strings)) + len(self.zsets)
+            if name == "FLUSHDB":
+                self.strings.clear()
+                self.zsets.clear()
+                return "OK"
+            if name == "ZADD":
+                members = self.zsets.setdefault(args[0], {})
+                added = 0
+                for score, member in zip(args[1::2], args[2::2]):
+                    added += int(member not in members)
+                    members[member] = float(score)
+                return added
+            if name == "ZREM":
+                members = self.zsets.get(args[0], {})
+                return sum(members.pop(member, None) is not None for member in args[1:])
+            if name == "ZCARD":
+                return len(self.zsets.get(args[0], {}))
+            if name == "ZRANGE":
+                return self._slice(self._ranked(args[0]), int(args[1]), int(args[2]))
+            if name == "ZREMRANGEBYRANK":
+                members = self.zsets.get(args[0], {})
+                doomed = self._slice(self._ranked(args[0]), int(args[1]), int(args[2]))
+                for member in doomed:
+                    del members[member]
+                return len(doomed)
+            if name == "ZREMRANGEBYSCORE":
+                members = self.zsets.get(args[0], {})
+                low, high = self._score(args[1]), self._score(args[2])
+                doomed = [member for member, score in members.items() if low <= score <= high]
+                for member in doomed:
+                    del members[member]
+                return len(doomed)
+        return RuntimeError(f"ERR unknown command '{name}'")
+
+
+def encode_reply(reply: Any) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return f"-{reply}\r\n".encode()
+    if isinstance(reply, str):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode_reply(item) for item in reply)
+
+
+def parse_commands(buffer: bytes) -> Tuple[List[List[bytes]], int]:
+    """Complete commands at the start of ``buffer`` and how many bytes they used."""
+    commands = []
+    position = 0
+    while True:
+        end = buffer.find(b"\r\n", position)
+        if end < 0:
+            return commands, position
+        count = int(buffer[position + 1:end])
+        cursor = end + 2
+        args = []
+        for _ in range(count):
+            end = buffer.find(b"\r\n", cursor)
+            if end < 0:
+                return commands, position
+            length = int(buffer[cursor + 1:end])
+            if len(buffer) < end + 2 + length + 2:
+                return commands, position
+            args.append(bytes(buffer[end + 2:end + 2 + length]))
+            cursor = end + 2 + length + 2
+        commands.append(args)
+        position = cursor
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self) -> None:
+        server: '_Server' = self.server
+        buffer = bytearray()
+        while True:
+            chunk = self.request.recv(65536)
+            if not chunk:
+                return
+            buffer += chunk
+            commands, used = parse_commands(buffer)
+            del buffer[:used]
+            if not commands:
+                continue
+            # A pipeline is answered in one write, after one round trip of latency.
+            replies = [server.store.execute(command) for command in commands]
+            if server.latency:
+                time.sleep(server.latency)
+            self.request.sendall(b"".join(encode_reply(reply) for reply in replies))
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, store: RespStore, latency: float):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.store = store
+        self.latency = latency
+
+
+class FakeRedis:
+    """The fake server on a background thread; ``latency`` is added per round trip."""
+
+    def __init__(self, latency: float = 0.0):
+        self.store = RespStore()
+        self._server = _Server(self.store, latency)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"redis://{host}:{port}/0"
+
+    def __enter__(self) -> 'FakeRedis':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,126 @@
+"""
+Serve the local stand-ins a full Rasa stack needs for offline load tests.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m benchmarks.fake_stack --port 8089 --milvus-uri ./.loadtest/milvus.db
+
+Serves ``benchmarks.fake_upstreams`` (the OpenAI API, including the prompts
+Rasa itself sends, and the data.gov.my weather API) on a fixed port, and
+seeds the knowledge base collection with one chunk per
+``benchmarks.fixtures.question_pool`` question, embedded with the same fake
+embeddings, so every question the load generator asks finds a relevant
+chunk. ``--milvus-uri`` is either a Milvus server (the compose ``milvus``
+service is ``http://localhost:19530``) or a file path, which opens a Milvus
+Lite database; an existing collection is left untouched. It then prints the
+environment the Rasa server needs to use the stand-ins and serves until
+interrupted.
+
+With ``docker compose``, pass ``--public-host host.docker.internal`` and
+export the printed variables (``MILVUS_ADDRESS`` excepted: the container
+reaches Milvus by its compose name) before ``docker compose up``. Rasa's own
+EnterpriseSearchPolicy (the ``search`` flow) connects to
+``milvus-standalone-rasa`` and needs the compose Milvus; Milvus Lite only
+serves the custom actions.
+"""
+import argparse
+import asyncio
+import os
+import re
+from typing import List
+
+from .fake_upstreams import FakeUpstreamConfig, FakeUpstreams, fake_embedding
+from .fixtures import ROLES, question_pool
+
+SEED_ALIAS = "fake-stack-seed"
+SEED_SOURCE = "loadtest"
+
+
+def seed_knowledge_base(uri: str, dim: int, questions: List[str]) -> str:
+    """Create and fill the collection the actions search, unless it exists."""
+    from pymilvus import Collection, connections, utility
+
+    from actions.actions_milvus_search import MilvusConfig
+    from tools.ingest import build_schema, chunk_pk
+
+    config = MilvusConfig()
+    config.uri = uri
+    lite = not re.match(r"^\w+://", uri)
+    if lite:
+        os.makedirs(os.path.dirname(os.path.abspath(uri)), exist_ok=True)
+    connections.connect(SEED_ALIAS, **config.connection_args())
+    try:
+        name = config.search_collection
+        if utility.has_collection(name, using=SEED_ALIAS):
+            return f"collection {name} already exists at {uri}; left as is"
+        collection = Collection(name, build_schema(dim), using=SEED_ALIAS)
+        # Milvus Lite only builds FLAT, IVF_FLAT and AUTOINDEX indexes.
+        index = {"index_type": "FLAT", "metric_type": config.metric_type, "params": {}} if lite \
+            else config.index_params()
+        collection.create_index(config.vector_field, index)
+        collection.insert([
+            {
+                "pk": chunk_pk(SEED_SOURCE, question, ROLES),
+                "source": SEED_SOURCE,
+                "text": f"Answer to '{question}': see the staff handbook, section {index_no + 1}.",
+                "permission": ROLES,
+                "vector": fake_embedding(question, dim),
+            }
+            for index_no, question in enumerate(questions)
+        ])
+        collection.flush()
+        return f"seeded {len(questions)} chunks into {name} at {uri}"
+    finally:
+        connections.disconnect(SEED_ALIAS)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    config = FakeUpstreamConfig(
+        embedding_latency=args.embedding_latency,
+        chat_latency=args.chat_latency,
+        weather_latency=args.weather_latency,
+        failure_rate=args.failure_rate,
+    )
+    if args.milvus_uri:
+        print(seed_knowledge_base(args.milvus_uri, config.embedding_dim, question_pool(args.questions)))
+
+    upstreams = await FakeUpstreams(config).start(args.host, args.port)
+    base = f"http://{args.public_host}:{args.port}"
+    print("Stand-ins are up. Start the Rasa server with:")
+    print(f"  OPENAI_API_BASE={base}/v1")
+    print("  OPENAI_API_KEY=sk-loadtest")
+    print(f"  WEATHER_API_URL={base}/weather/forecast")
+    if args.milvus_uri:
+        print(f"  MILVUS_ADDRESS={args.milvus_uri}")
+    print(f"  EMBEDDING_DIMENSIONS unset (the fake embeddings have {config.embedding_dim} dimensions)")
+    print("and the same JWT_KEY and ENCRYPTION_KEY as the load generator.")
+    try:
+        while True:
+            await asyncio.sleep(args.report_interval)
+            print("requests: " + ", ".join(f"{key}={value}" for key, value in upstreams.requests.items()))
+    finally:
+        await upstreams.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="0.0.0.0", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--public-host", default="localhost",
+                        help="Host name the Rasa server uses to reach the stand-ins")
+    parser.add_argument("--milvus-uri", help="Milvus server URI or Milvus Lite file to seed")
+    parser.add_argument("--questions", type=int, default=200, help="Knowledge base chunks to seed")
+    parser.add_argument("--embedding-latency", type=float, default=0.03)
+    parser.add_argument("--chat-latency", type=float, default=0.3)
+    parser.add_argument("--weather-latency", type=float, default=0.15)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--report-interval", type=float, default=30.0, help="Seconds between request counts")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
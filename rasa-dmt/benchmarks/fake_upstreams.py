@@ -0,0 +1,319 @@
+"""
+Local HTTP stand-ins for the OpenAI API and the data.gov.my weather API.
+
+Both run on one aiohttp server bound to an ephemeral localhost port:
+
+- ``POST /v1/embeddings`` returns deterministic vectors derived from the text
+- ``POST /v1/chat/completions`` returns a JSON ``{"image_url", "text"}`` answer
+  to the actions' JSON-mode requests, and answers Rasa's own LLM prompts
+  (command generator, response rephraser, enterprise search) with keyword
+  rules, so a full Rasa server can run against it; ``"stream": true``
+  requests get the answer as server-sent events, a few characters at a time
+- ``GET /weather/forecast`` serves a generated seven-day forecast table
+- ``POST /partial-replies`` records the partial answers an action sends
+  (``PARTIAL_REPLY_URL``) with their arrival times
+
+Latencies, failure rates and the embedding dimension are configurable so the
+same server covers happy-path benchmarks and slow or failing upstreams.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import struct
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+LOCATIONS = [
+    "Kuala Lumpur", "Johor Bahru", "George Town", "Ipoh", "Shah Alam", "Petaling Jaya",
+    "Kota Kinabalu", "Kuching", "Melaka", "Alor Setar", "Kuantan", "Kota Bharu",
+    "Seremban", "Kuala Terengganu", "Miri", "Sandakan", "Putrajaya", "Langkawi",
+]
+FORECASTS = ["Tiada hujan", "Hujan di beberapa tempat", "Ribut petir di kebanyakan tempat", "Berjerebu"]
+
+
+@dataclass
+class FakeUpstreamConfig:
+    """Behaviour of the fake upstreams."""
+    embedding_dim: int = 8
+    embedding_latency: float = 0.03
+    chat_latency: float = 0.3
+    # Extra chat latency per uncached prompt token (prefill); cached prefix tokens are free.
+    chat_latency_per_prompt_token: float = 0.0
+    # Generation time per chunk of ``chat_chunk_chars`` answer characters, on top of
+    # ``chat_latency``; streamed answers send each chunk as it is generated.
+    chat_chunk_chars: int = 4
+    chat_chunk_interval: float = 0.0
+    # Fraction of JSON-mode answers that arrive as prose wrapped around the JSON.
+    malformed_rate: float = 0.0
+    answer: str = ""
+    weather_latency: float = 0.15
+    failure_rate: float = 0.0
+    seed: int = 5
+    locations: List[str] = field(default_factory=lambda: list(LOCATIONS))
+
+
+KNOWLEDGE_ANSWER = "Our office is open from 9am to 5pm on weekdays."
+
+
+def prompt_text(messages: List[Dict[str, Any]]) -> str:
+    """The text of a chat request's messages, whether given as strings or content parts."""
+    parts = []
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = "\n".join(part.get("text", "") for part in content)
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def rasa_commands(prompt: str, locations: List[str]) -> str:
+    """
+    Commands in the format of Rasa's SingleStepLLMCommandGenerator (prompts/command_gen.jinja2).
+
+    Keyword rules stand in for the LLM: weather questions start
+    ``user_request_weather`` (filling ``location`` when a known one is named),
+    image requests start ``image_request``, anything else is a knowledge
+    question for ``SearchAndReply``.
+    """
+    match = re.search(r'The user just said """(.*?)"""', prompt, re.DOTALL)
+    message = match.group(1).strip() if match else ""
+    lowered = message.lower()
+    location = next((name for name in locations if name.lower() in lowered), None)
+    if 'asked the user for the slot "location"' in prompt:
+        return f"SetSlot(location, {location or message})"
+    if "weather" in lowered or "forecast" in lowered:
+        return "StartFlow(user_request_weather)" + (f"\nSetSlot(location, {location})" if location else "")
+    if any(word in lowered for word in ("image", "picture", "photo")):
+        return "StartFlow(image_request)"
+    if "language" in lowered:
+        return "StartFlow(user_language)"
+    if "my name" in lowered:
+        return "StartFlow(user_ask_username)"
+    return "SearchAndReply()"
+
+
+def rasa_completion(prompt: str, locations: List[str]) -> str:
+    """Answer one of the prompts a Rasa Pro server sends on its own."""
+    if "Your action list:" in prompt:
+        return rasa_commands(prompt, locations)
+    if "Rephrased AI Response:" in prompt:
+        match = re.search(r"Suggested AI Response: (.*?)\s*Rephrased AI Response:", prompt, re.DOTALL)
+        return match.group(1).strip() if match else ""
+    return KNOWLEDGE_ANSWER
+
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """A deterministic pseudo-random vector for ``text``."""
+    values: List[float] = []
+    counter = 0
+    while len(values) < dim:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(v / 2 ** 31 - 1.0 for v in struct.unpack("<8I", digest))
+        counter += 1
+    return values[:dim]
+
+
+def build_forecasts(locations: List[str], days: int = 7, seed: int = 5) -> List[Dict[str, Any]]:
+    """Rows in the shape returned by api.data.gov.my/weather/forecast."""
+    rng = random.Random(seed)
+    today = date.today()
+    rows = []
+    for index, name in enumerate(locations):
+        for offset in range(days):
+            low = rng.randint(22, 25)
+            rows.append({
+                "location": {"location_id": f"St{index:03d}", "location_name": name},
+                "date": (today + timedelta(days=offset)).isoformat(),
+                "morning_forecast": rng.choice(FORECASTS),
+                "afternoon_forecast": rng.choice(FORECASTS),
+                "night_forecast": rng.choice(FORECASTS),
+                "summary_forecast": rng.choice(FORECASTS),
+                "summary_when": rng.choice(["Pagi", "Petang", "Malam"]),
+                "min_temp": low,
+                "max_temp": low + rng.randint(7, 10),
+            })
+    return rows
+
+
+class FakeUpstreams:
+    """aiohttp application serving the fake endpoints, plus request counters."""
+
+    def __init__(self, config: Optional[FakeUpstreamConfig] = None):
+        self.config = config or FakeUpstreamConfig()
+        self.forecasts = build_forecasts(self.config.locations, seed=self.config.seed)
+        self.requests: Dict[str, int] = {
+            "embeddings": 0, "embedding_inputs": 0, "chat": 0, "chat_malformed": 0, "weather": 0,
+            "partial_replies": 0,
+        }
+        # (perf_counter at arrival, recipient_id, text) per partial reply
+        self.partial_replies: List[Tuple[float, str, str]] = []
+        self._rng = random.Random(self.config.seed)
+        self._prompt_prefixes: Set[bytes] = set()
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    def _should_fail(self) -> bool:
+        return self._rng.random() < self.config.failure_rate
+
+    async def _embeddings(self, request: web.Request) -> web.Response:
+        self.requests["embeddings"] += 1
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        self.requests["embedding_inputs"] += len(inputs)
+        dim = body.get("dimensions") or self.config.embedding_dim
+        await asyncio.sleep(self.config.embedding_latency)
+        if self._should_fail():
+            return web.json_response({"error": {"message": "upstream failure"}}, status=503)
+        return web.json_response({
+            "object": "list",
+            "model": body.get("model"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text, dim)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": sum(len(str(t).split()) for t in inputs)},
+        })
+
+    def _cached_prompt_tokens(self, prompt: str) -> int:
+        """
+        Emulate OpenAI prompt caching for a prompt of ``len(prompt) // 4`` tokens.
+
+        Prompts of 1024 tokens or more are cached in 128-token steps; a request
+        is credited with the longest step-aligned prefix seen before.
+        """
+        tokens = len(prompt) // 4
+        cached = 0
+        for size in range(1024, tokens + 1, 128):
+            key = hashlib.sha256(prompt[:size * 4].encode("utf-8")).digest()
+            if key in self._prompt_prefixes:
+                cached = size
+            else:
+                self._prompt_prefixes.add(key)
+        return cached
+
+    def _chat_content(self, body: Dict[str, Any]) -> str:
+        if (body.get("response_format") or {}).get("type") != "json_object":
+            return rasa_completion(prompt_text(body.get("messages", [])), self.config.locations)
+        content = json.dumps({
+            "text": self.config.answer or KNOWLEDGE_ANSWER,
+            "image_url": "https://example.invalid/image.png",
+        })
+        if self._rng.random() < self.config.malformed_rate:
+            self.requests["chat_malformed"] += 1
+            content = f"Sure! Here is the answer in JSON:\n```json\n{content}\n```"
+        return content
+
+    async def _chat(self, request: web.Request) -> web.StreamResponse:
+        self.requests["chat"] += 1
+        body = await request.json()
+        prompt = json.dumps(body.get("messages", []))
+        prompt_tokens = len(prompt) // 4
+        cached_tokens = self._cached_prompt_tokens(prompt)
+        await asyncio.sleep(
+            self.config.chat_latency
+            + (prompt_tokens - cached_tokens) * self.config.chat_latency_per_prompt_token
+        )
+        if self._should_fail():
+            return web.json_response({"error": {"message": "upstream failure"}}, status=503)
+        content = self._chat_content(body)
+        size = self.config.chat_chunk_chars
+        chunks = [content[i:i + size] for i in range(0, len(content), size)]
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                 "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+
+        if body.get("stream"):
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            started = time.monotonic()
+            for index, chunk in enumerate(chunks):
+                # Pace against the start, so sleep overhead does not add up over many chunks.
+                await asyncio.sleep(started + (index + 1) * self.config.chat_chunk_interval - time.monotonic())
+                event = {"object": "chat.completion.chunk", "model": body.get("model"),
+                         "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}]}
+                try:
+                    await response.write(f"data: {json.dumps(event)}\n\n".encode())
+                except ConnectionResetError:
+                    # The client dropped the stream, e.g. after rejecting a malformed answer.
+                    return response
+            tail = {"object": "chat.completion.chunk", "choices": [], "usage": usage}
+            await response.write(f"data: {json.dumps(tail)}\n\ndata: [DONE]\n\n".encode())
+            await response.write_eof()
+            return response
+
+        await asyncio.sleep(len(chunks) * self.config.chat_chunk_interval)
+        return web.json_response({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        })
+
+    async def _weather(self, request: web.Request) -> web.Response:
+        self.requests["weather"] += 1
+        await asyncio.sleep(self.config.weather_latency)
+        if self._should_fail():
+            return web.json_response({"message": "upstream failure"}, status=503)
+
+        rows = self.forecasts
+        contains = request.query.get("contains")
+        if contains:
+            needle = contains.split("@", 1)[0].lower()
+            rows = [row for row in rows if needle in row["location"]["location_name"].lower()]
+        limit = request.query.get("limit")
+        if limit:
+            rows = rows[:int(limit)]
+        return web.json_response(rows)
+
+    async def _partial_reply(self, request: web.Request) -> web.Response:
+        self.requests["partial_replies"] += 1
+        body = await request.json()
+        self.partial_replies.append((time.perf_counter(), body.get("recipient_id"), body.get("text", "")))
+        return web.json_response({"ok": True})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/embeddings", self._embeddings)
+        app.router.add_post("/v1/chat/completions", self._chat)
+        app.router.add_get("/weather/forecast", self._weather)
+        app.router.add_post("/partial-replies", self._partial_reply)
+        return app
+
+    @property
+    def openai_base(self) -> str:
+        return f"{self.base_url}/v1"
+
+    @property
+    def weather_url(self) -> str:
+        return f"{self.base_url}/weather/forecast"
+
+    @property
+    def partial_reply_url(self) -> str:
+        return f"{self.base_url}/partial-replies"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeUpstreams":
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{bound_port}"
+        return self
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeUpstreams":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
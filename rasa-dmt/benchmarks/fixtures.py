@@ -0,0 +1,110 @@
+"""Realistic Tracker fixtures for driving the custom actions outside Rasa."""
+import random
+from typing import Any, Dict, List, Optional
+
+from rasa_sdk import Tracker
+
+ROLES = ["admin", "staff", "guest"]
+LANGUAGES = ["en-GB", "id-ID"]
+
+QUESTION_TEMPLATES = [
+    "what are the office hours for {topic}?",
+    "how do I apply for {topic}?",
+    "who do I contact about {topic}?",
+    "where can I find the form for {topic}?",
+    "when is the deadline for {topic}?",
+    "show me an image of the {topic} process",
+]
+TOPICS = [
+    "annual leave", "medical claims", "travel reimbursement", "laptop replacement",
+    "parking permits", "training budget", "remote work", "payroll", "onboarding",
+    "security badges", "meeting rooms", "expense reports",
+]
+
+
+def make_tracker(
+    sender_id: str,
+    slots: Dict[str, Any],
+    text: str = "",
+    entities: Optional[List[Dict[str, Any]]] = None,
+    intent: str = "",
+) -> Tracker:
+    """Build a Tracker the way the action server would for one turn."""
+    latest_message = {
+        "text": text,
+        "intent": {"name": intent, "confidence": 1.0},
+        "entities": entities or [],
+    }
+    return Tracker(
+        sender_id=sender_id,
+        slots=dict(slots),
+        latest_message=latest_message,
+        events=[],
+        paused=False,
+        followup_action=None,
+        active_loop={},
+        latest_action_name="action_listen",
+    )
+
+
+def question_pool(size: int, seed: int = 1) -> List[str]:
+    """Distinct knowledge-base questions, in a fixed order."""
+    rng = random.Random(seed)
+    questions = [
+        template.format(topic=topic)
+        for template in QUESTION_TEMPLATES
+        for topic in TOPICS
+    ]
+    rng.shuffle(questions)
+    while len(questions) < size:
+        questions.append(f"{rng.choice(questions)} (case {len(questions)})")
+    return questions[:size]
+
+
+def zipf_choice(rng: random.Random, items: List[Any], skew: float = 1.1) -> Any:
+    """Pick an item with a Zipf-like popularity skew (a few items dominate)."""
+    weights = [1 / (rank ** skew) for rank in range(1, len(items) + 1)]
+    return rng.choices(items, weights=weights)[0]
+
+
+def search_tracker(turn: int, question: str, role: str, language: str = "en-GB") -> Tracker:
+    return make_tracker(
+        f"bench-{turn}",
+        {"user_role": role, "language": language, "user_auth": True, "user_account": f"user{turn}"},
+        text=question,
+    )
+
+
+def weather_tracker(turn: int, location: str) -> Tracker:
+    return make_tracker(
+        f"bench-{turn}",
+        {"location": location, "user_auth": True, "language": "en-GB"},
+        text=f"what's the weather in {location}?",
+    )
+
+
+def init_bot_tracker(turn: int, token: str) -> Tracker:
+    return make_tracker(
+        f"bench-{turn}",
+        {"language": "en-GB"},
+        text="/session_start",
+        entities=[{"entity": "user_token", "value": token}],
+        intent="session_start",
+    )
+
+
+def name_set_tracker(turn: int, username: str, role: str) -> Tracker:
+    return make_tracker(
+        f"bench-{turn}",
+        {"user_botinit": None},
+        text=f"set name {username} {role}",
+        entities=[{"entity": "username", "value": username}, {"entity": "role", "value": role}],
+    )
+
+
+def whats_my_name_tracker(turn: int, username: str, role: str) -> Tracker:
+    return make_tracker(
+        f"bench-{turn}",
+        {"user_account": username, "user_role": role, "user_auth": True},
+        text="what's my name?",
+    )
@@ -0,0 +1,258 @@
+"""
+End-to-end conversation load against the Rasa REST webhook: per-flow latency and errors.
+
+Run from the ``rasa-dmt`` directory, against a running Rasa server:
+
+    python -m benchmarks.load_webhook --conversations 200 --concurrency 20 --mix weather=3 image=2 search=5
+
+Every conversation is a fresh sender that starts with
+``/session_start{"user_token": ...}``, carrying a JWT with encrypted claims
+minted by ``benchmarks.tokens`` (with ``JWT_KEY`` and ``ENCRYPTION_KEY``, so
+they must match the server's), and then runs ``--flows`` flows drawn from
+``--mix``:
+
+- ``weather``: ``user_request_weather``; half the time without a location,
+  answered on the next turn when the bot asks for one.
+- ``image``: ``image_request``, "show me an image of the ... process".
+- ``search``: ``pattern_search``, a knowledge-base question.
+
+Each turn is a POST to ``/webhooks/rest/webhook`` and is timed and checked:
+an HTTP error, timeout, empty reply, a reply carrying one of the actions'
+error messages, or a reply without the flow's expected content counts as an
+error of that kind. Latency percentiles and error rates are reported per
+flow, with ``bot_init`` for the session start.
+
+For an offline run, start the stand-ins first and the Rasa server with the
+environment it prints:
+
+    python -m benchmarks.fake_stack --milvus-uri http://localhost:19530
+    rasa run --enable-api    # with OPENAI_API_BASE, WEATHER_API_URL, ... exported
+
+The ``search`` flow goes through Rasa's EnterpriseSearchPolicy, which needs a
+Milvus server (the compose ``milvus`` service); with a Milvus Lite file,
+leave it out of ``--mix``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from actions.metrics import percentile
+
+from .fake_upstreams import LOCATIONS
+from .fixtures import ROLES, TOPICS, question_pool
+
+WEBHOOK_PATH = "/webhooks/rest/webhook"
+# Replies the actions send when they fail, rather than an HTTP error.
+ERROR_PHRASES = (
+    "authentication failed",
+    "unexpected error",
+    "encountered an error",
+    "couldn't fetch",
+    "couldn't process",
+    "temporarily unavailable",
+    "taking longer than expected",
+    "having trouble",
+)
+NO_ANSWER_PHRASES = ("couldn't find any information", "tidak menemukan informasi")
+FLOWS = ("weather", "image", "search")
+
+
+@dataclass
+class Turn:
+    flow: str
+    seconds: float
+    error: Optional[str] = None
+
+
+@dataclass
+class Conversation:
+    session: aiohttp.ClientSession
+    url: str
+    timeout: float
+    sender_id: str = field(default_factory=lambda: f"load-{uuid.uuid4().hex[:12]}")
+    turns: List[Turn] = field(default_factory=list)
+
+    async def send(self, flow: str, message: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Send one message; return the bot's replies and the transport error, if any."""
+        started = time.perf_counter()
+        replies: List[Dict[str, Any]] = []
+        error = None
+        try:
+            async with self.session.post(
+                self.url + WEBHOOK_PATH,
+                json={"sender": self.sender_id, "message": message},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            ) as response:
+                if response.status != 200:
+                    error = f"http_{response.status}"
+                else:
+                    replies = await response.json()
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except aiohttp.ClientError:
+            error = "connection"
+        self.turns.append(Turn(flow, time.perf_counter() - started, error))
+        return replies, error
+
+    def check(self, replies: List[Dict[str, Any]], expected: Tuple[str, ...] = (), image: bool = False) -> None:
+        """Classify the last turn's replies, unless it already failed in transport."""
+        turn = self.turns[-1]
+        if turn.error:
+            return
+        text = " ".join(reply.get("text") or "" for reply in replies).lower()
+        if not replies:
+            turn.error = "empty_reply"
+        elif any(phrase in text for phrase in ERROR_PHRASES):
+            turn.error = "error_reply"
+        elif any(phrase in text for phrase in NO_ANSWER_PHRASES):
+            turn.error = "no_answer"
+        elif image and not any(reply.get("image") for reply in replies):
+            turn.error = "missing_image"
+        elif expected and not any(phrase in text for phrase in expected):
+            turn.error = "unexpected_reply"
+
+
+async def run_conversation(
+    session: aiohttp.ClientSession, args: argparse.Namespace, rng: random.Random,
+    token: str, flows: List[str], questions: List[str]
+) -> List[Turn]:
+    conversation = Conversation(session, args.url.rstrip("/"), args.timeout)
+    replies, _ = await conversation.send("bot_init", f'/session_start{{"user_token": "{token}"}}')
+    conversation.check(replies, ("hello",))
+
+    for flow in flows:
+        await asyncio.sleep(rng.uniform(0, 2 * args.think_time))
+        if flow == "weather":
+            location = rng.choice(LOCATIONS)
+            expected = ("weather in", "no weather forecast")
+            if rng.random() < 0.5:
+                replies, error = await conversation.send(flow, f"what's the weather forecast in {location}?")
+            else:
+                replies, error = await conversation.send(flow, "what's the weather like?")
+                if not error:
+                    # The bot asks which location; answer it on the next turn.
+                    await asyncio.sleep(rng.uniform(0, 2 * args.think_time))
+                    replies, error = await conversation.send(flow, location)
+            conversation.check(replies, expected)
+        elif flow == "image":
+            replies, _ = await conversation.send(flow, f"show me an image of the {rng.choice(TOPICS)} process")
+            conversation.check(replies, image=True)
+        else:
+            replies, _ = await conversation.send(flow, rng.choice(questions))
+            conversation.check(replies)
+    return conversation.turns
+
+
+def summarize(flow: str, turns: List[Turn]) -> Dict[str, Any]:
+    times = [turn.seconds * 1000 for turn in turns]
+    errors: Dict[str, int] = {}
+    for turn in turns:
+        if turn.error:
+            errors[turn.error] = errors.get(turn.error, 0) + 1
+    return {
+        "flow": flow,
+        "turns": len(turns),
+        "errors": sum(errors.values()),
+        "error_rate": round(sum(errors.values()) / len(turns), 4),
+        "p50_ms": round(percentile(times, 50), 2),
+        "p90_ms": round(percentile(times, 90), 2),
+        "p95_ms": round(percentile(times, 95), 2),
+        "p99_ms": round(percentile(times, 99), 2),
+        "max_ms": round(max(times), 2),
+        "mean_ms": round(statistics.mean(times), 2),
+        "error_kinds": errors,
+    }
+
+
+def parse_mix(entries: List[str]) -> Dict[str, float]:
+    mix = {}
+    for entry in entries:
+        name, _, weight = entry.partition("=")
+        if name not in FLOWS:
+            raise SystemExit(f"unknown flow {name!r} in --mix; choose from {', '.join(FLOWS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from .tokens import mint_token
+
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    questions = [question for question in question_pool(args.questions) if "image" not in question]
+    jwt_key, encryption_key = os.environ["JWT_KEY"], os.environ["ENCRYPTION_KEY"]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+
+    async def one(index: int) -> List[Turn]:
+        # Spread conversation starts over the ramp-up instead of opening them all at once.
+        await asyncio.sleep(args.ramp_up * index / args.conversations)
+        conversation_rng = random.Random(rng.random())
+        flows = conversation_rng.choices(list(mix), weights=list(mix.values()), k=args.flows)
+        token = mint_token(f"load{index}@example.com", conversation_rng.choice(ROLES), jwt_key, encryption_key)
+        async with semaphore:
+            return await run_conversation(session, args, conversation_rng, token, flows, questions)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one(index) for index in range(args.conversations)))
+        elapsed = time.perf_counter() - started
+
+    by_flow: Dict[str, List[Turn]] = {}
+    for turns in results:
+        for turn in turns:
+            by_flow.setdefault(turn.flow, []).append(turn)
+    every_turn = [turn for turns in results for turn in turns]
+    return {
+        "conversations": args.conversations,
+        "concurrency": args.concurrency,
+        "elapsed_seconds": round(elapsed, 2),
+        "turns_per_second": round(len(every_turn) / elapsed, 2),
+        "error_rate": round(sum(bool(turn.error) for turn in every_turn) / len(every_turn), 4),
+        "flows": [summarize(flow, by_flow[flow]) for flow in ("bot_init",) + FLOWS if flow in by_flow],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:5005", help="Rasa server base URL")
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10, help="Conversations in flight at once")
+    parser.add_argument("--flows", type=int, default=3, help="Flows per conversation after the session start")
+    parser.add_argument("--mix", nargs="+", default=["weather=3", "image=2", "search=5"],
+                        help="Relative flow weights, e.g. weather=3 image=2 search=5")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean seconds between a user's turns")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds over which conversations start")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds before a turn counts as timed out")
+    parser.add_argument("--questions", type=int, default=200, help="Size of the knowledge-base question pool")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    from actions.config import getenv
+    for name in ("JWT_KEY", "ENCRYPTION_KEY"):
+        if not getenv(name):
+            raise SystemExit(f"{name} must be set to the Rasa server's value to mint session tokens")
+        os.environ[name] = getenv(name)
+
+    report = asyncio.run(run(args))
+    print(", ".join(f"{key}={value}" for key, value in report.items() if key != "flows"))
+    for row in report["flows"]:
+        print("flow: " + ", ".join(f"{key}={value}" for key, value in row.items()))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Mint JWTs with encrypted claims in the format InitBot expects."""
+import base64
+import hashlib
+import time
+from typing import Optional
+
+import jwt
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+
+def encrypt_claim(value: str, encryption_key: str) -> str:
+    """
+    Encrypt a claim with AES-ECB under the MD5-derived key.
+
+    The plaintext is padded with tab characters, which ClaimDecryptor strips
+    after decryption.
+    """
+    key = hashlib.md5(encryption_key.encode('utf-8')).digest()
+    data = value.encode('utf-8')
+    data += b'\t' * (-len(data) % 16 or 16)
+    encryptor = Cipher(algorithms.AES(key), modes.ECB(), backend=default_backend()).encryptor()
+    return base64.b64encode(encryptor.update(data) + encryptor.finalize()).decode('ascii')
+
+
+def mint_token(user_account: str, role: str, jwt_key: str, encryption_key: str,
+               ttl_seconds: Optional[int] = 3600) -> str:
+    """Create an HS256 token carrying encrypted ``user_account`` and ``role`` claims."""
+    claims = {
+        "user_account": encrypt_claim(user_account, encryption_key),
+        "role": encrypt_claim(role, encryption_key),
+    }
+    if ttl_seconds is not None:
+        claims["exp"] = int(time.time()) + ttl_seconds
+    return jwt.encode(claims, jwt_key, algorithm="HS256")
@@ -0,0 +1,83 @@
+"""
+Build or rebuild the ANN index of the knowledge base collection.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m tools.build_index
+    python -m tools.build_index --index-type IVF_SQ8 --param nlist=2048
+
+Without options the index described by ``MilvusConfig`` (``index_type``,
+``index_build_params``, ``metric_type``) is built on the collection the
+action searches. Any existing index on the vector field is dropped first;
+the collection is released while the new index builds and reloaded after.
+"""
+import argparse
+import json
+from typing import Any, Dict, List, Optional
+
+from pymilvus import Collection, connections, utility
+
+from actions.actions_milvus_search import SUPPORTED_METRICS, MilvusConfig
+
+INDEX_ALIAS = "index"
+
+
+def parse_params(pairs: List[str]) -> Dict[str, Any]:
+    """``KEY=VALUE`` pairs, with values parsed as JSON where possible."""
+    params: Dict[str, Any] = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        try:
+            params[key] = json.loads(value)
+        except json.JSONDecodeError:
+            params[key] = value
+    return params
+
+
+def describe_index(collection: Collection, field_name: str) -> Optional[Dict[str, Any]]:
+    for index in collection.indexes:
+        if index.field_name == field_name:
+            return dict(index.params)
+    return None
+
+
+def rebuild_index(collection: Collection, field_name: str, index_params: Dict[str, Any],
+                  using: str = INDEX_ALIAS) -> None:
+    """Replace the index on ``field_name`` and load the collection again."""
+    collection.release()
+    for index in collection.indexes:
+        if index.field_name == field_name:
+            collection.drop_index(index_name=index.index_name)
+    collection.create_index(field_name, index_params)
+    utility.wait_for_index_building_complete(collection.name, using=using)
+    collection.load()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--collection", help="Collection to index (default: the one the action searches)")
+    parser.add_argument("--index-type", help="HNSW, IVF_FLAT, IVF_SQ8, ... (default: MilvusConfig.index_type)")
+    parser.add_argument("--metric-type", choices=SUPPORTED_METRICS,
+                        help="Default: MilvusConfig.metric_type; the action ranks hits by L2 distance")
+    parser.add_argument("--param", action="append", default=[],
+                        help="Build parameter as KEY=VALUE, e.g. M=16 or nlist=1024; replaces the configured ones")
+    args = parser.parse_args(argv)
+
+    config = MilvusConfig()
+    if args.index_type:
+        config.index_type = args.index_type
+    if args.metric_type:
+        config.metric_type = args.metric_type
+    if args.param or args.index_type:
+        config.index_build_params = parse_params(args.param)
+    name = args.collection or config.search_collection
+
+    connections.connect(INDEX_ALIAS, **config.connection_args())
+    collection = Collection(name, using=INDEX_ALIAS)
+    print(f"current index on {name}.{config.vector_field}: {describe_index(collection, config.vector_field)}")
+    rebuild_index(collection, config.vector_field, config.index_params())
+    print(f"built index on {name}.{config.vector_field}: {describe_index(collection, config.vector_field)}")
+
+
+if __name__ == "__main__":
+    main()
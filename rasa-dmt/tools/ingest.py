@@ -0,0 +1,443 @@
+"""
+Stream documents from disk into the Milvus knowledge base.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m tools.ingest docs/ --permission admin staff
+
+Sources are ``.txt`` / ``.md`` files (permission from ``--permission``) and
+``.jsonl`` files with one ``{"id", "text", "permission"}`` record per line.
+A source is named by its path relative to ``--root`` (by default the
+directory holding every given path), so the same file keeps its name
+whichever directory the tool runs from; pass ``--root`` when ingesting a
+subdirectory of a tree ingested before. Text is chunked on paragraph
+boundaries, embedded in batches and inserted with its permission array.
+Every chunk's primary key is a hash of its source, text and permissions, so
+re-runs only embed chunks that are not stored yet and drop chunks that
+disappeared from a source. With ``--prune-missing``, chunks of sources whose
+file no longer exists under the root are deleted too; only use it when the
+collection is fed from that root alone. Finished files are recorded
+in a state file; after a crash the run resumes where it stopped. Memory use
+is bounded by ``--batch-size`` x ``--concurrency`` regardless of corpus size.
+A run that changed the collection gives it a fresh ingest stamp, which tells
+the action servers to drop the RAG answers they cached from the old content.
+With ``MilvusConfig.layout = 'partition'`` the action searches the copy made
+by ``tools.migrate_partitions``, which this tool does not write: re-run the
+migration after ingesting, or the changes stay invisible to the action.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+from actions.actions_milvus_search import MilvusConfig
+from actions.milvus_manager import INGEST_STAMP_PROPERTY, validate_role
+from actions.openai_client import OpenAIClient, OpenAIConfig
+
+TEXT_SUFFIXES = (".txt", ".md")
+MAX_TEXT_LENGTH = 65535
+FULL_EMBEDDING_DIM = 1536
+INGEST_ALIAS = "ingest"
+# Above this many chunks in a file, stale ones are found by paging through its
+# stored keys instead of one ``pk not in [...]`` delete expression.
+MAX_DELETE_EXPR_PKS = 10000
+
+
+@dataclass
+class Chunk:
+    """One row of the knowledge base."""
+    pk: str
+    source: str
+    text: str
+    permission: List[str]
+
+
+def chunk_pk(source: str, text: str, permission: List[str]) -> str:
+    """Content hash used as primary key, so unchanged chunks are recognised on re-runs."""
+    digest = hashlib.sha256()
+    for part in (source, text, ",".join(sorted(permission))):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def split_long(paragraph: str, limit: int) -> Iterator[str]:
+    """Split a paragraph longer than ``limit`` on whitespace."""
+    while len(paragraph) > limit:
+        cut = paragraph.rfind(" ", 0, limit)
+        cut = cut if cut > 0 else limit
+        yield paragraph[:cut].strip()
+        paragraph = paragraph[cut:].strip()
+    if paragraph:
+        yield paragraph
+
+
+def chunk_lines(lines: Iterable[str], chunk_chars: int, overlap_chars: int) -> Iterator[str]:
+    """
+    Group streamed lines into paragraph-aligned chunks of about ``chunk_chars``.
+
+    Consecutive chunks share up to ``overlap_chars`` of trailing context.
+    Only the current chunk is held in memory.
+    """
+    buffer: List[str] = []
+    size = 0
+    fresh = False
+    paragraph: List[str] = []
+
+    def paragraphs() -> Iterator[str]:
+        nonlocal paragraph
+        for line in lines:
+            if line.strip():
+                paragraph.append(line.strip())
+                continue
+            if paragraph:
+                yield " ".join(paragraph)
+                paragraph = []
+        if paragraph:
+            yield " ".join(paragraph)
+            paragraph = []
+
+    for text in paragraphs():
+        for piece in split_long(text, chunk_chars):
+            if fresh and size + len(piece) > chunk_chars:
+                chunk = "\n\n".join(buffer)
+                yield chunk
+                tail = chunk[-overlap_chars:].strip() if overlap_chars else ""
+                buffer, size, fresh = ([tail], len(tail), False) if tail else ([], 0, False)
+            buffer.append(piece)
+            size += len(piece) + 2
+            fresh = True
+    if fresh:
+        yield "\n\n".join(buffer)
+
+
+def iter_source_files(paths: List[str]) -> Iterator[str]:
+    """Every ingestible file under ``paths``, in a stable order."""
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(TEXT_SUFFIXES + (".jsonl",)):
+                    yield os.path.join(root, name)
+
+
+def default_root(paths: List[str]) -> str:
+    """The deepest directory containing every path."""
+    root = os.path.commonpath([os.path.abspath(path) for path in paths])
+    return root if os.path.isdir(root) else os.path.dirname(root)
+
+
+def source_name(path: str, root: str) -> str:
+    """Name of a source file in the collection: its path relative to the ingest root."""
+    return os.path.relpath(os.path.abspath(path), root).replace(os.sep, "/")
+
+
+def record_permission(value: Any, default_permission: List[str], where: str) -> List[str]:
+    """A jsonl record's ``permission``: a role, a list of roles, or unset for the default."""
+    if not value:
+        return list(default_permission)
+    roles = [value] if isinstance(value, str) else value
+    if not isinstance(roles, list):
+        raise SystemExit(f"{where}: 'permission' must be a role or a list of roles, not {value!r}")
+    try:
+        return [validate_role(role) for role in roles]
+    except ValueError as e:
+        raise SystemExit(f"{where}: {str(e)}")
+
+
+def iter_chunks(path: str, source: str, default_permission: List[str], chunk_chars: int,
+                overlap_chars: int) -> Iterator[Chunk]:
+    """Stream the chunks of one source file, stored under the name ``source``."""
+    with open(path, encoding="utf-8") as fh:
+        if not path.endswith(".jsonl"):
+            for text in chunk_lines(fh, chunk_chars, overlap_chars):
+                yield Chunk(chunk_pk(source, text, default_permission), source, text, default_permission)
+            return
+
+        for line_number, line in enumerate(fh, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            permission = record_permission(record.get("permission"), default_permission,
+                                           f"{path}:{line_number}")
+            record_source = f"{source}#{record.get('id', line_number)}"
+            for text in chunk_lines(record["text"].splitlines(), chunk_chars, overlap_chars):
+                yield Chunk(chunk_pk(record_source, text, permission), source, text, permission)
+
+
+def file_fingerprint(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestState:
+    """Append-only record of completely ingested files and their fingerprints."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, Optional[str]] = {}
+        if os.path.exists(path):
+            with open(path) as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a torn final line from a crash
+                    self.done[entry["source"]] = entry["fingerprint"]
+
+    def is_done(self, source: str, fingerprint: str) -> bool:
+        return self.done.get(source) == fingerprint
+
+    def mark_done(self, source: str, fingerprint: Optional[str], chunks: int) -> None:
+        with open(self.path, "a") as fh:
+            fh.write(json.dumps({"source": source, "fingerprint": fingerprint, "chunks": chunks}) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        self.done[source] = fingerprint
+
+    def forget(self, source: str) -> None:
+        """Record that ``source`` was removed, so it is ingested again if it comes back."""
+        self.mark_done(source, None, 0)
+
+
+def build_schema(dim: int) -> CollectionSchema:
+    """Schema of the knowledge base collection written by this tool."""
+    return CollectionSchema([
+        FieldSchema("pk", DataType.VARCHAR, is_primary=True, max_length=64),
+        FieldSchema("source", DataType.VARCHAR, max_length=1024),
+        FieldSchema("text", DataType.VARCHAR, max_length=MAX_TEXT_LENGTH),
+        FieldSchema("permission", DataType.ARRAY, element_type=DataType.VARCHAR,
+                    max_capacity=64, max_length=128),
+        FieldSchema("vector", DataType.FLOAT_VECTOR, dim=dim),
+    ], description="Rasa knowledge base chunks")
+
+
+def open_collection(config: MilvusConfig, dim: int) -> Collection:
+    """Connect and return the knowledge base collection, creating it if needed."""
+    connections.connect(INGEST_ALIAS, **config.connection_args())
+    if not utility.has_collection(config.collection_name, using=INGEST_ALIAS):
+        collection = Collection(config.collection_name, build_schema(dim), using=INGEST_ALIAS)
+        collection.create_index(config.vector_field, config.index_params())
+    else:
+        collection = Collection(config.collection_name, using=INGEST_ALIAS)
+        fields = {field.name: field for field in collection.schema.fields}
+        missing = {"pk", "source", "text", "permission", "vector"} - set(fields)
+        if missing:
+            raise SystemExit(
+                f"Collection '{config.collection_name}' lacks fields {sorted(missing)}; "
+                f"ingest into a new collection with --collection and switch over."
+            )
+        stored_dim = int(fields["vector"].params["dim"])
+        if stored_dim != dim:
+            raise SystemExit(
+                f"Collection '{config.collection_name}' stores {stored_dim}-dimensional vectors but "
+                f"embeddings are {dim}-dimensional; ingest into a new collection with --collection."
+            )
+    collection.load()
+    return collection
+
+
+def stamp_collection(collection: Collection) -> None:
+    """Give the collection a fresh ingest stamp, so action servers drop answers cached from it."""
+    try:
+        collection.set_properties({INGEST_STAMP_PROPERTY: uuid.uuid4().hex})
+    except Exception as e:
+        # Milvus Lite does not implement collection properties.
+        print(f"Could not stamp collection '{collection.name}', so cached answers are only dropped "
+              f"if its row count changed: {str(e).splitlines()[0]}")
+
+
+class Ingestor:
+    """Embeds and inserts batches of chunks with bounded concurrency."""
+
+    def __init__(self, collection: Collection, client: OpenAIClient, concurrency: int):
+        self.collection = collection
+        self.client = client
+        self.dim = next(int(field.params["dim"]) for field in collection.schema.fields if field.name == "vector")
+        self._slots = asyncio.Semaphore(concurrency)
+        self.embedded = 0
+        self.skipped = 0
+        self.deleted = 0
+
+    def _existing(self, pks: List[str]) -> Set[str]:
+        rows = self.collection.query(expr=f"pk in {json.dumps(pks)}", output_fields=["pk"])
+        return {row["pk"] for row in rows}
+
+    async def _process(self, batch: List[Chunk]) -> None:
+        try:
+            existing = await asyncio.to_thread(self._existing, [chunk.pk for chunk in batch])
+            fresh = [chunk for chunk in batch if chunk.pk not in existing]
+            self.skipped += len(batch) - len(fresh)
+            if not fresh:
+                return
+            vectors = await self.client.get_embeddings_batch([chunk.text for chunk in fresh])
+            wrong = next((len(vector) for vector in vectors if len(vector) != self.dim), None)
+            if wrong is not None:
+                raise ValueError(
+                    f"Embeddings are {wrong}-dimensional but collection '{self.collection.name}' stores "
+                    f"{self.dim}-dimensional vectors; set EMBEDDING_DIMENSIONS or --dim to {self.dim}, "
+                    f"or ingest into a new collection with --collection and --dim {wrong}."
+                )
+            rows = [
+                {"pk": c.pk, "source": c.source, "text": c.text[:MAX_TEXT_LENGTH],
+                 "permission": c.permission, "vector": vector}
+                for c, vector in zip(fresh, vectors)
+            ]
+            await asyncio.to_thread(self.collection.insert, rows)
+            self.embedded += len(rows)
+        finally:
+            self._slots.release()
+
+    async def ingest_file(self, chunks: Iterator[Chunk], batch_size: int) -> Set[str]:
+        """Ingest one file's chunks and return the primary keys it produced."""
+        produced: Set[str] = set()
+        tasks: List[asyncio.Task] = []
+        batch: List[Chunk] = []
+
+        async def submit(pending: List[Chunk]) -> None:
+            await self._slots.acquire()
+            tasks.append(asyncio.ensure_future(self._process(pending)))
+
+        for chunk in chunks:
+            produced.add(chunk.pk)
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                await submit(batch)
+                batch = []
+                for task in [task for task in tasks if task.done()]:
+                    tasks.remove(task)
+                    task.result()  # surface a failed batch instead of marking the file done
+        if batch:
+            await submit(batch)
+        await asyncio.gather(*tasks)
+        return produced
+
+    def delete_stale(self, source: str, produced: Set[str]) -> None:
+        """Remove chunks of ``source`` that the current version no longer produces."""
+        if len(produced) <= MAX_DELETE_EXPR_PKS:
+            result = self.collection.delete(
+                expr=f"source == {json.dumps(source)} and pk not in {json.dumps(sorted(produced))}"
+            )
+            self.deleted += result.delete_count
+            return
+
+        iterator = self.collection.query_iterator(
+            batch_size=1000, expr=f"source == {json.dumps(source)}", output_fields=["pk"]
+        )
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                stale = [row["pk"] for row in batch if row["pk"] not in produced]
+                if stale:
+                    self.collection.delete(expr=f"pk in {json.dumps(stale)}")
+                    self.deleted += len(stale)
+        finally:
+            iterator.close()
+
+    def stored_sources(self) -> Set[str]:
+        """Every source name in the collection, read in pages."""
+        sources: Set[str] = set()
+        iterator = self.collection.query_iterator(batch_size=1000, expr="", output_fields=["source"])
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                sources.update(row["source"] for row in batch)
+        finally:
+            iterator.close()
+        return sources
+
+    def delete_source(self, source: str) -> None:
+        """Remove every chunk of ``source``."""
+        result = self.collection.delete(expr=f"source == {json.dumps(source)}")
+        self.deleted += result.delete_count
+
+
+async def run(args: argparse.Namespace) -> None:
+    milvus_config = MilvusConfig()
+    if args.collection:
+        milvus_config.collection_name = args.collection
+    if milvus_config.collection_name == milvus_config.partitioned_collection_name:
+        raise SystemExit(
+            f"'{milvus_config.collection_name}' is the role-partitioned copy; ingest into "
+            f"the source collection and re-run tools.migrate_partitions."
+        )
+    openai_config = OpenAIConfig()
+    openai_config.timeout = args.timeout
+    if args.dim:
+        openai_config.embedding_dimensions = None if args.dim == FULL_EMBEDDING_DIM else args.dim
+    dim = openai_config.embedding_dimensions or FULL_EMBEDDING_DIM
+
+    collection = open_collection(milvus_config, dim)
+    state = IngestState(args.state_file or f".ingest-state-{milvus_config.collection_name}.jsonl")
+    ingestor = Ingestor(collection, OpenAIClient(openai_config), args.concurrency)
+
+    root = os.path.abspath(args.root) if args.root else default_root(args.paths)
+    for path in iter_source_files(args.paths):
+        source = source_name(path, root)
+        fingerprint = file_fingerprint(path)
+        if state.is_done(source, fingerprint):
+            print(f"unchanged  {source}")
+            continue
+
+        chunks = iter_chunks(path, source, args.permission, args.chunk_chars, args.overlap_chars)
+        produced = await ingestor.ingest_file(chunks, args.batch_size)
+        await asyncio.to_thread(ingestor.delete_stale, source, produced)
+        state.mark_done(source, fingerprint, len(produced))
+        print(f"ingested   {source} ({len(produced)} chunks)")
+
+    if args.prune_missing:
+        for source in sorted(await asyncio.to_thread(ingestor.stored_sources)):
+            if not os.path.exists(os.path.join(root, source)):
+                await asyncio.to_thread(ingestor.delete_source, source)
+                state.forget(source)
+                print(f"removed    {source}")
+
+    await asyncio.to_thread(collection.flush)
+    if ingestor.embedded or ingestor.deleted:
+        await asyncio.to_thread(stamp_collection, collection)
+    print(f"embedded={ingestor.embedded} skipped={ingestor.skipped} deleted={ingestor.deleted}")
+    if milvus_config.layout == 'partition' and (ingestor.embedded or ingestor.deleted):
+        print(f"WARNING: layout='partition' searches '{milvus_config.partitioned_collection_name}', "
+              f"which does not have these changes yet. Run "
+              f"'python -m tools.migrate_partitions --drop-existing' to rebuild it.")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="Files or directories to ingest")
+    parser.add_argument("--root", help="Directory source names are relative to (default: the one holding all paths)")
+    parser.add_argument("--prune-missing", action="store_true",
+                        help="Delete chunks of sources whose file no longer exists under the root")
+    parser.add_argument("--permission", nargs="+", default=["admin"],
+                        help="Roles allowed to see chunks from .txt/.md files and records without one")
+    parser.add_argument("--collection", help="Target collection (default: MilvusConfig.collection_name)")
+    parser.add_argument("--dim", type=int,
+                        help="Embedding dimensions (default: EMBEDDING_DIMENSIONS, else the model's full 1536)")
+    parser.add_argument("--chunk-chars", type=int, default=1500)
+    parser.add_argument("--overlap-chars", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--state-file")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Copy the knowledge base into the role-partitioned layout.
+
+Run from the ``rasa-dmt`` directory:
+
+    python -m tools.migrate_partitions --drop-existing
+
+Every row of the source collection (``MilvusConfig.collection_name``) is
+written into the target collection (``MilvusConfig.partitioned_collection_name``)
+once per role in its ``permission`` array, into the partition named by
+``partition_for_role``. Searches then pass ``partition_names`` instead of an
+``ARRAY_CONTAINS`` filter and only touch the segments visible to that role.
+Each copy gets its own primary key, ``<source pk>:<partition>``, since Milvus
+keeps only the newest of several rows sharing a key; the source key is kept
+in ``source_pk``. After copying, every role's partition is checked against
+the ``ARRAY_CONTAINS`` filter on the source, both for the chunks it holds and
+for the hits of a few sample searches, and the run fails on any difference.
+Switch the action over with ``MilvusConfig.layout = 'partition'`` once the
+run finishes. ``tools.ingest`` only writes the source collection, so re-run
+this after every ingest; each run gives the target a fresh ingest stamp,
+which tells the action servers to drop answers cached from the old copy.
+"""
+import argparse
+import json
+from typing import Any, Dict, List, Optional, Set
+
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+from actions.actions_milvus_search import MilvusConfig
+from actions.milvus_manager import SOURCE_PK_FIELD, partition_for_role, role_filter
+from tools.ingest import stamp_collection
+
+MIGRATE_ALIAS = "migrate"
+
+
+# Longest partition name Milvus accepts, plus the ":" joining it to the source key.
+MAX_PARTITION_SUFFIX = 256
+
+
+def target_schema(source: Collection) -> CollectionSchema:
+    """
+    The source schema with a per-copy VARCHAR primary key.
+
+    The source's own primary key becomes the ``source_pk`` field.
+    """
+    fields = []
+    for field in source.schema.fields:
+        params = dict(field.params)
+        kwargs = {"description": field.description}
+        if field.element_type is not None:
+            kwargs["element_type"] = field.element_type
+        if field.is_primary:
+            source_length = params.get("max_length", 20)  # an INT64 key has at most 20 characters
+            fields.append(FieldSchema(field.name, DataType.VARCHAR, is_primary=True,
+                                      max_length=source_length + MAX_PARTITION_SUFFIX))
+            fields.append(FieldSchema(SOURCE_PK_FIELD, field.dtype, **kwargs, **params))
+            continue
+        fields.append(FieldSchema(field.name, field.dtype, **kwargs, **params))
+    return CollectionSchema(fields, description=f"{source.name} partitioned by role")
+
+
+def open_target(source: Collection, name: str, drop_existing: bool) -> Collection:
+    if utility.has_collection(name, using=MIGRATE_ALIAS):
+        if not drop_existing:
+            raise SystemExit(f"Collection '{name}' exists; pass --drop-existing to rebuild it.")
+        utility.drop_collection(name, using=MIGRATE_ALIAS)
+    return Collection(name, target_schema(source), using=MIGRATE_ALIAS)
+
+
+def copy_rows(source: Collection, target: Collection, permission_field: str,
+              batch_size: int) -> Dict[str, int]:
+    """
+    Stream the source and insert a copy of each row into its roles' partitions.
+
+    Returns:
+        The number of rows copied for each role
+    """
+    fields = [field.name for field in source.schema.fields]
+    pk_field = source.schema.primary_field.name
+    created = {partition.name for partition in target.partitions}
+    counts: Dict[str, int] = {}
+
+    iterator = source.query_iterator(batch_size=batch_size, expr="", output_fields=fields)
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            by_role: Dict[str, List[dict]] = {}
+            for row in batch:
+                for role in set(row[permission_field] or []):
+                    by_role.setdefault(role, []).append(row)
+            for role, rows in by_role.items():
+                partition = partition_for_role(role)
+                if partition not in created:
+                    target.create_partition(partition)
+                    created.add(partition)
+                target.insert([
+                    {**row, pk_field: f"{row[pk_field]}:{partition}", SOURCE_PK_FIELD: row[pk_field]}
+                    for row in rows
+                ], partition_name=partition)
+                counts[role] = counts.get(role, 0) + len(rows)
+    finally:
+        iterator.close()
+    return counts
+
+
+def source_keys(collection: Collection, key_field: str, batch_size: int,
+                **scope: Any) -> Set[Any]:
+    """The ``key_field`` values of every row in ``scope`` (an expr or partition_names)."""
+    keys: Set[Any] = set()
+    iterator = collection.query_iterator(batch_size=batch_size, output_fields=[key_field], **scope)
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            keys.update(row[key_field] for row in batch)
+    finally:
+        iterator.close()
+    return keys
+
+
+def check_parity(source: Collection, target: Collection, roles: Set[str], config: MilvusConfig,
+                 batch_size: int, queries: int) -> List[str]:
+    """
+    Compare each role's partition with what ``ARRAY_CONTAINS`` shows it in the source.
+
+    Returns:
+        One line per difference found; empty if the layouts agree
+    """
+    pk_field = source.schema.primary_field.name
+    problems = []
+    for role in sorted(roles):
+        partition = partition_for_role(role)
+        expected = source_keys(source, pk_field, batch_size, expr=role_filter(role))
+        copied = source_keys(target, SOURCE_PK_FIELD, batch_size, expr="", partition_names=[partition])
+        if expected != copied:
+            problems.append(f"{role!r}: {len(expected - copied)} chunks missing from {partition}, "
+                            f"{len(copied - expected)} extra")
+            continue
+
+        samples = source.query(
+            expr=f"{pk_field} in {json.dumps(sorted(expected)[:queries])}",
+            output_fields=[config.vector_field]
+        ) if queries else []
+        vectors = [row[config.vector_field] for row in samples]
+        if not vectors:
+            continue
+        common = {"data": vectors, "anns_field": config.vector_field,
+                  "param": config.search_params(), "limit": config.top_k}
+        by_filter = source.search(expr=role_filter(role), **common)
+        by_partition = target.search(partition_names=[partition], output_fields=[SOURCE_PK_FIELD], **common)
+        for filtered, partitioned in zip(by_filter, by_partition):
+            filtered_ids = [hit.id for hit in filtered]
+            partitioned_ids = [hit.entity.get(SOURCE_PK_FIELD) for hit in partitioned]
+            if filtered_ids != partitioned_ids:
+                problems.append(f"{role!r}: search hits {partitioned_ids} in {partition}, "
+                                f"{filtered_ids} with ARRAY_CONTAINS")
+                break
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--source", help="Source collection (default: MilvusConfig.collection_name)")
+    parser.add_argument("--target", help="Target collection (default: MilvusConfig.partitioned_collection_name)")
+    parser.add_argument("--permission-field", default="permission")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--drop-existing", action="store_true", help="Rebuild the target if it exists")
+    parser.add_argument("--check-queries", type=int, default=5,
+                        help="Sample searches per role compared between the layouts (0 skips them)")
+    args = parser.parse_args(argv)
+
+    config = MilvusConfig()
+    source_name = args.source or config.collection_name
+    target_name = args.target or config.partitioned_collection_name
+
+    connections.connect(MIGRATE_ALIAS, **config.connection_args())
+    source = Collection(source_name, using=MIGRATE_ALIAS)
+    source.load()
+    target = open_target(source, target_name, args.drop_existing)
+
+    counts = copy_rows(source, target, args.permission_field, args.batch_size)
+    target.flush()
+    target.create_index(config.vector_field, config.index_params())
+    target.load()
+
+    for role, count in sorted(counts.items()):
+        print(f"{partition_for_role(role):<40} {count} rows")
+    print(f"copied {source.num_entities} rows from '{source_name}' into "
+          f"{len(counts)} partitions of '{target_name}' ({sum(counts.values())} rows)")
+
+    problems = check_parity(source, target, set(counts), config, args.batch_size, args.check_queries)
+    for problem in problems:
+        print(f"parity mismatch for {problem}")
+    if problems:
+        raise SystemExit(f"'{target_name}' does not match '{source_name}'; keep layout='filter'.")
+    print(f"parity check passed for {len(counts)} roles")
+    stamp_collection(target)
+
+
+if __name__ == "__main__":
+    main()
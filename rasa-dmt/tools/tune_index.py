@@ -0,0 +1,202 @@
+"""
+Replay a labelled query set against candidate ANN indexes.
+
+Run from the ``rasa-dmt`` directory, ideally against a copy of the collection
+(every candidate rebuilds the index in place):
+
+    python -m tools.tune_index queries.jsonl --collection rasa_tuning
+
+Each line of the query file is ``{"text": ..., "role": ..., "relevant": [pk, ...]}``.
+``vector`` may replace ``text`` to skip embedding, and ``role`` scopes the
+search the same way the action does. Queries without ``relevant`` are
+labelled with the exact top-k from a FLAT index built first. For every
+index candidate and search setting the tool prints recall@k, p50/p99 search
+latency and the memory held by the loaded segments (or an estimate where
+the server cannot report it). Candidates come from ``--candidates`` (same
+shape as ``DEFAULT_CANDIDATES``). The configured index is rebuilt at the
+end unless ``--no-restore`` is given.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from pymilvus import Collection, connections, utility
+
+from actions.actions_milvus_search import MilvusConfig
+from actions.metrics import percentile
+from actions.openai_client import OpenAIClient, OpenAIConfig
+
+from .build_index import INDEX_ALIAS, rebuild_index
+
+DEFAULT_CANDIDATES: List[Dict[str, Any]] = [
+    {"index_type": "HNSW", "params": {"M": 16, "efConstruction": 200},
+     "search": [{"ef": 16}, {"ef": 32}, {"ef": 64}, {"ef": 128}, {"ef": 256}]},
+    {"index_type": "HNSW", "params": {"M": 32, "efConstruction": 256},
+     "search": [{"ef": 32}, {"ef": 64}, {"ef": 128}]},
+    {"index_type": "IVF_FLAT", "params": {"nlist": 1024},
+     "search": [{"nprobe": 8}, {"nprobe": 16}, {"nprobe": 32}, {"nprobe": 64}]},
+    {"index_type": "IVF_SQ8", "params": {"nlist": 1024},
+     "search": [{"nprobe": 8}, {"nprobe": 16}, {"nprobe": 32}, {"nprobe": 64}]},
+]
+
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+async def embed_missing(queries: List[Dict[str, Any]], batch_size: int = 64) -> None:
+    """Fill in ``vector`` for queries that only carry ``text``."""
+    pending = [query for query in queries if "vector" not in query]
+    if not pending:
+        return
+    client = OpenAIClient(OpenAIConfig())
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        vectors = await client.get_embeddings_batch([query["text"] for query in batch])
+        for query, vector in zip(batch, vectors):
+            query["vector"] = vector
+
+
+def segment_memory(collection: Collection) -> Optional[int]:
+    """Bytes held by the collection's loaded segments, if the server reports it."""
+    try:
+        segments = utility.get_query_segment_info(collection.name, using=INDEX_ALIAS)
+    except Exception:
+        return None
+    return sum(segment.mem_size for segment in segments)
+
+
+def estimate_memory(index_type: str, params: Dict[str, Any], rows: int, dim: int) -> int:
+    """Rough size of the vector index alone, for servers that report no segment memory."""
+    if index_type == "HNSW":
+        return rows * (dim * 4 + params.get("M", 16) * 2 * 8)
+    if index_type == "IVF_SQ8":
+        return rows * (dim + 8) + params.get("nlist", 1024) * dim * 4
+    if index_type == "IVF_FLAT":
+        return rows * (dim * 4 + 8) + params.get("nlist", 1024) * dim * 4
+    return rows * dim * 4
+
+
+def run_queries(collection: Collection, config: MilvusConfig, queries: List[Dict[str, Any]],
+                search_params: Dict[str, Any], k: int, repeat: int) -> Dict[str, Any]:
+    """Search every query ``repeat`` times; recall is taken from the first pass."""
+    param = {"metric_type": config.metric_type, "params": search_params}
+    latencies: List[float] = []
+    found: List[List[Any]] = []
+    for attempt in range(repeat):
+        for query in queries:
+            scope = config.role_scope(query["role"]) if query.get("role") else {}
+            started = time.perf_counter()
+            hits = collection.search(
+                data=[query["vector"]], anns_field=config.vector_field,
+                param=param, limit=k, **scope
+            )[0]
+            latencies.append(time.perf_counter() - started)
+            if attempt == 0:
+                found.append([hit.id for hit in hits])
+
+    recalls = []
+    for query, ids in zip(queries, found):
+        relevant = query["relevant"][:k]
+        if relevant:
+            recalls.append(len(set(ids) & set(relevant)) / len(relevant))
+    return {
+        f"recall_at_{k}": round(sum(recalls) / len(recalls), 4) if recalls else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def label_exact(collection: Collection, config: MilvusConfig, queries: List[Dict[str, Any]], k: int) -> None:
+    """Label unlabelled queries with the exact top-k from a FLAT index."""
+    unlabelled = [query for query in queries if "relevant" not in query]
+    if not unlabelled:
+        return
+    exact = {"index_type": "FLAT", "metric_type": config.metric_type, "params": {}}
+    rebuild_index(collection, config.vector_field, exact)
+    for query in unlabelled:
+        scope = config.role_scope(query["role"]) if query.get("role") else {}
+        hits = collection.search(
+            data=[query["vector"]], anns_field=config.vector_field,
+            param={"metric_type": config.metric_type, "params": {}}, limit=k, **scope
+        )[0]
+        query["relevant"] = [hit.id for hit in hits]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("queries", help="JSONL query set")
+    parser.add_argument("--collection", help="Collection to tune (default: the one the action searches)")
+    parser.add_argument("--candidates", help="JSON file with a list of index candidates")
+    parser.add_argument("-k", type=int, help="Recall cut-off and search limit (default: MilvusConfig.top_k)")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the query set per setting")
+    parser.add_argument("--no-restore", action="store_true", help="Leave the last candidate's index in place")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    config = MilvusConfig()
+    k = args.k or config.top_k
+    name = args.collection or config.search_collection
+    candidates = DEFAULT_CANDIDATES
+    if args.candidates:
+        with open(args.candidates) as fh:
+            candidates = json.load(fh)
+
+    queries = load_queries(args.queries)
+    asyncio.run(embed_missing(queries))
+
+    connections.connect(INDEX_ALIAS, **config.connection_args())
+    collection = Collection(name, using=INDEX_ALIAS)
+    rows = collection.num_entities
+    dim = len(queries[0]["vector"])
+    label_exact(collection, config, queries, k)
+
+    results: List[Dict[str, Any]] = []
+    try:
+        for candidate in candidates:
+            index_params = {
+                "index_type": candidate["index_type"],
+                "metric_type": config.metric_type,
+                "params": candidate.get("params", {})
+            }
+            started = time.perf_counter()
+            rebuild_index(collection, config.vector_field, index_params)
+            build_s = round(time.perf_counter() - started, 2)
+            memory = segment_memory(collection)
+            memory_source = "segments"
+            if memory is None:
+                memory = estimate_memory(candidate["index_type"], index_params["params"], rows, dim)
+                memory_source = "estimate"
+
+            for search_params in candidate.get("search") or [{}]:
+                stats = run_queries(collection, config, queries, search_params, k, args.repeat)
+                result = {
+                    "index_type": candidate["index_type"],
+                    "params": index_params["params"],
+                    "search": search_params,
+                    **stats,
+                    "memory_mib": round(memory / 2 ** 20, 1),
+                    "memory_source": memory_source,
+                    "build_s": build_s,
+                }
+                results.append(result)
+                print(
+                    f"{candidate['index_type']:<9} {json.dumps(index_params['params']):<32} "
+                    f"{json.dumps(search_params):<16} "
+                    + ", ".join(f"{key}={value}" for key, value in stats.items())
+                    + f", memory={result['memory_mib']}MiB ({memory_source})"
+                )
+    finally:
+        if not args.no_restore:
+            rebuild_index(collection, config.vector_field, config.index_params())
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()